@@ -7,3 +7,7 @@ class AccountsConfig(AppConfig):
 
     def ready(self):
         import accounts.signals
+        from accounts.authentication import token_cache
+        from core.metrics import registry
+
+        registry.register_cache('auth_token', lambda: (token_cache.hits, token_cache.misses))
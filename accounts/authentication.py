@@ -0,0 +1,98 @@
+"""
+Token authentication with an in-process cache.
+
+DRF's TokenAuthentication loads the token and its user with one query on
+every request. ``CachedTokenAuthentication`` keeps the result in
+``token_cache``, a per-process LRU of at most TOKEN_CACHE_SIZE entries that
+expire after TOKEN_CACHE_TTL seconds. Each request gets its own copy of the
+cached user, so nothing a view does to ``request.user`` leaks into other
+requests.
+
+Entries are evicted in this process as soon as a token is deleted (logout)
+or its user is saved (deactivation, approval changes, profile edits; see
+``accounts.signals``). Other worker processes see such a change when their
+entry expires, so TOKEN_CACHE_TTL bounds how long a revoked token can still
+be used there. Code that changes users with ``QuerySet.update()`` must call
+``token_cache.evict_users()`` itself.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models.base import ModelState
+from rest_framework.authentication import TokenAuthentication
+
+
+def _copy(instance):
+    """A shallow copy of a model instance without its cached related objects."""
+    copy = instance.__class__.__new__(instance.__class__)
+    copy.__dict__.update(instance.__dict__)
+    copy._state = ModelState()
+    copy._state.db = instance._state.db
+    copy._state.adding = False
+    return copy
+
+
+class TokenCache:
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """The cached (user, token) for ``key``, or None."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        user, token, _ = entry
+        return _copy(user), token
+
+    def put(self, key, user, token):
+        ttl = settings.TOKEN_CACHE_TTL
+        if not ttl:
+            return
+        with self._lock:
+            self._entries[key] = (_copy(user), _copy(token), time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.TOKEN_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def evict(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def evict_users(self, user_ids):
+        user_ids = set(user_ids)
+        with self._lock:
+            for key in [key for key, (user, _, _) in self._entries.items() if user.pk in user_ids]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        token_cache.put(key, user, token)
+        return user, token
+
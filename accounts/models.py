@@ -60,3 +60,8 @@ class CustomUser(AbstractUser):
     class Meta:
         verbose_name = 'User'
         verbose_name_plural = 'Users'
+        indexes = [
+            # Admin user list: by approval status, newest first, keyset-paginated
+            models.Index(fields=['is_approved', '-created_at', '-id'], name='user_status_created_idx'),
+            models.Index(fields=['-created_at', '-id'], name='user_created_idx'),
+        ]
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from django.contrib.auth import authenticate
+from django.contrib.auth.signals import user_login_failed
 from django.utils import timezone
 import logging
 from .models import CustomUser
@@ -43,40 +43,44 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 class UserLoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField()
+    # Token-only clients can skip creating a session
+    session = serializers.BooleanField(default=True)
+    
+    def fail(self, email, message):
+        user_login_failed.send(
+            sender=__name__, credentials={'email': email}, request=self.context.get('request'),
+        )
+        raise serializers.ValidationError(message)
     
     def validate(self, attrs):
         email = attrs.get('email')
         password = attrs.get('password')
         
-        logger.info(f"Validating login for email: {email}")
+        logger.debug('Validating login for email: %s', email)
         
         if email and password:
+            # One query: authenticate() would load the same row again
             try:
-                # Find user by email
                 user = CustomUser.objects.get(email=email)
-                logger.info(f"Found user: {user.username}, is_approved: {user.is_approved}, is_active: {user.is_active}")
-                
-                # Authenticate using email as username (since USERNAME_FIELD = 'email')
-                authenticated_user = authenticate(username=email, password=password)
-                logger.info(f"Authentication result: {authenticated_user}")
-                
-                if not authenticated_user:
-                    logger.error("Authentication failed - invalid credentials")
-                    raise serializers.ValidationError('Invalid email or password')
-                
-                if not authenticated_user.is_approved == 'approved':
-                    logger.error(f"User not approved: {authenticated_user.is_approved}")
-                    raise serializers.ValidationError('Your account is not approved yet. Please contact admin.')
-                
-                if not authenticated_user.is_active:
-                    logger.error("User account is deactivated")
-                    raise serializers.ValidationError('Your account is deactivated. Please contact admin.')
-                
-                attrs['user'] = authenticated_user
-                logger.info("Login validation successful")
             except CustomUser.DoesNotExist:
-                logger.error(f"User not found with email: {email}")
-                raise serializers.ValidationError('Invalid email or password')
+                # Hash anyway so unknown emails take as long as wrong passwords, as ModelBackend does
+                CustomUser().set_password(password)
+                logger.error('User not found with email: %s', email)
+                self.fail(email, 'Invalid email or password')
+            
+            logger.debug('Found user: %s, is_approved: %s, is_active: %s', user.username, user.is_approved, user.is_active)
+            
+            # Inactive users are refused like a wrong password, as authenticate() does
+            if not (user.check_password(password) and user.is_active):
+                logger.error("Authentication failed - invalid credentials")
+                self.fail(email, 'Invalid email or password')
+            
+            if not user.is_approved == 'approved':
+                logger.error('User not approved: %s', user.is_approved)
+                self.fail(email, 'Your account is not approved yet. Please contact admin.')
+            
+            attrs['user'] = user
+            logger.debug('Login validation successful')
         else:
             logger.error("Missing email or password")
             raise serializers.ValidationError('Must include email and password')
@@ -120,4 +124,9 @@ class UserApprovalSerializer(serializers.ModelSerializer):
         
         instance.is_approved = validated_data.get('is_approved', instance.is_approved)
         instance.save()
-        return instance 
\ No newline at end of file
+        return instance
+
+class BulkUserApprovalSerializer(serializers.Serializer):
+    user_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+    is_approved = serializers.ChoiceField(choices=['approved', 'rejected'])
+    rejection_reason = serializers.CharField(required=False, allow_blank=True, default='')
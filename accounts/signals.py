@@ -1,6 +1,9 @@
-from django.db.models.signals import post_migrate
+from django.db.models.signals import post_delete, post_migrate, post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
 
 User = get_user_model()
 
@@ -15,4 +18,17 @@ def check_superuser_after_migrate(sender, **kwargs):
             else:
                 print(f"ℹ️  Found {superuser_count} superuser(s) in the system.")
         except Exception as e:
-            print(f"❌ Error checking superusers: {e}") 
\ No newline at end of file
+            print(f"❌ Error checking superusers: {e}")
+
+
+@receiver(post_delete, sender=Token)
+def evict_deleted_token(sender, instance, **kwargs):
+    """Logout deletes the token; stop accepting it right away."""
+    token_cache.evict(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def evict_changed_user(sender, instance, **kwargs):
+    """Deactivation, approval changes and edits reload the user on the next request."""
+    token_cache.evict_users([instance.pk])
@@ -1,3 +1,271 @@
-from django.test import TestCase
+import time
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from accounts.authentication import token_cache
+
+from core.logs import REDACTED, RedactFilter
+from core.query_plans import explain, plan_problems
+
+User = get_user_model()
+
+
+def make_user(index, **kwargs):
+    return User.objects.create_user(
+        username=f'user{index}', email=f'user{index}@example.com',
+        password='pass12345', **kwargs
+    )
+
+
+class AdminAPITestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass12345',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+
+class AdminUserListPaginationTests(AdminAPITestCase):
+    def test_pages_newest_first(self):
+        users = [make_user(i) for i in range(5)]
+        response = self.client.get('/api/accounts/admin/users/', {'limit': 4})
+        first_page = [row['id'] for row in response.data['results']]
+        response = self.client.get(response.data['next'])
+        second_page = [row['id'] for row in response.data['results']]
+        expected = [self.admin.id] + [u.id for u in users]
+        self.assertEqual(first_page + second_page, expected[::-1])
+        self.assertIsNone(response.data['next'])
+
+    def test_unpaginated_by_default(self):
+        make_user(1)
+        response = self.client.get('/api/accounts/admin/users/')
+        self.assertEqual(len(response.data), 2)
+
+    def test_page_includes_status_counts(self):
+        for i in range(6):
+            make_user(i, is_approved=['pending', 'approved', 'rejected'][i % 3], approved_by=self.admin)
+        # The page (with approvers joined in) and the grouped counts
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/accounts/admin/users/', {'limit': 2, 'status': 'pending'})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+        self.assertEqual(response.data['results'][0]['approved_by_name'], self.admin.get_full_name())
+        self.assertEqual(
+            response.data['status_counts'], {'pending': 3, 'approved': 2, 'rejected': 2, 'total': 7},
+        )
+
+
+class BulkUserApprovalTests(AdminAPITestCase):
+    url = '/api/accounts/admin/users/bulk-approve/'
+
+    def test_approve_in_one_update(self):
+        users = [make_user(i, rejection_reason='old') for i in range(3)]
+        ids = [user.id for user in users[:2]]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'user_ids': ids, 'is_approved': 'approved'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 2)
+        # The remaining user and the (unapproved) admin
+        self.assertEqual(response.data['status_counts']['pending'], 2)
+        self.assertEqual(sum(query['sql'].startswith('UPDATE') for query in queries), 1)
+        for user in User.objects.filter(id__in=ids):
+            self.assertEqual(user.is_approved, 'approved')
+            self.assertEqual(user.approved_by, self.admin)
+            self.assertIsNotNone(user.approved_at)
+            self.assertEqual(user.rejection_reason, '')
+            self.assertGreater(user.updated_at, users[0].updated_at)
+        self.assertEqual(User.objects.get(id=users[2].id).is_approved, 'pending')
+
+    def test_reject_with_reason(self):
+        user = make_user(1)
+        response = self.client.post(
+            self.url, {'user_ids': [user.id, 9999], 'is_approved': 'rejected', 'rejection_reason': 'Duplicate'},
+            format='json',
+        )
+        self.assertEqual(response.data['updated'], 1)
+        user.refresh_from_db()
+        self.assertEqual((user.is_approved, user.rejection_reason), ('rejected', 'Duplicate'))
+
+    def test_rejection_revokes_cached_tokens(self):
+        user = make_user(1, is_approved='approved')
+        token = Token.objects.create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(client.get('/api/accounts/profile/').data['is_approved'], 'approved')
+        self.client.post(self.url, {'user_ids': [user.id], 'is_approved': 'rejected'}, format='json')
+        self.assertEqual(client.get('/api/accounts/profile/').data['is_approved'], 'rejected')
+
+    def test_validation(self):
+        for data in ({'user_ids': [], 'is_approved': 'approved'}, {'user_ids': [1], 'is_approved': 'pending'}):
+            self.assertEqual(self.client.post(self.url, data, format='json').status_code, 400)
+        user = make_user(1, is_approved='approved')
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post(self.url, {'user_ids': [user.id], 'is_approved': 'approved'}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.user = make_user(1, is_approved='approved')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_lookup_is_cached(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/accounts/profile/').status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/accounts/profile/')
+        self.assertEqual(response.data['email'], 'user1@example.com')
+
+    def test_requests_get_their_own_user(self):
+        self.client.get('/api/accounts/profile/')
+        first, _ = token_cache.get(self.token.key)
+        first.first_name = 'Changed in one request'
+        second, _ = token_cache.get(self.token.key)
+        self.assertNotEqual(second.first_name, first.first_name)
+
+    def test_logout_revokes_immediately(self):
+        self.client.get('/api/accounts/profile/')
+        self.assertEqual(self.client.post('/api/accounts/logout/').status_code, 200)
+        self.assertEqual(self.client.get('/api/accounts/profile/').status_code, 401)
+
+    def test_deactivation_revokes_immediately(self):
+        self.client.get('/api/accounts/profile/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/accounts/profile/').status_code, 401)
+
+    def test_approval_changes_evict(self):
+        self.client.get('/api/accounts/profile/')
+        admin = APIClient()
+        admin.force_authenticate(User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass12345',
+        ))
+        response = admin.post(
+            f'/api/accounts/admin/users/{self.user.pk}/approve/', {'is_approved': 'rejected'}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertEqual(self.client.get('/api/accounts/profile/').data['is_approved'], 'rejected')
+
+    @override_settings(TOKEN_CACHE_SIZE=2)
+    def test_bounded_lru(self):
+        tokens = [Token.objects.create(user=make_user(i)) for i in range(2, 5)]
+        for token in tokens[:2]:
+            token_cache.put(token.key, token.user, token)
+        token_cache.get(tokens[0].key)  # most recently used now
+        token_cache.put(tokens[2].key, tokens[2].user, tokens[2])
+        self.assertEqual(len(token_cache), 2)
+        self.assertIsNone(token_cache.get(tokens[1].key))
+        self.assertIsNotNone(token_cache.get(tokens[0].key))
+
+    def test_entries_expire(self):
+        self.client.get('/api/accounts/profile/')
+        with mock.patch('accounts.authentication.time.monotonic', return_value=time.monotonic() + 31):
+            with self.assertNumQueries(1):
+                self.client.get('/api/accounts/profile/')
+
+
+class LoginTests(TestCase):
+    def setUp(self):
+        self.user = make_user(1, is_approved='approved')
+        self.client = APIClient()
+
+    def login(self, **data):
+        return self.client.post(
+            '/api/accounts/login/', {'email': 'user1@example.com', 'password': 'pass12345', **data}, format='json',
+        )
+
+    def test_token_only_login(self):
+        from django.contrib.sessions.models import Session
+        with CaptureQueriesContext(connection) as queries:
+            response = self.login(session=False)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['token'], Token.objects.get(user=self.user).key)
+        self.assertFalse(Session.objects.exists())
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+        # One user lookup, no second fetch by authenticate()
+        self.assertEqual(sum('FROM "accounts_customuser"' in query['sql'] for query in queries), 1)
+
+    def test_token_is_reused(self):
+        first = self.login(session=False).data['token']
+        with self.assertNumQueries(5):
+            # user, token, last_login and the savepoint around them
+            second = self.login(session=False).data['token']
+        self.assertEqual(first, second)
+        self.assertEqual(Token.objects.count(), 1)
+
+    def test_session_login_by_default(self):
+        from django.contrib.sessions.models import Session
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Session.objects.count(), 1)
+        self.assertIn('sessionid', response.cookies)
+
+    def test_errors_unchanged(self):
+        def error(**data):
+            response = self.login(**data)
+            self.assertEqual(response.status_code, 400)
+            return str(response.data['errors']['non_field_errors'][0])
+
+        self.assertEqual(error(password='wrong'), 'Invalid email or password')
+        self.assertEqual(error(email='nobody@example.com'), 'Invalid email or password')
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(error(), 'Invalid email or password')
+        User.objects.filter(pk=self.user.pk).update(is_active=True, is_approved='pending')
+        self.assertEqual(error(), 'Your account is not approved yet. Please contact admin.')
+        self.assertFalse(Token.objects.exists())
+
+    def test_failed_login_signal(self):
+        from django.contrib.auth.signals import user_login_failed
+        receiver = mock.Mock()
+        user_login_failed.connect(receiver)
+        self.addCleanup(user_login_failed.disconnect, receiver)
+        self.login(password='wrong')
+        self.assertEqual(receiver.call_args.kwargs['credentials'], {'email': 'user1@example.com'})
+
+
+class LoginLoggingTests(TestCase):
+    def test_request_data_is_logged_at_debug_without_the_password(self):
+        make_user(1, is_approved='approved')
+        with self.assertLogs('accounts.views', 'DEBUG') as logs:
+            response = APIClient().post(
+                '/api/accounts/login/', {'email': 'user1@example.com', 'password': 'pass12345'}, format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+        attempt = logs.records[0]
+        self.assertEqual(attempt.levelname, 'DEBUG')
+        # The data is a logging argument, so the pipeline's filter can redact it
+        RedactFilter().filter(attempt)
+        message = attempt.getMessage()
+        self.assertIn('user1@example.com', message)
+        self.assertIn(REDACTED, message)
+        self.assertNotIn('pass12345', message)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite-specific')
+class UserQueryPlanTests(TestCase):
+    def test_admin_list_queries_use_indexes(self):
+        queries = {
+            'pending page': User.objects.filter(is_approved='pending').order_by('-created_at', '-id')[:51],
+            'first page': User.objects.order_by('-created_at', '-id')[:51],
+            'by status': User.objects.filter(is_approved='pending').order_by('-created_at'),
+            'pending count': User.objects.filter(is_approved='pending').values('id'),
+            'status counts': User.objects.order_by().values_list('is_approved').annotate(count=Count('id')),
+        }
+        for name, queryset in queries.items():
+            with self.subTest(name):
+                plan = explain(queryset)
+                self.assertEqual(plan_problems(plan), [], plan)
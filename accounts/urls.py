@@ -1,7 +1,7 @@
 from django.urls import path
 from .views import (
     UserRegistrationView, UserLoginView, UserProfileView,
-    AdminUserListView, AdminUserDetailView, UserApprovalView,
+    AdminUserListView, AdminUserDetailView, UserApprovalView, BulkUserApprovalView,
     pending_users_count, logout
 )
 
@@ -18,5 +18,6 @@ urlpatterns = [
     path('admin/users/', AdminUserListView.as_view(), name='admin-users'),
     path('admin/users/<int:pk>/', AdminUserDetailView.as_view(), name='admin-user-detail'),
     path('admin/users/<int:user_id>/approve/', UserApprovalView.as_view(), name='user-approval'),
+    path('admin/users/bulk-approve/', BulkUserApprovalView.as_view(), name='user-bulk-approval'),
     path('admin/pending-count/', pending_users_count, name='pending-users-count'),
 ] 
\ No newline at end of file
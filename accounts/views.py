@@ -5,12 +5,18 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import login
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models import Count
 from django.utils import timezone
 import logging
+from core.pagination import KeysetPagination
+from .authentication import token_cache
 from .models import CustomUser
 from .serializers import (
     UserRegistrationSerializer, UserLoginSerializer, 
-    UserProfileSerializer, AdminUserSerializer, UserApprovalSerializer
+    UserProfileSerializer, AdminUserSerializer, UserApprovalSerializer,
+    BulkUserApprovalSerializer
 )
 
 # Set up logging
@@ -22,19 +28,19 @@ class UserRegistrationView(APIView):
     permission_classes = [permissions.AllowAny]
     
     def post(self, request):
-        logger.info(f"Registration attempt with data: {request.data}")
+        logger.debug('Registration attempt with data: %s', request.data)
         
         serializer = UserRegistrationSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            logger.info(f"User registered successfully: {user.email}")
+            logger.info('User registered successfully: %s', user.email)
             return Response({
                 'message': 'Registration successful! Please wait for admin approval before logging in.',
                 'user_id': user.id,
                 'email': user.email
             }, status=status.HTTP_201_CREATED)
         
-        logger.error(f"Registration failed with errors: {serializer.errors}")
+        logger.error('Registration failed with errors: %s', serializer.errors)
         return Response({
             'message': 'Registration failed',
             'errors': serializer.errors
@@ -44,21 +50,26 @@ class UserLoginView(APIView):
     permission_classes = [permissions.AllowAny]
     
     def post(self, request):
-        logger.info(f"Login attempt with data: {request.data}")
+        logger.debug('Login attempt with data: %s', request.data)
         
-        serializer = UserLoginSerializer(data=request.data)
+        serializer = UserLoginSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             user = serializer.validated_data['user']
-            login(request, user)
-            token, created = Token.objects.get_or_create(user=user)
-            logger.info(f"Login successful for user: {user.email}")
+            with transaction.atomic():
+                token, created = Token.objects.get_or_create(user=user)
+                if serializer.validated_data['session']:
+                    login(request, user)
+                else:
+                    # What login() does apart from the session (updates last_login)
+                    user_logged_in.send(sender=user.__class__, request=request, user=user)
+            logger.info('Login successful for user: %s', user.email)
             return Response({
                 'token': token.key,
                 'user': UserProfileSerializer(user).data,
                 'message': 'Login successful!'
             }, status=status.HTTP_200_OK)
         
-        logger.error(f"Login failed with errors: {serializer.errors}")
+        logger.error('Login failed with errors: %s', serializer.errors)
         return Response({
             'message': 'Login failed',
             'errors': serializer.errors
@@ -78,16 +89,37 @@ class UserProfileView(APIView):
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class AdminUserPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+def approval_status_counts():
+    """Users per approval status (all statuses present, plus ``total``) from one grouped query."""
+    counts = dict.fromkeys((value for value, _ in CustomUser.APPROVAL_STATUS_CHOICES), 0)
+    rows = CustomUser.objects.order_by().values_list('is_approved').annotate(count=Count('id'))
+    for approval_status, count in rows:
+        counts[approval_status] = count
+    counts['total'] = sum(counts.values())
+    return counts
+
 class AdminUserListView(generics.ListAPIView):
     serializer_class = AdminUserSerializer
     permission_classes = [permissions.IsAdminUser]
+    pagination_class = AdminUserPagination
     
     def get_queryset(self):
-        queryset = CustomUser.objects.all().order_by('-created_at')
+        # approved_by_name reads the approver of every row
+        queryset = CustomUser.objects.select_related('approved_by').order_by('-created_at')
         approval_status = self.request.query_params.get('status', None)
         if approval_status:
             queryset = queryset.filter(is_approved=approval_status)
         return queryset
+    
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if isinstance(response.data, dict):
+            # Pages carry the counts for the status tabs; unfiltered by ?status=
+            response.data['status_counts'] = approval_status_counts()
+        return response
 
 class AdminUserDetailView(generics.RetrieveUpdateAPIView):
     serializer_class = AdminUserSerializer
@@ -112,9 +144,40 @@ class UserApprovalView(APIView):
             })
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class BulkUserApprovalView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+    
+    def post(self, request):
+        serializer = BulkUserApprovalSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        data = serializer.validated_data
+        user_ids = set(data['user_ids'])
+        now = timezone.now()
+        # Same fields as UserApprovalSerializer.update; update() skips auto_now
+        if data['is_approved'] == 'approved':
+            changes = {'approved_by': request.user, 'approved_at': now, 'rejection_reason': ''}
+        else:
+            changes = {'rejection_reason': data['rejection_reason']}
+        updated = CustomUser.objects.filter(id__in=user_ids).update(
+            is_approved=data['is_approved'], updated_at=now, **changes,
+        )
+        # A single UPDATE sends no post_save, so drop the cached tokens here
+        token_cache.evict_users(user_ids)
+        logger.info(
+            'Bulk %s of %d user(s) by %s', data['is_approved'], updated, request.user.email,
+        )
+        return Response({
+            'message': f'{updated} user(s) have been {data["is_approved"]}',
+            'updated': updated,
+            'status_counts': approval_status_counts(),
+        })
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
 def pending_users_count(request):
+    # Kept for existing clients; paged admin user lists include status_counts
     count = CustomUser.objects.filter(is_approved='pending').count()
     return Response({'pending_users_count': count})
 
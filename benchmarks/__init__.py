@@ -0,0 +1,5 @@
+"""
+Standalone performance benchmarks. Each module is runnable with
+``python -m benchmarks.<name> --help`` from the project root and works on a
+throwaway SQLite database, never on db.sqlite3.
+"""
@@ -0,0 +1,19 @@
+"""
+ASGI application used by ``benchmarks.asgi_load``: the project's app on the
+benchmark database (``BENCH_DB``) with DEBUG off. Whether the async read
+views are routed follows ``DJANGO_ASYNC_READ_VIEWS``, as in core.asgi.
+"""
+import os
+
+from benchmarks.common import setup_django
+
+setup_django(os.environ['BENCH_DB'], migrate=False, test_environment=False)
+
+from django.conf import settings  # noqa: E402
+
+settings.DEBUG = False
+settings.ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+
+from django.core.asgi import get_asgi_application  # noqa: E402
+
+application = get_asgi_application()
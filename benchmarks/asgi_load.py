@@ -0,0 +1,150 @@
+"""
+Load test of the read endpoints under uvicorn, sync DRF views vs the async
+views in students.async_views.
+
+For each mode a uvicorn server (one worker) is started on a scratch
+database, then every endpoint is hit by ``--concurrency`` keep-alive
+clients for ``--duration`` seconds. Reports requests/sec and latency
+percentiles per endpoint and mode.
+
+Needs uvicorn (``pip install uvicorn``).
+
+    python -m benchmarks.asgi_load --payments 5000 --concurrency 32 --duration 10
+"""
+import argparse
+import http.client
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import PROJECT_ROOT, bench_token, percentile, setup_django, top_up_payments, write_report
+
+MODES = {'sync': '0', 'async': '1'}
+
+
+def endpoints():
+    from students.models import Student
+
+    student_id = Student.objects.order_by('id').values_list('id', flat=True).first()
+    return {
+        'student-list': '/api/students/',
+        'student-detail': f'/api/students/{student_id}/',
+        'student-search': '/api/students/search/?q=student1',
+        'student-payment-summary': f'/api/students/{student_id}/payment_summary/',
+        'payment-list': '/api/payments/',
+        'payment-summary': '/api/payments/summary/',
+    }
+
+
+def start_server(db_path, mode, port):
+    env = dict(os.environ, BENCH_DB=db_path, DJANGO_ASYNC_READ_VIEWS=MODES[mode])
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'benchmarks.asgi_app:application',
+         '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning', '--no-access-log'],
+        cwd=PROJECT_ROOT, env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f'uvicorn exited with status {server.returncode}')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/api/health/')
+            connection.getresponse().read()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit('uvicorn did not start')
+
+
+def run_load(port, url, token, concurrency, duration):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    headers = {'Authorization': f'Token {token}', 'Accept': 'application/json'}
+    stop_at = time.perf_counter() + duration
+
+    def worker():
+        nonlocal errors
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        mine, failed = [], 0
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            try:
+                connection.request('GET', url, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                ok = False
+            if ok:
+                mine.append(time.perf_counter() - started)
+            else:
+                failed += 1
+        connection.close()
+        with lock:
+            latencies.extend(mine)
+            errors += failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    elapsed = time.perf_counter() - started
+
+    result = {'requests': len(latencies), 'errors': errors, 'rps': round(len(latencies) / elapsed, 1)}
+    if latencies:
+        for pct in (50, 95, 99):
+            result[f'p{pct}_ms'] = round(percentile(latencies, pct) * 1000, 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--payments', type=int, default=5000, help='Payments in the scratch database.')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per endpoint and mode.')
+    parser.add_argument('--warmup', type=float, default=1)
+    parser.add_argument('--endpoints', nargs='+', help='Subset of endpoint names to run.')
+    parser.add_argument('--modes', nargs='+', choices=sorted(MODES), default=sorted(MODES, reverse=True))
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--db', help='Reuse this scratch database instead of a new temp file.')
+    parser.add_argument('--output', default='bench_output.json')
+    args = parser.parse_args()
+
+    db_path = setup_django(args.db)
+    top_up_payments(args.payments)
+    token = bench_token()
+    targets = endpoints()
+    if args.endpoints:
+        targets = {name: url for name, url in targets.items() if name in args.endpoints}
+
+    results = []
+    print(f"{'endpoint':<24} {'mode':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    for mode in args.modes:
+        server = start_server(db_path, mode, args.port)
+        try:
+            for name, url in targets.items():
+                run_load(args.port, url, token, args.concurrency, args.warmup)
+                result = run_load(args.port, url, token, args.concurrency, args.duration)
+                result.update(endpoint=name, url=url, mode=mode)
+                results.append(result)
+                print(f"{name:<24} {mode:>5} {result['rps']:>8} {result.get('p50_ms', '-'):>8} "
+                      f"{result.get('p95_ms', '-'):>8} {result.get('p99_ms', '-'):>8} {result['errors']:>6}")
+        finally:
+            server.terminate()
+            server.wait()
+
+    write_report(args.output, {
+        'database': db_path, 'payments': args.payments, 'concurrency': args.concurrency,
+        'duration': args.duration, 'results': results,
+    })
+
+
+if __name__ == '__main__':
+    main()
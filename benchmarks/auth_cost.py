@@ -0,0 +1,79 @@
+"""
+Per-request cost of token authentication, uncached vs. cached.
+
+    python -m benchmarks.auth_cost --requests 5000
+
+Measures the authentication step on its own (DRF's TokenAuthentication vs.
+accounts.authentication.CachedTokenAuthentication with a warm cache) and a
+full GET /api/accounts/profile/ through the test client with each class.
+"""
+import argparse
+import time
+
+from benchmarks.common import percentile, setup_django, write_report
+
+
+def time_calls(func, count):
+    timings = []
+    for _ in range(count):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def summarize(name, timings, queries):
+    result = {
+        'name': name,
+        'mean_us': round(sum(timings) / len(timings) * 1e6, 1),
+        'p50_us': round(percentile(timings, 50) * 1e6, 1),
+        'p99_us': round(percentile(timings, 99) * 1e6, 1),
+        'queries_per_call': round(queries / len(timings), 2),
+    }
+    print(f"{name:<28} mean {result['mean_us']:>8}us  p50 {result['p50_us']:>8}us  "
+          f"p99 {result['p99_us']:>8}us  {result['queries_per_call']} queries")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--db', help='Reuse this scratch database instead of a new temp file.')
+    parser.add_argument('--output', default='bench_output.json')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.authentication import TokenAuthentication
+    from rest_framework.test import APIClient, APIRequestFactory
+
+    from accounts.authentication import CachedTokenAuthentication, token_cache
+    from accounts.views import UserProfileView
+    from benchmarks.common import bench_token
+
+    key = bench_token()
+    request = APIRequestFactory().get('/api/accounts/profile/', HTTP_AUTHORIZATION=f'Token {key}')
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+    results = []
+
+    for name, auth_class in (('uncached', TokenAuthentication), ('cached', CachedTokenAuthentication)):
+        token_cache.clear()
+        authenticator = auth_class()
+        authenticator.authenticate(request)  # warm up (and fill the cache)
+        with CaptureQueriesContext(connection) as queries:
+            timings = time_calls(lambda: authenticator.authenticate(request), args.requests)
+        results.append(summarize(f'authenticate ({name})', timings, len(queries)))
+
+        UserProfileView.authentication_classes = [auth_class]
+        client.get('/api/accounts/profile/')
+        with CaptureQueriesContext(connection) as queries:
+            timings = time_calls(lambda: client.get('/api/accounts/profile/'), args.requests)
+        results.append(summarize(f'GET profile ({name})', timings, len(queries)))
+
+    write_report(args.output, {'requests': args.requests, 'results': results})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Shared setup for the benchmark scripts."""
+import json
+import os
+import resource
+import sys
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def setup_django(db_path=None, migrate=True, test_environment=True):
+    """
+    Configure Django against a scratch SQLite file (created if needed) and
+    return its path. Must run before anything touches the database.
+    ``test_environment`` installs the test client hooks (and ``testserver``
+    in ALLOWED_HOSTS); servers started for a benchmark leave it off.
+    """
+    if str(PROJECT_ROOT) not in sys.path:
+        sys.path.insert(0, str(PROJECT_ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    import django
+    from django.conf import settings
+
+    if db_path is None:
+        fd, db_path = tempfile.mkstemp(prefix='samayee-bench-', suffix='.sqlite3')
+        os.close(fd)
+    settings.DATABASES['default']['NAME'] = str(db_path)
+    django.setup()
+
+    if test_environment:
+        from django.test.utils import setup_test_environment
+        setup_test_environment()
+    if migrate:
+        from django.core.management import call_command
+        call_command('migrate', verbosity=0, interactive=False)
+    return str(db_path)
+
+
+def bench_token():
+    """Token key for a throwaway staff user, for benchmarks that talk HTTP."""
+    from django.contrib.auth import get_user_model
+    from rest_framework.authtoken.models import Token
+
+    User = get_user_model()
+    user, _ = User.objects.get_or_create(
+        email='bench@example.com',
+        defaults={'username': 'bench', 'is_staff': True, 'is_approved': 'approved'},
+    )
+    return Token.objects.get_or_create(user=user)[0].key
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def bench_client():
+    """An APIClient authenticated as a throwaway staff user."""
+    from django.contrib.auth import get_user_model
+    from rest_framework.test import APIClient
+
+    User = get_user_model()
+    user, _ = User.objects.get_or_create(
+        email='bench@example.com',
+        defaults={'username': 'bench', 'is_staff': True, 'is_approved': 'approved'},
+    )
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def top_up_payments(target, students_per_payment=10, chunk_size=5000):
+    """
+    Bulk-insert students and payments until there are ``target`` payments,
+    then bring the ledgers up to date.
+    """
+    from django.core.management import call_command
+    from django.db import transaction
+    from students.models import FeeStructure, Payment, Student
+
+    for grade in range(1, 11):
+        for board in ('CBSE', 'SSC'):
+            FeeStructure.objects.get_or_create(
+                grade=str(grade), board=board, defaults={'fee_amount': Decimal(20000 + grade * 2000)},
+            )
+    have = Payment.objects.count()
+    while have < target:
+        size = min(chunk_size, target - have)
+        with transaction.atomic():
+            students = Student.objects.bulk_create([
+                Student(
+                    first_name=f'Student{have + i}', last_name='Bench', grade=str((have + i) % 10 + 1),
+                    board='CBSE' if i % 2 else 'SSC', parent_name='Parent Bench',
+                    parent_contact_primary='9000000000',
+                )
+                for i in range(max(1, size // students_per_payment))
+            ])
+            Payment.objects.bulk_create([
+                Payment(
+                    student=students[i % len(students)], payment_mode='Cash',
+                    payment_term=f'Term {i % 4 + 1}', amount_paid=Decimal('1000.00'),
+                    amount_due=Decimal('5000.00'), payment_status='Partial',
+                )
+                for i in range(size)
+            ])
+        have += size
+    # bulk_create skips the signals that maintain these
+    call_command('reconcile_ledger', verbosity=0)
+    from students import search
+    search.rebuild_index()
+    return have
+
+
+def peak_rss_kb():
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return usage // 1024 if sys.platform == 'darwin' else usage
+
+
+def write_report(path, report):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
@@ -0,0 +1,325 @@
+"""
+Latency, query counts and memory of every API endpoint, by data size.
+
+    python -m benchmarks.endpoints --sizes 1000 10000 100000 --requests 20
+
+Each size runs in a fresh process on its own scratch database, filled by
+``students.synthetic.seed`` with that many payments, one student per 15
+payments and one user per 150 (300000 payments gives the 20k students and
+2k users of ``manage.py seed_synthetic``'s defaults). Every route in
+students/urls.py and accounts/urls.py is then called ``--requests`` times
+through the test client (``--heavy-requests`` for full exports and
+unpaginated lists). The report has p50/p95/p99 latency, queries per request,
+the peak of Python allocations during one request (tracemalloc) and the
+process's peak RSS.
+
+Each endpoint declares a query budget: the most queries one request may
+issue, whatever the data size. The script exits with status 1 when an
+endpoint goes over its budget or answers with an unexpected status;
+students.tests runs the same checks on a small data set.
+"""
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+
+from benchmarks.common import PROJECT_ROOT, bench_client, peak_rss_kb, percentile, setup_django, write_report
+
+PAYMENTS_PER_STUDENT = 15
+PAYMENTS_PER_USER = 150
+
+# ``path`` and ``data`` are formatted with the fixtures (``{student}``,
+# ``{payment}``, ...) and ``{n}``, a per-run counter for unique values.
+# ``fresh`` names a fixture recreated before every request, for deletes.
+Endpoint = namedtuple(
+    'Endpoint', ['name', 'method', 'path', 'budget', 'status', 'data', 'fresh', 'heavy', 'format'],
+    defaults=[200, None, None, False, 'json'],
+)
+
+ENDPOINTS = [
+    # students/urls.py
+    Endpoint('student list page', 'get', '/api/students/?limit=50', 3),
+    Endpoint('student list (all)', 'get', '/api/students/', 3, heavy=True),
+    Endpoint('student detail', 'get', '/api/students/{student}/', 3),
+    Endpoint('student search', 'get', '/api/students/search/?q={student_name}', 3),
+    Endpoint('student payments', 'get', '/api/students/{student}/payments/', 3),
+    Endpoint('student payment summary', 'get', '/api/students/{student}/payment_summary/', 3),
+    Endpoint('student export', 'get', '/api/students/export/?format=csv', 3, heavy=True),
+    Endpoint('student create', 'post', '/api/students/', 9, status=201, data={
+        'first_name': 'Bench{n}', 'last_name': 'Patil', 'grade': '7', 'board': 'CBSE',
+        'parent_name': 'Anil Patil', 'parent_contact_primary': '9800000000',
+    }),
+    Endpoint('student update', 'patch', '/api/students/{student}/', 11, data={'parent_contact_secondary': '98{n:08d}'}),
+    Endpoint('student delete', 'delete', '/api/students/{new_student}/', 10, status=204, fresh='new_student'),
+    Endpoint('fee structure list', 'get', '/api/fee-structures/', 2),
+    Endpoint('fee structure list (alias)', 'get', '/api/fees/', 2),
+    Endpoint('fee structure detail', 'get', '/api/fee-structures/{fee}/', 2),
+    Endpoint('fee structure by grade and board', 'get', '/api/fee-structures/by_grade_board/?grade=7&board=CBSE', 2),
+    Endpoint('fee schedule cache stats', 'get', '/api/fee-structures/cache_stats/', 0),
+    Endpoint('fee structure create', 'post', '/api/fee-structures/', 5, status=201, data={
+        'grade': '7', 'board': 'CBSE', 'fee_amount': '40000', 'academic_year': '{future_year}',
+    }, fresh='future_year'),
+    Endpoint('fee structure update', 'patch', '/api/fee-structures/{fee}/', 10, data={'fee_amount': '{fee_amount}'}),
+    Endpoint('fee structure delete', 'delete', '/api/fee-structures/{new_fee}/', 5, status=204, fresh='new_fee'),
+    Endpoint('payment list page', 'get', '/api/payments/?limit=50', 2),
+    Endpoint('payment list (all)', 'get', '/api/payments/', 2, heavy=True),
+    Endpoint('payment detail', 'get', '/api/payments/{payment}/', 2),
+    Endpoint('payment summary', 'get', '/api/payments/summary/', 2),
+    Endpoint('payment student summary', 'get', '/api/payments/{payment}/student_summary/', 2),
+    Endpoint('payment overdue page', 'get', '/api/payments/overdue/?limit=50', 2),
+    Endpoint('payment export', 'get', '/api/payments/export/?format=csv', 1, heavy=True),
+    Endpoint('payment create', 'post', '/api/payments/', 12, status=201, data={
+        'student': '{student}', 'payment_mode': 'Cash', 'payment_term': 'Term 2', 'amount_paid': '100',
+    }),
+    Endpoint('payment update', 'patch', '/api/payments/{payment}/', 8, data={'notes': 'Checked {n}'}),
+    Endpoint('payment delete', 'delete', '/api/payments/{new_payment}/', 7, status=204, fresh='new_payment'),
+    Endpoint('payment import (20 rows)', 'post', '/api/payments/import/', 13, data='import_file', format='multipart'),
+    Endpoint('dashboard', 'get', '/api/dashboard/', 6),
+    # accounts/urls.py
+    Endpoint('register', 'post', '/api/accounts/register/', 5, status=201, data={
+        'username': 'bench-register-{n}', 'email': 'bench-register-{n}@example.com',
+        'password': 'bench-pass-123', 'confirm_password': 'bench-pass-123',
+        'first_name': 'Bench', 'last_name': 'User',
+    }),
+    Endpoint('login', 'post', '/api/accounts/login/', 5, data={
+        'email': '{login_email}', 'password': '{login_password}', 'session': False,
+    }),
+    Endpoint('profile', 'get', '/api/accounts/profile/', 0),
+    Endpoint('profile update', 'put', '/api/accounts/profile/', 1, data={'phone_number': '97{n:08d}'}),
+    Endpoint('logout', 'post', '/api/accounts/logout/', 1),
+    Endpoint('admin user list page', 'get', '/api/accounts/admin/users/?limit=50', 2),
+    Endpoint('admin user list (all)', 'get', '/api/accounts/admin/users/', 1, heavy=True),
+    Endpoint('admin user detail', 'get', '/api/accounts/admin/users/{user}/', 1),
+    Endpoint('admin user update', 'patch', '/api/accounts/admin/users/{user}/', 2, data={'phone_number': '96{n:08d}'}),
+    Endpoint('user approval', 'post', '/api/accounts/admin/users/{user}/approve/', 2, data={'is_approved': 'approved'}),
+    Endpoint('bulk user approval', 'post', '/api/accounts/admin/users/bulk-approve/', 2, data={
+        'user_ids': '{user_ids}', 'is_approved': 'approved',
+    }),
+    Endpoint('pending users count', 'get', '/api/accounts/admin/pending-count/', 1),
+]
+
+
+def fixtures():
+    """Ids and values the endpoint paths and bodies refer to, plus factories for ``fresh`` ones."""
+    from django.contrib.auth import get_user_model
+    from rest_framework.authtoken.models import Token
+    from students import synthetic
+    from students.models import FeeStructure, Payment, Student
+    from students.years import current_academic_year
+
+    User = get_user_model()
+    student = Student.objects.filter(payment__isnull=False).order_by('id').first()
+    payment = Payment.objects.filter(student=student).order_by('id').first()
+    fee = FeeStructure.objects.get(academic_year=current_academic_year(), grade=student.grade, board=student.board)
+    users = list(User.objects.filter(username__startswith=synthetic.USERNAME_PREFIX).order_by('id')[:50])
+    login = next(user for user in users if user.is_approved == 'approved')
+    # The steady state: a returning user already has a token
+    Token.objects.get_or_create(user=login)
+    counter = itertools.count(1)
+    years = itertools.count(5000)
+
+    def new_student():
+        return Student.objects.create(
+            first_name='Leaving', last_name='Bench', grade='7', board='CBSE',
+            parent_name='Parent Bench', parent_contact_primary='9000000000',
+        ).id
+
+    def new_payment():
+        return Payment.objects.create(
+            student=student, payment_mode='Cash', payment_term='Term 1', amount_paid=1,
+        ).id
+
+    def new_fee():
+        # Far beyond any real academic year, so the unique key never collides
+        return FeeStructure.objects.create(
+            academic_year=next(years), grade='7', board='CBSE', fee_amount=40000,
+        ).id
+
+    values = {
+        'student': student.id, 'student_name': f'{student.first_name}+{student.last_name}', 'payment': payment.id, 'fee': fee.id, 'user': users[0].id,
+        'user_ids': [user.id for user in users], 'login_email': login.email,
+        'login_password': synthetic.PASSWORD,
+    }
+    factories = {
+        'new_student': new_student, 'new_payment': new_payment, 'new_fee': new_fee,
+        'future_year': lambda: next(years),
+    }
+    return values, factories, counter, (student, fee)
+
+
+def import_file(student):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    rows = ['student,payment_mode,payment_term,amount_paid']
+    rows += [f'{student.id},Cash,Term 3,50' for _ in range(20)]
+    return SimpleUploadedFile('payments.csv', '\n'.join(rows).encode(), content_type='text/csv')
+
+
+def _format(value, context):
+    if isinstance(value, str):
+        if value.startswith('{') and value.endswith('}') and value[1:-1] in context:
+            # A whole-value placeholder keeps its type (ids lists stay lists)
+            return context[value[1:-1]]
+        return value.format(**context)
+    return value
+
+
+def request_for(endpoint, values, factories, counter, objects):
+    """(method, path, kwargs) for one call of ``endpoint``."""
+    context = dict(values, n=next(counter))
+    student, fee = objects
+    if endpoint.fresh:
+        context[endpoint.fresh] = factories[endpoint.fresh]()
+    # Alternate the fee so every update changes it
+    context['fee_amount'] = str(fee.fee_amount + context['n'] % 2)
+    kwargs = {'format': endpoint.format}
+    if endpoint.data == 'import_file':
+        kwargs['data'] = {'file': import_file(student)}
+    elif endpoint.data is not None:
+        kwargs['data'] = {key: _format(value, context) for key, value in endpoint.data.items()}
+    return endpoint.method, endpoint.path.format(**context), kwargs
+
+
+def call(client, method, path, kwargs):
+    """One request, with a streamed body read to the end. Returns the response."""
+    response = getattr(client, method)(path, **kwargs)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def check(endpoint, client, setup):
+    """
+    One call of ``endpoint``: (status, queries, problem), where ``problem``
+    says how it broke its budget or status, if it did.
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    method, path, kwargs = request_for(endpoint, *setup)
+    with CaptureQueriesContext(connection) as queries:
+        response = call(client, method, path, kwargs)
+    problem = None
+    if response.status_code != endpoint.status:
+        problem = f'status {response.status_code}, expected {endpoint.status}'
+    elif len(queries) > endpoint.budget:
+        problem = f'{len(queries)} queries, budget {endpoint.budget}'
+    return response.status_code, len(queries), problem
+
+
+def measure(endpoint, client, setup, requests):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    timings, query_counts, statuses = [], [], set()
+    for _ in range(requests):
+        method, path, kwargs = request_for(endpoint, *setup)
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = call(client, method, path, kwargs)
+            timings.append(time.perf_counter() - started)
+        query_counts.append(len(queries))
+        statuses.add(response.status_code)
+
+    # Once more under tracemalloc, which would skew the timings
+    method, path, kwargs = request_for(endpoint, *setup)
+    tracemalloc.start()
+    call(client, method, path, kwargs)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    problems = []
+    if statuses != {endpoint.status}:
+        problems.append(f'status {sorted(statuses)}, expected {endpoint.status}')
+    if max(query_counts) > endpoint.budget:
+        problems.append(f'{max(query_counts)} queries, budget {endpoint.budget}')
+    return {
+        'name': endpoint.name,
+        'method': endpoint.method.upper(),
+        'path': endpoint.path,
+        'requests': requests,
+        'p50_ms': round(percentile(timings, 50) * 1000, 2),
+        'p95_ms': round(percentile(timings, 95) * 1000, 2),
+        'p99_ms': round(percentile(timings, 99) * 1000, 2),
+        'queries': max(query_counts),
+        'query_budget': endpoint.budget,
+        'python_peak_kb': traced_peak // 1024,
+        'problems': problems,
+    }
+
+
+def run(args):
+    """One data size, in this process; prints its results as JSON."""
+    setup_django(args.db)
+    from students import synthetic
+
+    started = time.perf_counter()
+    synthetic.seed(
+        students=max(50, args.run // PAYMENTS_PER_STUDENT), payments=args.run,
+        users=max(50, args.run // PAYMENTS_PER_USER), seed=args.seed,
+    )
+    seeded = time.perf_counter() - started
+
+    client = bench_client()
+    setup = fixtures()
+    results = [
+        measure(endpoint, client, setup, args.heavy_requests if endpoint.heavy else args.requests)
+        for endpoint in ENDPOINTS
+    ]
+    print(json.dumps({
+        'payments': args.run, 'seed_seconds': round(seeded, 1), 'peak_rss_kb': peak_rss_kb(), 'endpoints': results,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='Payments per run.')
+    parser.add_argument('--requests', type=int, default=20, help='Timed requests per endpoint.')
+    parser.add_argument('--heavy-requests', type=int, default=3,
+                        help='Timed requests for full exports and unpaginated lists.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_output.json')
+    parser.add_argument('--run', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        return run(args)
+
+    runs, over = [], []
+    for size in sorted(args.sizes):
+        with tempfile.TemporaryDirectory() as directory:
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.endpoints', '--run', str(size),
+                 '--db', os.path.join(directory, 'bench.sqlite3'), '--requests', str(args.requests),
+                 '--heavy-requests', str(args.heavy_requests), '--seed', str(args.seed)],
+                cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+            ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        runs.append(result)
+        print(f"\n{size} payments (seeded in {result['seed_seconds']}s, peak RSS "
+              f"{result['peak_rss_kb'] / 1024:.0f} MB)")
+        print(f"{'endpoint':<34} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'py peak KB':>11}")
+        for endpoint in result['endpoints']:
+            print(f"{endpoint['name']:<34} {endpoint['p50_ms']:>9} {endpoint['p95_ms']:>9} {endpoint['p99_ms']:>9} "
+                  f"{endpoint['queries']:>4}/{endpoint['query_budget']:<3} {endpoint['python_peak_kb']:>11}"
+                  + (f"  OVER: {'; '.join(endpoint['problems'])}" if endpoint['problems'] else ''))
+            over.extend(f"{size} payments, {endpoint['name']}: {problem}" for problem in endpoint['problems'])
+
+    write_report(args.output, {
+        'requests': args.requests, 'heavy_requests': args.heavy_requests, 'runs': runs, 'failures': over,
+    })
+    if over:
+        print('\nFailed:\n  ' + '\n  '.join(over))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Login throughput, including the password-hash cost.
+
+    python -m benchmarks.login_throughput --logins 100
+    python -m benchmarks.login_throughput --hasher md5 --hasher pbkdf2
+
+For each hasher, times ``check_password`` on its own and then full POSTs to
+/api/accounts/login/ through the test client, with and without a session.
+The hash dominates with production hashers; a fast hasher (``md5``, test
+environments only) shows what the rest of the login path costs.
+"""
+import argparse
+import time
+
+from benchmarks.common import percentile, setup_django, write_report
+
+HASHERS = {
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'md5': 'django.contrib.auth.hashers.MD5PasswordHasher',
+}
+EMAIL = 'login-bench@example.com'
+PASSWORD = 'bench-pass-123'
+
+
+def time_calls(func, count):
+    timings = []
+    for _ in range(count):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def summarize(name, timings, queries):
+    result = {
+        'name': name,
+        'per_second': round(len(timings) / sum(timings), 1),
+        'p50_ms': round(percentile(timings, 50) * 1000, 2),
+        'p99_ms': round(percentile(timings, 99) * 1000, 2),
+        'queries_per_call': round(queries / len(timings), 2),
+    }
+    print(f"{name:<34} {result['per_second']:>9}/s  p50 {result['p50_ms']:>8}ms  "
+          f"p99 {result['p99_ms']:>8}ms  {result['queries_per_call']} queries")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=100)
+    parser.add_argument(
+        '--hasher', action='append',
+        help=f'{", ".join(HASHERS)} or a hasher class path; repeatable (default: pbkdf2 and md5).',
+    )
+    parser.add_argument('--db', help='Reuse this scratch database instead of a new temp file.')
+    parser.add_argument('--output', default='bench_output.json')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.test import override_settings
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.test import APIClient
+
+    User = get_user_model()
+    results = []
+    for hasher in args.hasher or ['pbkdf2', 'md5']:
+        with override_settings(PASSWORD_HASHERS=[HASHERS.get(hasher, hasher)]):
+            user, _ = User.objects.get_or_create(
+                email=EMAIL, defaults={'username': 'login-bench', 'is_approved': 'approved'},
+            )
+            user.set_password(PASSWORD)
+            user.save()
+
+            timings = time_calls(lambda: user.check_password(PASSWORD), args.logins)
+            results.append(summarize(f'{hasher}: check_password', timings, 0))
+
+            for session in (True, False):
+                client = APIClient()
+                data = {'email': EMAIL, 'password': PASSWORD, 'session': session}
+
+                def login():
+                    response = client.post('/api/accounts/login/', data, format='json')
+                    assert response.status_code == 200, response.content
+
+                login()
+                with CaptureQueriesContext(connection) as queries:
+                    timings = time_calls(login, args.logins)
+                name = f'{hasher}: login ({"session" if session else "token only"})'
+                results.append(summarize(name, timings, len(queries)))
+
+    write_report(args.output, {'logins': args.logins, 'results': results})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Time ``students.overdue.run`` against a large student table.
+
+    python -m benchmarks.overdue --students 50000
+
+The first run flags every term that has fallen due; the second is the
+steady state the hourly job sees (nothing changes), and the last reads the
+first page of /api/payments/overdue/.
+"""
+import argparse
+import datetime
+import time
+
+from benchmarks.common import bench_client, setup_django, top_up_payments, write_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=50000)
+    parser.add_argument(
+        '--date', help='Run as of this date (YYYY-MM-DD) in the current academic year; default 15 January of it.',
+    )
+    parser.add_argument('--db', help='Reuse this scratch database instead of a new temp file.')
+    parser.add_argument('--output', default='bench_output.json')
+    args = parser.parse_args()
+
+    setup_django(args.db)
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from students import overdue
+    from students.models import Student, StudentTermLedger
+    from students.years import current_academic_year
+
+    # One payment per student
+    top_up_payments(args.students, students_per_payment=1)
+    today = datetime.date.fromisoformat(args.date) if args.date else datetime.date(current_academic_year() + 1, 1, 15)
+    StudentTermLedger.objects.update(overdue=False, due_date=None)
+
+    report = {'students': Student.objects.count(), 'term_rows': StudentTermLedger.objects.count(), 'runs': []}
+    for label in ('first', 'steady'):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            result = overdue.run(today=today)
+            elapsed = time.perf_counter() - started
+        report['runs'].append({'run': label, 'seconds': round(elapsed, 3), 'queries': len(queries), **result})
+        print(f'{label:>7}: {elapsed:.3f}s, {len(queries)} queries, {result}')
+
+    client = bench_client()
+    started = time.perf_counter()
+    response = client.get('/api/payments/overdue/', {'limit': 50})
+    elapsed = time.perf_counter() - started
+    report['endpoint'] = {'status': response.status_code, 'seconds': round(elapsed, 4)}
+    print(f'endpoint: {response.status_code} in {elapsed * 1000:.1f}ms')
+
+    write_report(args.output, report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Peak memory of GET /api/payments/ streamed vs. buffered.
+
+    python -m benchmarks.streaming_memory --sizes 1000 10000 100000 500000
+
+Each measurement runs in a fresh subprocess so its peak RSS is not polluted
+by earlier runs; tracemalloc's peak of Python allocations is reported too.
+Buffered runs are skipped above --max-buffered rows.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from benchmarks.common import bench_client, peak_rss_kb, setup_django, top_up_payments, write_report
+
+MODES = {
+    'buffered': {},
+    'stream': {'stream': '1'},
+    'ndjson': {'format': 'ndjson'},
+}
+
+
+def measure(db_path, mode):
+    setup_django(db_path, migrate=False)
+    client = bench_client()
+    baseline = peak_rss_kb()
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = client.get('/api/payments/', MODES[mode])
+    if response.streaming:
+        size = sum(len(chunk) for chunk in response.streaming_content)
+    else:
+        size = len(response.content)
+    elapsed = time.perf_counter() - started
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(json.dumps({
+        'mode': mode,
+        'status': response.status_code,
+        'bytes': size,
+        'seconds': round(elapsed, 3),
+        'baseline_rss_kb': baseline,
+        'peak_rss_kb': peak_rss_kb(),
+        'python_peak_kb': traced_peak // 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--max-buffered', type=int, default=100000)
+    parser.add_argument('--db', help='Reuse this scratch database instead of a new temp file.')
+    parser.add_argument('--output', default='bench_output.json')
+    parser.add_argument('--measure', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.db, args.measure)
+        return
+
+    db_path = setup_django(args.db)
+    results = []
+    print(f"{'rows':>8} {'mode':>9} {'seconds':>8} {'peak RSS MB':>12} {'RSS growth MB':>14} {'py peak MB':>11}")
+    for size in sorted(args.sizes):
+        top_up_payments(size)
+        for mode in MODES:
+            if mode == 'buffered' and size > args.max_buffered:
+                continue
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.streaming_memory', '--measure', mode, '--db', db_path],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            result['rows'] = size
+            results.append(result)
+            print(f"{size:>8} {mode:>9} {result['seconds']:>8} {result['peak_rss_kb'] / 1024:>12.1f} "
+                  f"{(result['peak_rss_kb'] - result['baseline_rss_kb']) / 1024:>14.1f} "
+                  f"{result['python_peak_kb'] / 1024:>11.1f}")
+    write_report(args.output, {'database': db_path, 'results': results})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Concurrent payment writes against SQLite, by database profile.
+
+    python -m benchmarks.write_concurrency --threads 8 --writes 50
+
+Each configuration runs in a fresh process and scratch database: N threads
+each create ``--writes`` payments (with the ledger signals, as the API
+does), each in its own transaction. Reports throughput, latency
+percentiles and how many writes failed with "database is locked".
+
+Configurations:
+  default           the development settings, plain atomic() writes
+  production        DJANGO_DB_PROFILE=production, plain atomic() writes
+  production+queue  DJANGO_DB_PROFILE=production, writes via core.writes.run_write
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+from benchmarks.common import PROJECT_ROOT, percentile, setup_django, write_report
+
+CONFIGURATIONS = {
+    'default': ('development', False),
+    'production': ('production', False),
+    'production+queue': ('production', True),
+}
+
+
+def seed(students):
+    from django.core.management import call_command
+    from students.models import FeeStructure, Student
+
+    FeeStructure.objects.get_or_create(grade='5', board='CBSE', defaults={'fee_amount': Decimal('40000')})
+    Student.objects.bulk_create([
+        Student(
+            first_name=f'Writer{i}', last_name='Bench', grade='5', board='CBSE',
+            parent_name='Parent Bench', parent_contact_primary='9000000000',
+        )
+        for i in range(students)
+    ])
+    call_command('reconcile_ledger', verbosity=0)
+    return list(Student.objects.values_list('id', flat=True))
+
+
+def run(args):
+    """One configuration, in this process; prints its result as JSON."""
+    setup_django(args.db)
+    from django.db import OperationalError, connection, transaction
+    from core import writes
+    from students.models import Payment
+
+    student_ids = seed(args.students)
+    use_queue = CONFIGURATIONS[args.run][1]
+    timings, failures = [], []
+    lock = threading.Lock()
+
+    def create_payment(student_id):
+        Payment.objects.create(
+            student_id=student_id, payment_mode='Cash', payment_term='Term 1',
+            amount_paid=Decimal('500.00'), amount_due=Decimal('10000.00'),
+        )
+
+    def writer(index):
+        mine, failed = [], 0
+        try:
+            for i in range(args.writes):
+                student_id = student_ids[(index * args.writes + i) % len(student_ids)]
+                started = time.perf_counter()
+                try:
+                    if use_queue:
+                        writes.run_write(create_payment, student_id)
+                    else:
+                        with transaction.atomic():
+                            create_payment(student_id)
+                except OperationalError:
+                    failed += 1
+                mine.append(time.perf_counter() - started)
+        finally:
+            connection.close()
+        with lock:
+            timings.extend(mine)
+            failures.append(failed)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    attempted = args.threads * args.writes
+    failed = sum(failures)
+    print(json.dumps({
+        'name': args.run,
+        'attempted': attempted,
+        'failed': failed,
+        'committed': Payment.objects.count(),
+        'writes_per_second': round((attempted - failed) / elapsed, 1),
+        'p50_ms': round(percentile(timings, 50) * 1000, 2),
+        'p99_ms': round(percentile(timings, 99) * 1000, 2),
+        'max_ms': round(max(timings) * 1000, 2),
+        'retries': writes.stats['retries'],
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--writes', type=int, default=50, help='Payments per thread.')
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--config', action='append', choices=list(CONFIGURATIONS),
+                        help='Configuration to run; repeatable (default: all).')
+    parser.add_argument('--output', default='bench_output.json')
+    parser.add_argument('--run', choices=list(CONFIGURATIONS), help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        return run(args)
+
+    results = []
+    for name in args.config or list(CONFIGURATIONS):
+        with tempfile.TemporaryDirectory() as directory:
+            env = {**os.environ, 'DJANGO_DB_PROFILE': CONFIGURATIONS[name][0]}
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.write_concurrency', '--run', name,
+                 '--db', os.path.join(directory, 'bench.sqlite3'), '--threads', str(args.threads),
+                 '--writes', str(args.writes), '--students', str(args.students)],
+                cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, check=True,
+            ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        results.append(result)
+        print(f"{name:<18} {result['writes_per_second']:>8}/s  failed {result['failed']:>4}/{result['attempted']}  "
+              f"p50 {result['p50_ms']:>8}ms  p99 {result['p99_ms']:>8}ms  max {result['max_ms']:>8}ms  "
+              f"retries {result['retries']}")
+
+    write_report(args.output, {'threads': args.threads, 'writes': args.writes, 'results': results})
+
+
+if __name__ == '__main__':
+    main()
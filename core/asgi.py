@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# Route the hot read endpoints to their async views (set to 0 to opt out)
+os.environ.setdefault('DJANGO_ASYNC_READ_VIEWS', '1')
 
 application = get_asgi_application()
+
+# Periodic jobs (overdue checks) run in a background thread of each server process
+from students.jobs import start_scheduler  # noqa: E402
+
+start_scheduler()
@@ -0,0 +1,109 @@
+"""
+Helpers for native async read endpoints.
+
+DRF views are synchronous: under an ASGI server every request to one of them
+is handed to a worker thread. ``async_read_view`` pairs an ``async def``
+handler for plain JSON GETs with the existing DRF view, which still serves
+every other method and anything the async handler does not support (the
+browsable API, ``?format=``, pagination, streaming). Both give the same
+response body.
+
+Authentication mirrors the project's DRF settings: a ``Token`` header
+(through the same token cache as ``accounts.authentication``), then the
+session. Async views are only routed when ``settings.ASYNC_READ_VIEWS``
+is set, which ``core.asgi`` does; WSGI deployments keep the sync views.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from rest_framework.authtoken.models import Token
+from rest_framework.utils.encoders import JSONEncoder
+
+from accounts.authentication import token_cache
+
+from .conditional import REVALIDATE, apply_validators, conditional_response
+
+# Query parameters only the sync (DRF) views understand
+SYNC_ONLY_PARAMS = ('format', 'stream', 'limit', 'cursor', 'fields', 'omit')
+
+
+class NotAuthenticated(Exception):
+    def __init__(self, detail):
+        super().__init__(detail)
+        self.detail = detail
+
+
+def json_response(data, status=200, **kwargs):
+    """Serialize like DRF's JSONRenderer, so bodies match the sync views byte for byte."""
+    content = json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+    return HttpResponse(content, status=status, content_type='application/json', **kwargs)
+
+
+async def authenticate(request):
+    """
+    The authenticated user, as TokenAuthentication then SessionAuthentication
+    would find it. Raises NotAuthenticated.
+    """
+    header = request.headers.get('Authorization', '').split()
+    if header and header[0].lower() == 'token':
+        if len(header) != 2:
+            raise NotAuthenticated('Invalid token header. Token string should not contain spaces.')
+        cached = token_cache.get(header[1])
+        if cached is not None:
+            return cached[0]
+        try:
+            token = await Token.objects.select_related('user').aget(key=header[1])
+        except Token.DoesNotExist:
+            raise NotAuthenticated('Invalid token.')
+        if not token.user.is_active:
+            raise NotAuthenticated('User inactive or deleted.')
+        token_cache.put(token.key, token.user, token)
+        return token.user
+    user = await request.auser()
+    if not user.is_authenticated:
+        raise NotAuthenticated('Authentication credentials were not provided.')
+    return user
+
+
+def wants_sync(request):
+    if request.method != 'GET':
+        return True
+    if any(param in request.GET for param in SYNC_ONLY_PARAMS):
+        return True
+    # Browsers get the browsable API
+    return 'text/html' in request.headers.get('Accept', '')
+
+
+def async_read_view(handler, sync_view, use_sync=None, validators=None, cache_control=REVALIDATE):
+    """
+    A view that answers GETs with ``handler(request, user, *args, **kwargs)``
+    and passes anything else (or anything ``use_sync(request)`` claims) to
+    ``sync_view``. ``validators`` is an optional coroutine function returning
+    the request's ``core.conditional.Validators``, as ConditionalGetMixin uses.
+    """
+    run_sync = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        if wants_sync(request) or (use_sync and use_sync(request)):
+            return await run_sync(request, *args, **kwargs)
+        try:
+            user = await authenticate(request)
+        except NotAuthenticated as e:
+            return json_response({'detail': e.detail}, status=401, headers={'WWW-Authenticate': 'Token'})
+        request.user = user
+        current = await validators(request) if validators else None
+        response = conditional_response(request, current)
+        if response is None:
+            try:
+                response = await handler(request, user, *args, **kwargs)
+            except Http404:
+                return json_response({'detail': 'Not found.'}, status=404)
+        if response.status_code in (200, 304):
+            apply_validators(response, current, cache_control)
+        return response
+
+    # The DRF view does its own CSRF checks for session-authenticated writes
+    view.csrf_exempt = True
+    view.__name__ = handler.__name__
+    return view
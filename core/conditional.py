@@ -0,0 +1,80 @@
+"""
+Conditional GET support (ETag / Last-Modified) for DRF views.
+
+``ConditionalGetMixin`` asks the view for a ``Validators`` pair once
+authentication and permission checks have passed. If the request's
+``If-None-Match``/``If-Modified-Since`` already match, a 304 is returned
+before the queryset is touched or anything is serialized; otherwise the
+validators are added to the normal response. How the validators are
+computed is up to the view (see ``students.conditional``).
+"""
+from collections import namedtuple
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+Validators = namedtuple('Validators', ['etag', 'last_modified'])
+
+# Clients may keep a copy but must revalidate it before every use
+REVALIDATE = {'private': True, 'no_cache': True}
+
+
+def _timestamp(validators):
+    if validators.last_modified is None:
+        return None
+    return int(validators.last_modified.timestamp())
+
+
+def conditional_response(request, validators):
+    """A 304 (or 412) response if the request's validators match, else None."""
+    if validators is None:
+        return None
+    return get_conditional_response(
+        request, etag=quote_etag(validators.etag), last_modified=_timestamp(validators),
+    )
+
+
+def apply_validators(response, validators, cache_control=None):
+    if validators is None:
+        return response
+    response['ETag'] = quote_etag(validators.etag)
+    if validators.last_modified is not None:
+        response['Last-Modified'] = http_date(_timestamp(validators))
+    if cache_control:
+        patch_cache_control(response, **cache_control)
+    return response
+
+
+class _Conditional(Exception):
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+class ConditionalGetMixin:
+    conditional_actions = ('list', 'retrieve')
+    cache_control = REVALIDATE
+
+    def get_validators(self, request):
+        """Return ``Validators`` for the current action, or None to skip."""
+        raise NotImplementedError
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.validators = None
+        if request.method in ('GET', 'HEAD') and self.action in self.conditional_actions:
+            self.validators = self.get_validators(request)
+            response = conditional_response(request, self.validators)
+            if response is not None:
+                raise _Conditional(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, _Conditional):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if response.status_code in (200, 304):
+            apply_validators(response, getattr(self, 'validators', None), self.cache_control)
+        return response
@@ -0,0 +1,96 @@
+"""
+Read/write routing between ``default`` and a read replica.
+
+With READ_REPLICA enabled, ``ReplicaRoutingMiddleware`` marks each GET/HEAD
+request as read-only, and ``ReadReplicaRouter`` sends that request's reads
+of REPLICA_APPS models (students, payments, fees, ledgers) to the
+``replica`` alias. Everything else uses ``default``: requests that change
+data, users and tokens (so a freshly issued token always authenticates),
+background jobs and management commands.
+
+A request stays on ``default`` for the rest of its life once it writes, so
+it reads what it has just written. The replica is a local SQLite copy kept
+fresh by ``manage.py sync_replica``; reads from it may lag by up to its
+sync interval.
+"""
+import contextvars
+import sqlite3
+
+from django.conf import settings
+
+REPLICA = 'replica'
+DEFAULT = 'default'
+
+
+class RequestState:
+    __slots__ = ('read_only', 'wrote')
+
+    def __init__(self, read_only):
+        self.read_only = read_only
+        # Set by the router; a shared object rather than a contextvar value,
+        # so writes made in sync_to_async threads count too
+        self.wrote = False
+
+
+_state = contextvars.ContextVar('db_routing', default=None)
+
+
+def activate(read_only):
+    return _state.set(RequestState(read_only))
+
+
+def deactivate(token):
+    _state.reset(token)
+
+
+def current():
+    return _state.get()
+
+
+class ReadReplicaRouter:
+    def routes(self, model):
+        return settings.READ_REPLICA and model._meta.app_label in settings.REPLICA_APPS
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is not None and state.read_only and not state.wrote and self.routes(model):
+            return REPLICA
+        return DEFAULT
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of default, schema included
+        return db != REPLICA
+
+
+def sync_replica(source=None, target=None, pages=-1):
+    """
+    Copy the ``default`` SQLite database over the replica with SQLite's
+    online backup API. ``pages=-1`` copies in one step, which in WAL mode
+    never blocks writers. Smaller steps let writers in between but restart
+    whenever the source changes. Returns the number of pages copied.
+    """
+    source = str(source or settings.DATABASES[DEFAULT]['NAME'])
+    target = str(target or settings.DATABASES[REPLICA]['NAME'])
+    if source == target:
+        raise ValueError('The replica must be a different file from the default database')
+    timeout = settings.DB_BUSY_TIMEOUT
+    src = sqlite3.connect(source, timeout=timeout)
+    try:
+        dst = sqlite3.connect(target, timeout=timeout)
+        try:
+            src.backup(dst, pages=pages)
+            return dst.execute('PRAGMA page_count').fetchone()[0]
+        finally:
+            dst.close()
+    finally:
+        src.close()
@@ -0,0 +1,173 @@
+"""
+Structured, non-blocking logging.
+
+Loggers hand records to ``QueueHandler``, which only puts them on an
+in-memory queue; a ``QueueListener`` thread per process formats them and
+writes them to the real handlers (stderr, files) named in its config. A slow
+disk or pipe therefore never holds up a request thread.
+
+Formatting is lazy: pass %-style arguments (``logger.debug('data: %s',
+data)``) rather than f-strings. Nothing is built for records below the
+logger's level, and the message is interpolated in the listener thread.
+``RedactFilter`` runs before the record is queued: it replaces the values
+of sensitive keys (passwords, tokens, ...) in dict/list arguments and
+``extra`` fields with copies, so secrets never reach a handler and later
+changes to the caller's objects don't leak into the output.
+
+``JSONFormatter`` writes one JSON object per record; ``SamplingFilter``
+keeps a fraction of a noisy logger's low-level records. See LOGGING in
+core.settings for the wiring, per-logger levels and sampling rates.
+"""
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+
+REDACTED = '[REDACTED]'
+SENSITIVE_KEY = re.compile(r'password|token|secret|authorization|cookie|session|^key$', re.IGNORECASE)
+
+# Attributes every LogRecord has; anything else came from ``extra``
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+
+def redact(value):
+    """A copy of ``value`` with the values of sensitive keys replaced, at any depth."""
+    if isinstance(value, Mapping):
+        return {
+            key: REDACTED if isinstance(key, str) and SENSITIVE_KEY.search(key) else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return type(value)(redact(item) for item in value)
+    return value
+
+
+def _extra_fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+
+
+class RedactFilter(logging.Filter):
+    def filter(self, record):
+        if isinstance(record.args, (Mapping, tuple)):
+            record.args = redact(record.args)
+        for key, value in _extra_fields(record).items():
+            setattr(record, key, REDACTED if SENSITIVE_KEY.search(key) else redact(value))
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep ``rate`` of the records at ``level`` or below; always keep the rest."""
+
+    def __init__(self, rate, level='INFO'):
+        super().__init__()
+        self.rate = float(rate)
+        self.levelno = logging.getLevelName(level) if isinstance(level, str) else level
+
+    def filter(self, record):
+        return record.levelno > self.levelno or random.random() < self.rate
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc)
+            .isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+            **_extra_fields(record),
+        }
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            data['stack_info'] = self.formatStack(record.stack_info)
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+class RotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    ``RotatingFileHandler`` that creates the file's directory when it opens
+    it, so configuring logging doesn't touch the filesystem (with
+    ``delay=True``, nothing happens until the first record).
+    """
+
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        return super()._open()
+
+    def redirect(self, filename):
+        """Write to ``filename`` from the next record on."""
+        with self.lock:
+            if self.stream is not None:
+                self.stream.close()
+                self.stream = None
+            self.baseFilename = os.path.abspath(filename)
+
+
+def _handler_by_name(name):
+    if hasattr(logging, 'getHandlerByName'):  # Python 3.12+
+        return logging.getHandlerByName(name)
+    return logging._handlers.get(name)
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue records for a listener thread that passes them to the handlers
+    named in ``handlers``. Those must already be configured: dictConfig
+    sets handlers up in name order, hence names like ``stderr_queue``. The
+    listener starts with the first record in each process, so forked
+    workers get their own.
+    """
+
+    def __init__(self, handlers):
+        super().__init__(queue.SimpleQueue())
+        # Named handlers are only weakly referenced by the logging module
+        self.targets = []
+        for name in handlers:
+            target = _handler_by_name(name)
+            if target is None:
+                raise ValueError(f'Handler {name!r} must be configured before the queue handler using it')
+            self.targets.append(target)
+        self.listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # A queue and thread inherited through fork are of no use here
+            self.queue = queue.SimpleQueue()
+            self.listener = logging.handlers.QueueListener(self.queue, *self.targets, respect_handler_level=True)
+            self.listener.start()
+            self._pid = os.getpid()
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self.start()
+        super().emit(record)
+
+    def prepare(self, record):
+        # The stdlib formats here, in the caller's thread; the listener does it instead
+        return record
+
+    def flush(self):
+        """Wait until the listener has handled everything queued so far."""
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+            self.listener.start()
+
+    def close(self):
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+            self._pid = None
+        super().close()
@@ -0,0 +1,303 @@
+"""
+Request metrics aggregated across worker processes.
+
+Each process accumulates counters in ``registry``: per route (the resolved
+URL name, e.g. ``student-detail``) and method, the request count, latency
+and DB-query histograms and error counts by status, plus hit/miss counts of
+the registered caches. ``PerformanceMiddleware`` feeds it one observation
+per request.
+
+Every ``METRICS_FLUSH_INTERVAL`` seconds a daemon thread writes the
+process's cumulative totals to one row of a small SQLite file
+(``METRICS_DB``) shared by the workers on this host, keyed by the pid and
+a random id made once per process: gunicorn recycles workers
+(``max_requests``), and a new one may get the pid of one whose row is still
+there. ``merged()`` sums the rows; rows of processes that have exited are
+folded into a ``retired`` row so their counts survive restarts.
+``render()`` formats the result in the Prometheus text exposition format
+for /api/metrics.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+RETIRED = 'retired'
+UNMATCHED_ROUTE = '<unmatched>'
+
+
+def _bucket(buckets, value):
+    for index, bound in enumerate(buckets):
+        if value <= bound:
+            return index
+    return len(buckets)
+
+
+def _new_route():
+    return {
+        'count': 0,
+        'latency': [0] * (len(LATENCY_BUCKETS) + 1),
+        'latency_sum': 0.0,
+        'queries': [0] * (len(QUERY_BUCKETS) + 1),
+        'queries_sum': 0,
+        'errors': {},
+    }
+
+
+def merge(total, snapshot):
+    """Add ``snapshot`` (as returned by ``Registry.snapshot``) into ``total``."""
+    for key, route in snapshot.get('routes', {}).items():
+        into = total['routes'].setdefault(key, _new_route())
+        into['count'] += route['count']
+        into['latency_sum'] += route['latency_sum']
+        into['queries_sum'] += route['queries_sum']
+        for name in ('latency', 'queries'):
+            into[name] = [a + b for a, b in zip(into[name], route[name])]
+        for status, count in route['errors'].items():
+            into['errors'][status] = into['errors'].get(status, 0) + count
+    for name, (hits, misses) in snapshot.get('caches', {}).items():
+        previous = total['caches'].get(name, (0, 0))
+        total['caches'][name] = (previous[0] + hits, previous[1] + misses)
+    return total
+
+
+def empty():
+    return {'routes': {}, 'caches': {}, 'workers': 0}
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._cache_sources = {}
+        self._flusher_pid = None
+        self._worker = None
+
+    def observe(self, route, method, status, duration, queries):
+        key = f'{route} {method}'
+        with self._lock:
+            data = self._routes.get(key)
+            if data is None:
+                data = self._routes[key] = _new_route()
+            data['count'] += 1
+            data['latency'][_bucket(LATENCY_BUCKETS, duration)] += 1
+            data['latency_sum'] += duration
+            data['queries'][_bucket(QUERY_BUCKETS, queries)] += 1
+            data['queries_sum'] += queries
+            if status >= 400:
+                data['errors'][str(status)] = data['errors'].get(str(status), 0) + 1
+
+    def register_cache(self, name, source):
+        """``source()`` returns this process's cumulative (hits, misses) for cache ``name``."""
+        self._cache_sources[name] = source
+
+    def snapshot(self):
+        with self._lock:
+            routes = json.loads(json.dumps(self._routes))
+        caches = {name: tuple(source()) for name, source in self._cache_sources.items()}
+        return {'routes': routes, 'caches': caches}
+
+    def worker(self):
+        """This process's key in the store; made anew after a fork."""
+        pid = os.getpid()
+        if self._worker is None or self._worker[0] != pid:
+            self._worker = (pid, f'pid:{pid}:{uuid.uuid4().hex}')
+        return self._worker
+
+    def reset(self):
+        with self._lock:
+            self._routes = {}
+
+    def ensure_flusher(self):
+        """Start this process's flush thread, once per process (also after a fork)."""
+        pid = os.getpid()
+        if self._flusher_pid == pid or not settings.METRICS_FLUSH_INTERVAL:
+            return
+        with self._lock:
+            if self._flusher_pid == pid:
+                return
+            self._flusher_pid = pid
+        threading.Thread(target=self._flush_forever, name='metrics-flush', daemon=True).start()
+
+    def _flush_forever(self):
+        while True:
+            try:
+                flush(self)
+            except Exception:
+                logger.exception('Writing metrics failed')
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+
+
+registry = Registry()
+
+
+def _connect():
+    Path(settings.METRICS_DB).parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(settings.METRICS_DB, timeout=5, isolation_level=None)
+    db.execute(
+        'CREATE TABLE IF NOT EXISTS worker_metrics '
+        '(worker TEXT PRIMARY KEY, pid INTEGER, updated REAL, data TEXT)'
+    )
+    return db
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def flush(source=registry):
+    """Write this process's totals to the shared store."""
+    pid, worker = source.worker()
+    db = _connect()
+    try:
+        db.execute(
+            'INSERT OR REPLACE INTO worker_metrics VALUES (?, ?, ?, ?)',
+            (worker, pid, time.time(), json.dumps(source.snapshot())),
+        )
+    finally:
+        db.close()
+
+
+def _retire_exited(db):
+    rows = db.execute(
+        'SELECT worker, pid, updated, data FROM worker_metrics WHERE worker != ?', (RETIRED,),
+    ).fetchall()
+    # Of rows sharing a pid only the latest can be a live process; the others exited before it started
+    latest = {}
+    for worker, pid, updated, data in rows:
+        latest[pid] = max(updated, latest.get(pid, updated))
+    exited = [
+        (worker, data) for worker, pid, updated, data in rows
+        if updated < latest[pid] or not _alive(pid)
+    ]
+    if not exited:
+        return
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        row = db.execute('SELECT data FROM worker_metrics WHERE worker = ?', (RETIRED,)).fetchone()
+        retired = merge(empty(), json.loads(row[0])) if row else empty()
+        for worker, data in exited:
+            merge(retired, json.loads(data))
+        db.execute(
+            'INSERT OR REPLACE INTO worker_metrics VALUES (?, 0, ?, ?)',
+            (RETIRED, time.time(), json.dumps({'routes': retired['routes'], 'caches': retired['caches']})),
+        )
+        db.executemany('DELETE FROM worker_metrics WHERE worker = ?', [(worker,) for worker, _ in exited])
+        db.execute('COMMIT')
+    except BaseException:
+        db.execute('ROLLBACK')
+        raise
+
+
+def merged():
+    """Totals over every worker that has written to the store, this one included."""
+    flush()
+    db = _connect()
+    try:
+        _retire_exited(db)
+        rows = db.execute('SELECT worker, data FROM worker_metrics').fetchall()
+    finally:
+        db.close()
+    total = empty()
+    for worker, data in rows:
+        merge(total, json.loads(data))
+        if worker != RETIRED:
+            total['workers'] += 1
+    return total
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels.items())
+
+
+def _histogram(lines, name, buckets, counts, total, labels):
+    cumulative = 0
+    for bound, count in zip([*buckets, '+Inf'], counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_sum{{{labels}}} {total}')
+    lines.append(f'{name}_count{{{labels}}} {cumulative}')
+
+
+def render(totals):
+    """Prometheus text exposition of ``merged()`` output."""
+    lines = []
+
+    def header(name, kind, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    routes = sorted(totals['routes'].items())
+    header('samayee_http_requests_total', 'counter', 'Requests served, by route and method.')
+    for key, data in routes:
+        route, method = key.rsplit(' ', 1)
+        lines.append(f'samayee_http_requests_total{{{_labels(route=route, method=method)}}} {data["count"]}')
+
+    header('samayee_http_errors_total', 'counter', 'Responses with a 4xx/5xx status, by route, method and status.')
+    for key, data in routes:
+        route, method = key.rsplit(' ', 1)
+        for status, count in sorted(data['errors'].items()):
+            lines.append(
+                f'samayee_http_errors_total{{{_labels(route=route, method=method, status=status)}}} {count}'
+            )
+
+    header('samayee_http_request_duration_seconds', 'histogram', 'Request wall time.')
+    for key, data in routes:
+        route, method = key.rsplit(' ', 1)
+        _histogram(
+            lines, 'samayee_http_request_duration_seconds', LATENCY_BUCKETS,
+            data['latency'], round(data['latency_sum'], 6), _labels(route=route, method=method),
+        )
+
+    header('samayee_http_request_queries', 'histogram', 'Database queries per request.')
+    for key, data in routes:
+        route, method = key.rsplit(' ', 1)
+        _histogram(
+            lines, 'samayee_http_request_queries', QUERY_BUCKETS,
+            data['queries'], data['queries_sum'], _labels(route=route, method=method),
+        )
+
+    caches = sorted(totals['caches'].items())
+    header('samayee_cache_hits_total', 'counter', 'Cache hits, summed over workers.')
+    for name, (hits, misses) in caches:
+        lines.append(f'samayee_cache_hits_total{{{_labels(cache=name)}}} {hits}')
+    header('samayee_cache_misses_total', 'counter', 'Cache misses, summed over workers.')
+    for name, (hits, misses) in caches:
+        lines.append(f'samayee_cache_misses_total{{{_labels(cache=name)}}} {misses}')
+    header('samayee_cache_hit_ratio', 'gauge', 'Hits over lookups since the workers started.')
+    for name, (hits, misses) in caches:
+        ratio = hits / (hits + misses) if hits + misses else 0
+        lines.append(f'samayee_cache_hit_ratio{{{_labels(cache=name)}}} {round(ratio, 4)}')
+
+    header('samayee_workers_active', 'gauge', 'Worker processes currently reporting metrics.')
+    lines.append(f'samayee_workers_active {totals["workers"]}')
+    return '\n'.join(lines) + '\n'
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        # Errors (401/403) arrive as a dict
+        return json.dumps(data).encode(self.charset)
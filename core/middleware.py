@@ -1,9 +1,137 @@
+import json
+import logging
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
 from django.middleware.csrf import CsrfViewMiddleware
 from django.utils.deprecation import MiddlewareMixin
 
+from . import db_router, metrics, perf
+
+slow_logger = logging.getLogger('core.perf.slow')
+
 class CsrfExemptMiddleware(MiddlewareMixin):
     def process_request(self, request):
         # Exempt API endpoints from CSRF protection
         if request.path.startswith('/api/'):
             setattr(request, '_dont_enforce_csrf_checks', True)
-        return None 
\ No newline at end of file
+        return None
+
+
+class PerformanceMiddleware:
+    """
+    Adds a ``Server-Timing`` header (wall time, DB time and query count,
+    render time, response size) and logs slow requests with their SQL to the
+    ``core.perf.slow`` logger.
+
+    Wall time and query count are measured for every request and recorded
+    in ``core.metrics``. Database and render timings are only collected for
+    a ``PERF_SAMPLE_RATE`` fraction of requests; a slow unsampled request is
+    still logged, without SQL. Should be first in MIDDLEWARE so its wall
+    time covers the other middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Report idle workers too; finish() restarts it in forked children
+        metrics.registry.ensure_flusher()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Keep the handler from running this hook in a thread under ASGI
+            self.process_template_response = self.aprocess_template_response
+
+    def start(self, request):
+        sampled = random.random() < settings.PERF_SAMPLE_RATE
+        stats = perf.RequestStats(sampled, settings.SLOW_REQUEST_MAX_QUERIES)
+        request._perf = stats
+        return stats
+
+    def finish(self, request, response, stats):
+        stats.finish(response)
+        response['Server-Timing'] = stats.server_timing()
+        match = request.resolver_match
+        metrics.registry.observe(
+            match.view_name if match else metrics.UNMATCHED_ROUTE, request.method,
+            response.status_code, stats.duration, stats.query_count,
+        )
+        metrics.registry.ensure_flusher()
+        if stats.duration * 1000 >= settings.SLOW_REQUEST_MS:
+            slow_logger.warning(
+                'Slow request %s %s %s %.1fms %s', request.method, request.get_full_path(),
+                response.status_code, stats.duration * 1000, _LazyJSON(stats.as_dict),
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = self.start(request)
+        perf.install_current_connections()
+        token = perf.activate(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            perf.deactivate(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = self.start(request)
+        token = perf.activate(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            perf.deactivate(token)
+        return self.finish(request, response, stats)
+
+    def process_template_response(self, request, response):
+        # Called just before DRF/template responses are rendered
+        stats = getattr(request, '_perf', None)
+        if stats is not None and stats.sampled:
+            stats.render_start()
+            response.add_post_render_callback(lambda rendered: stats.render_end())
+        return response
+
+    async def aprocess_template_response(self, request, response):
+        return PerformanceMiddleware.process_template_response(self, request, response)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets ``core.db_router`` send the reads of GET/HEAD requests to the read
+    replica. Requests that change data read from ``default`` throughout.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = db_router.activate(request.method in ('GET', 'HEAD'))
+        try:
+            return self.get_response(request)
+        finally:
+            db_router.deactivate(token)
+
+    async def __acall__(self, request):
+        token = db_router.activate(request.method in ('GET', 'HEAD'))
+        try:
+            return await self.get_response(request)
+        finally:
+            db_router.deactivate(token)
+
+
+class _LazyJSON:
+    """Serializes only if the log record is actually emitted."""
+    def __init__(self, factory):
+        self.factory = factory
+
+    def __str__(self):
+        return json.dumps(self.factory(), default=str)
@@ -0,0 +1,126 @@
+"""
+Per-request performance counters.
+
+``PerformanceMiddleware`` (core.middleware) creates a ``RequestStats`` for
+each request and makes it current in a context variable. Every database
+connection gets ``record_query`` as an execute wrapper when it is opened,
+which counts each statement against the current stats and, for sampled
+requests, times it. Context variables follow the request into
+``sync_to_async`` threads, so queries made by async views are counted too.
+
+Statements are kept by reference only (no formatting or copying); their
+text is only rendered when the request turns out to be slow.
+"""
+import contextvars
+import time
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    def __init__(self, sampled=True, max_queries=0):
+        self.started = time.perf_counter()
+        self.sampled = sampled
+        self.max_queries = max_queries
+        self.query_count = 0
+        self.db_time = 0.0
+        self.render_time = None
+        self.render_started = None
+        self.duration = None
+        self.size = None
+        self.queries = []
+
+    def add_query(self, sql, params, duration):
+        self.query_count += 1
+        self.db_time += duration
+        if len(self.queries) < self.max_queries:
+            self.queries.append((sql, params, duration))
+
+    def render_start(self):
+        self.render_started = time.perf_counter()
+
+    def render_end(self):
+        if self.render_started is not None:
+            self.render_time = time.perf_counter() - self.render_started
+
+    def finish(self, response):
+        self.duration = time.perf_counter() - self.started
+        if not response.streaming:
+            self.size = len(response.content)
+
+    def server_timing(self):
+        """The ``Server-Timing`` header value."""
+        metrics = [f'total;dur={self.duration * 1000:.1f}']
+        if self.sampled:
+            metrics.append(f'db;dur={self.db_time * 1000:.1f};desc="{self.query_count} queries"')
+            if self.render_time is not None:
+                metrics.append(f'render;dur={self.render_time * 1000:.1f}')
+        else:
+            metrics.append(f'db;desc="{self.query_count} queries"')
+        if self.size is not None:
+            metrics.append(f'size;desc="{self.size} bytes"')
+        return ', '.join(metrics)
+
+    def as_dict(self):
+        data = {
+            'duration_ms': round(self.duration * 1000, 1),
+            'size': self.size,
+            'queries': self.query_count,
+        }
+        if self.sampled:
+            data.update({
+                'db_ms': round(self.db_time * 1000, 1),
+                'render_ms': round(self.render_time * 1000, 1) if self.render_time is not None else None,
+                'sql': [
+                    {'sql': sql, 'params': repr(params), 'ms': round(duration * 1000, 2)}
+                    for sql, params, duration in self.queries
+                ],
+            })
+        return data
+
+
+def current():
+    return _current.get()
+
+
+def activate(stats):
+    return _current.set(stats)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    if not stats.sampled:
+        stats.query_count += 1
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(sql, params, time.perf_counter() - started)
+
+
+def install(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install_current_connections():
+    """Cover connections this thread opened before the signal was connected."""
+    for connection in connections.all(initialized_only=True):
+        install(connection)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    install(connection)
+
+
+connection_created.connect(_on_connection_created, dispatch_uid='core.perf.install')
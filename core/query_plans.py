@@ -0,0 +1,34 @@
+"""
+Helpers for checking SQLite query plans (``EXPLAIN QUERY PLAN``).
+
+``plan_problems`` flags the two regressions that matter on hot paths: a
+full table scan (``SCAN <table>`` without an index) and a sort done in a
+temporary B-tree for ``ORDER BY``. A ``SCAN ... USING INDEX`` walks an index
+in order, which is what a keyset page with a LIMIT wants, so it is allowed.
+"""
+import re
+
+from django.db import connections
+
+_PLAN_PREFIX = re.compile(r'^\d+ \d+ \d+ ')
+
+
+def explain(queryset):
+    """The query plan for ``queryset``, one step per line without the ids."""
+    return [_PLAN_PREFIX.sub('', line) for line in queryset.explain().splitlines()]
+
+
+def explain_sql(sql, params=(), using='default'):
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def is_full_scan(step):
+    return step.startswith('SCAN ') and ' USING ' not in step and 'CONSTANT ROW' not in step
+
+
+def plan_problems(plan):
+    """Plan steps that are full table scans or ORDER BY sorts."""
+    return [step for step in plan if is_full_scan(step) or 'TEMP B-TREE FOR ORDER BY' in step
+            or 'TEMP B-TREE FOR RIGHT PART OF ORDER BY' in step]
@@ -45,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -91,6 +93,51 @@ DATABASES = {
     }
 }
 
+# DJANGO_DB_PROFILE=production tunes SQLite for several workers writing at
+# once: WAL lets readers run alongside the writer, synchronous=NORMAL syncs
+# at checkpoints rather than every commit (safe with WAL), BEGIN IMMEDIATE
+# takes the write lock up front so a transaction never fails upgrading a
+# read lock, and writers wait up to DB_BUSY_TIMEOUT seconds for it.
+# Connections are kept for CONN_MAX_AGE seconds instead of one per request.
+DB_PROFILE = os.environ.get('DJANGO_DB_PROFILE', 'development')
+DB_BUSY_TIMEOUT = 20
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # KiB
+    'temp_store': 'MEMORY',
+}
+SQLITE_PRODUCTION_OPTIONS = {
+    'timeout': DB_BUSY_TIMEOUT,
+    'transaction_mode': 'IMMEDIATE',
+    'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+}
+if DB_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': int(os.environ.get('DJANGO_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': SQLITE_PRODUCTION_OPTIONS,
+    })
+
+# Student and payment writes queue on a per-process lock (core.writes);
+# a write that still finds the database locked is retried this many times.
+DB_WRITE_RETRIES = 3
+DB_WRITE_RETRY_DELAY = 0.05
+DB_WRITE_QUEUE_TIMEOUT = 30
+
+# DJANGO_READ_REPLICA=1 sends the students app's reads in GET/HEAD requests
+# to the replica alias (core.db_router), a local copy of the database that
+# `manage.py sync_replica --interval N` refreshes. Tests mirror it onto default.
+READ_REPLICA = os.environ.get('DJANGO_READ_REPLICA', '') == '1'
+REPLICA_APPS = {'students'}
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'NAME': Path(os.environ.get('DJANGO_REPLICA_DB', BASE_DIR / 'db.replica.sqlite3')),
+    'TEST': {'MIRROR': 'default'},
+}
+DATABASE_ROUTERS = ['core.db_router.ReadReplicaRouter']
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -109,6 +156,12 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Comma-separated hasher classes, first one used for new hashes. Hashing is
+# most of the cost of a login; test and benchmark environments can set e.g.
+# django.contrib.auth.hashers.MD5PasswordHasher. Never do that in production.
+if os.environ.get('DJANGO_PASSWORD_HASHERS'):
+    PASSWORD_HASHERS = os.environ['DJANGO_PASSWORD_HASHERS'].split(',')
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
@@ -138,7 +191,7 @@ AUTH_USER_MODEL = 'accounts.CustomUser'
 # REST Framework Settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -146,6 +199,141 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Token lookups cached per process (accounts.authentication). Logout,
+# deactivation and approval changes evict immediately in the worker that
+# handled them; other workers notice within TOKEN_CACHE_TTL seconds.
+TOKEN_CACHE_TTL = 30
+TOKEN_CACHE_SIZE = 1024
+
+# List endpoints return a plain array unless the client asks for a page with
+# ?limit= or ?cursor=. Set to False once every client understands pages.
+ALLOW_UNPAGINATED_LISTS = True
+
+# How long clients may reuse fee structure responses without revalidating
+# (Cache-Control max-age, seconds).
+FEE_STRUCTURE_MAX_AGE = 60 * 60 * 24
+
+# Academic year and term due dates (month, day). The year starts in
+# ACADEMIC_YEAR_START_MONTH; due dates in earlier months fall in the
+# following calendar year.
+ACADEMIC_YEAR_START_MONTH = 4
+PAYMENT_TERM_DUE_DATES = {
+    'Term 1': (6, 30),
+    'Term 2': (9, 30),
+    'Term 3': (12, 31),
+    'Term 4': (3, 31),
+}
+
+# Seconds between overdue checks run inside the web process (see
+# students.jobs); None turns the in-process job off.
+OVERDUE_CHECK_INTERVAL = 60 * 60
+
+# Process-local by default. Cached values are keyed by TableVersion counters,
+# so a shared backend (Redis, memcached) can be swapped in without changes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'samayee',
+    }
+}
+
+# Seconds /api/dashboard/ figures are reused (students.dashboard). Writes
+# invalidate them immediately; the TTL bounds staleness from anything else.
+DASHBOARD_CACHE_TTL = 30
+
+# Request instrumentation (core.middleware.PerformanceMiddleware). Every
+# response gets a Server-Timing header; DB and render timings are collected
+# for PERF_SAMPLE_RATE of requests. Requests slower than SLOW_REQUEST_MS are
+# written to SLOW_REQUEST_LOG with up to SLOW_REQUEST_MAX_QUERIES statements.
+# LOG_DIR is created when the first record or metrics flush is written;
+# test runs (core.test_runner) use a temporary one instead.
+PERF_SAMPLE_RATE = float(os.environ.get('DJANGO_PERF_SAMPLE_RATE', '0.1'))
+SLOW_REQUEST_MS = int(os.environ.get('DJANGO_SLOW_REQUEST_MS', '1000'))
+SLOW_REQUEST_MAX_QUERIES = 200
+LOG_DIR = Path(os.environ.get('DJANGO_LOG_DIR', BASE_DIR / 'logs'))
+SLOW_REQUEST_LOG = LOG_DIR / 'slow_requests.log'
+
+# Per-route request metrics (core.metrics, served at /api/metrics). Each
+# worker writes its totals to METRICS_DB every METRICS_FLUSH_INTERVAL
+# seconds; the endpoint sums them. None turns the flush thread off.
+METRICS_DB = Path(os.environ.get('DJANGO_METRICS_DB', LOG_DIR / 'metrics.sqlite3'))
+METRICS_FLUSH_INTERVAL = 10
+
+# Logging (core.logs): JSON records on stderr, written by a background
+# listener so request threads never wait on log I/O; passwords, tokens and
+# similar fields are redacted. DJANGO_LOG_LEVEL sets the default level;
+# DJANGO_LOG_LEVELS overrides it per logger ("students=DEBUG,accounts=INFO")
+# and DJANGO_LOG_SAMPLING keeps a fraction of a logger's INFO-and-below
+# records ("django.db.backends=0.01").
+def _log_pairs(name):
+    pairs = (pair.split('=', 1) for pair in os.environ.get(name, '').split(',') if '=' in pair)
+    return {key.strip(): value.strip() for key, value in pairs}
+
+
+LOG_LEVEL = os.environ.get('DJANGO_LOG_LEVEL', 'INFO')
+LOG_LEVELS = _log_pairs('DJANGO_LOG_LEVELS')
+LOG_SAMPLING = {name: float(rate) for name, rate in _log_pairs('DJANGO_LOG_SAMPLING').items()}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'redact': {'()': 'core.logs.RedactFilter'},
+        **{
+            f'sample:{name}': {'()': 'core.logs.SamplingFilter', 'rate': rate}
+            for name, rate in LOG_SAMPLING.items()
+        },
+    },
+    'formatters': {
+        'json': {'()': 'core.logs.JSONFormatter'},
+        'slow_request': {'format': '%(asctime)s %(message)s'},
+    },
+    'handlers': {
+        # Sinks, only written to by the queue listeners
+        'stderr': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'json',
+        },
+        'slow_requests': {
+            'class': 'core.logs.RotatingFileHandler',
+            'filename': SLOW_REQUEST_LOG,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'delay': True,
+            'formatter': 'slow_request',
+        },
+        # What loggers use; configured after (named after) their sinks
+        'stderr_queue': {
+            'class': 'core.logs.QueueHandler',
+            'handlers': ['stderr'],
+            'filters': ['redact'],
+        },
+        'slow_requests_queue': {
+            'class': 'core.logs.QueueHandler',
+            'handlers': ['slow_requests'],
+            'filters': ['redact'],
+        },
+    },
+    'root': {'handlers': ['stderr_queue'], 'level': LOG_LEVEL},
+    'loggers': {
+        'django': {'handlers': ['stderr_queue'], 'level': 'INFO', 'propagate': False},
+        'core.perf.slow': {'handlers': ['slow_requests_queue'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+for _name in {*LOG_LEVELS, *LOG_SAMPLING}:
+    _logger = LOGGING['loggers'].setdefault(_name, {})
+    if _name in LOG_LEVELS:
+        _logger['level'] = LOG_LEVELS[_name].upper()
+    if _name in LOG_SAMPLING:
+        _logger['filters'] = [f'sample:{_name}']
+
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+# Serve the student/payment read endpoints from native async views
+# (students.async_views). core.asgi turns this on; under WSGI the sync views
+# are used.
+ASYNC_READ_VIEWS = os.environ.get('DJANGO_ASYNC_READ_VIEWS', '') == '1'
+
 # CSRF Settings for API
 CSRF_TRUSTED_ORIGINS = ['http://localhost:3000', 'http://127.0.0.1:3000']
 CSRF_COOKIE_SAMESITE = 'Lax'
@@ -0,0 +1,132 @@
+"""
+Sparse fieldsets: ``?fields=`` and ``?omit=`` on read endpoints.
+
+``?fields=id,first_name,grade`` returns only those fields,
+``?omit=total_paid`` everything but those; both take comma-separated
+serializer field names, and an unknown name is a 400. The serializer drops
+the other fields before serializing (``SparseFieldsMixin``), and the view
+trims its queryset to match (``SparseFieldsetMixin.trim_queryset``):
+``.only()`` the columns the remaining fields read, and ``select_related``
+only the relations they follow, so an omitted field costs nothing in the
+database either. Views skip other per-field work, such as loading the fee
+schedule, when ``wants()`` says the field is not needed.
+
+The columns behind a field come from its ``source``. Fields computed in
+Python (SerializerMethodField and the like) list theirs in the serializer's
+``Meta.field_sources``; a field whose columns are unknown disables the
+``.only()`` trimming for that request.
+"""
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def parse_names(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class SparseFieldsMixin:
+    """Serializer mixin: keeps only the fields named in ``context['sparse_fields']``, when given."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        wanted = self.context.get('sparse_fields')
+        if wanted is not None:
+            for name in set(self.fields) - wanted:
+                self.fields.pop(name)
+
+    @classmethod
+    def field_columns(cls, names):
+        """
+        The model paths (``student__grade``) the fields ``names`` read, or
+        None if any of them cannot be told.
+        """
+        declared = cls().fields
+        sources = getattr(cls.Meta, 'field_sources', {})
+        columns = set()
+        for name in names:
+            if name in sources:
+                columns.update(sources[name])
+                continue
+            field = declared[name]
+            if isinstance(field, serializers.SerializerMethodField) or field.source == '*':
+                return None
+            columns.add(field.source.replace('.', '__'))
+        return columns
+
+
+class ChoiceDisplayField(serializers.Field):
+    """
+    Read-only label of a choice field, as ``get_<field>_display()`` gives.
+    A ``source='get_..._display'`` CharField makes DRF inspect the bound
+    method's signature for every row; this looks the label up directly.
+    """
+
+    def __init__(self, source, **kwargs):
+        super().__init__(source=source, read_only=True, **kwargs)
+        self.labels = None
+
+    def to_representation(self, value):
+        if self.labels is None:
+            model = self.parent.Meta.model
+            self.labels = dict(model._meta.get_field(self.source).flatchoices)
+        return str(self.labels.get(value, value))
+
+
+class SparseFieldsetMixin:
+    """
+    View mixin for ``?fields=`` / ``?omit=`` on ``sparse_actions``. Views
+    call ``trim_queryset`` last in ``get_queryset``, and skip any other
+    work for fields ``wants()`` says are not needed.
+    """
+    sparse_actions = ('list', 'retrieve')
+
+    @property
+    def sparse_fields(self):
+        """The requested field names, or None for all of them."""
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = self.parse_sparse_fields()
+        return self._sparse_fields
+
+    def parse_sparse_fields(self):
+        params = self.request.query_params
+        if self.action not in self.sparse_actions or not (FIELDS_PARAM in params or OMIT_PARAM in params):
+            return None
+        available = set(self.get_serializer_class()().fields)
+        wanted = parse_names(params[FIELDS_PARAM]) if FIELDS_PARAM in params else set(available)
+        omitted = parse_names(params.get(OMIT_PARAM, ''))
+        unknown = (wanted | omitted) - available
+        if unknown:
+            raise ParseError(
+                f"Unknown field(s): {', '.join(sorted(unknown))}. Available: {', '.join(sorted(available))}"
+            )
+        return wanted - omitted
+
+    def wants(self, name):
+        return self.sparse_fields is None or name in self.sparse_fields
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.sparse_fields is not None:
+            context['sparse_fields'] = self.sparse_fields
+        return context
+
+    def trim_queryset(self, queryset):
+        if self.sparse_fields is None:
+            return queryset
+        columns = self.get_serializer_class().field_columns(self.sparse_fields)
+        if columns is None:
+            return queryset
+        # The paginator reads the ordering values off the last row; those
+        # that are not model fields (annotations) are selected anyway
+        ordering = {name.lstrip('-') for name in getattr(self.pagination_class, 'ordering', ())}
+        fields = {field.name for field in queryset.model._meta.concrete_fields}
+        columns |= {queryset.model._meta.pk.name} | (ordering & fields)
+        # Joins the view added for fields that are not wanted would clash with only()
+        queryset = queryset.select_related(None)
+        relations = {column.rsplit('__', 1)[0] for column in columns if '__' in column}
+        if relations:
+            queryset = queryset.select_related(*relations)
+        return queryset.only(*columns)
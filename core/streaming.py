@@ -0,0 +1,107 @@
+"""
+Streaming list responses.
+
+``StreamingListMixin`` lets a viewset's ``list`` action write its rows
+incrementally instead of building the whole serialized list in memory. The
+queryset is walked with ``.iterator(chunk_size=...)`` and each chunk is
+serialized with the viewset's own serializer and context, so whatever
+``get_queryset``/``get_serializer_context`` set up for the list (joins, fee
+maps, ...) still applies per batch.
+
+Two formats are available:
+
+* ``?stream=1`` – a regular JSON array, written element by element.
+* ``?format=ndjson`` (or ``Accept: application/x-ndjson``) – one JSON object
+  per line.
+
+Streamed responses are never paginated.
+"""
+import itertools
+import json
+import logging
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+logger = logging.getLogger(__name__)
+
+
+def _dumps(obj):
+    return json.dumps(obj, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Newline-delimited JSON. Also renders non-streamed (error/detail) responses."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        items = data if isinstance(data, list) else [data]
+        return ''.join(_dumps(item) + '\n' for item in items).encode(self.charset)
+
+
+class StreamingListMixin:
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+    stream_chunk_size = 500
+    stream_query_param = 'stream'
+
+    def get_stream_format(self, request):
+        renderer = getattr(request, 'accepted_renderer', None)
+        if isinstance(renderer, NDJSONRenderer):
+            return 'ndjson'
+        if request.query_params.get(self.stream_query_param) in ('1', 'true', 'json'):
+            return 'json'
+        return None
+
+    def list(self, request, *args, **kwargs):
+        stream_format = self.get_stream_format(request)
+        if stream_format is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if stream_format == 'ndjson':
+            content = self.stream_ndjson(queryset)
+            content_type = 'application/x-ndjson; charset=utf-8'
+        else:
+            content = self.stream_json_array(queryset)
+            content_type = 'application/json; charset=utf-8'
+        return StreamingHttpResponse(content, content_type=content_type)
+
+    def iter_serialized(self, queryset):
+        # One serializer for the whole stream: a ListSerializer per batch
+        # would keep each batch alive in a reference cycle until the next
+        # full GC, so memory would creep up with the row count.
+        serializer = self.get_serializer()
+        rows = queryset.iterator(chunk_size=self.stream_chunk_size)
+        while True:
+            batch = list(itertools.islice(rows, self.stream_chunk_size))
+            if not batch:
+                return
+            yield [serializer.to_representation(obj) for obj in batch]
+
+    def stream_ndjson(self, queryset):
+        try:
+            for data in self.iter_serialized(queryset):
+                yield ''.join(_dumps(item) + '\n' for item in data)
+        except Exception:
+            # Headers are already sent; all we can do is stop and record why
+            logger.exception('Streaming %s failed', self.__class__.__name__)
+            raise
+
+    def stream_json_array(self, queryset):
+        yield '['
+        first = True
+        try:
+            for data in self.iter_serialized(queryset):
+                chunk = ','.join(_dumps(item) for item in data)
+                yield chunk if first else ',' + chunk
+                first = False
+        except Exception:
+            logger.exception('Streaming %s failed', self.__class__.__name__)
+            raise
+        yield ']'
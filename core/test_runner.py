@@ -0,0 +1,32 @@
+"""
+Test runner that keeps a test run's log files and metrics store out of
+LOG_DIR: they go to a temporary directory, removed when the run ends.
+"""
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from . import logs
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._log_dir = tempfile.TemporaryDirectory(prefix='samayee-logs-', ignore_cleanup_errors=True)
+        log_dir = Path(self._log_dir.name)
+        self._log_settings = override_settings(
+            LOG_DIR=log_dir,
+            SLOW_REQUEST_LOG=log_dir / 'slow_requests.log',
+            METRICS_DB=log_dir / 'metrics.sqlite3',
+        )
+        self._log_settings.enable()
+        logs._handler_by_name('slow_requests').redirect(settings.SLOW_REQUEST_LOG)
+
+    def teardown_test_environment(self, **kwargs):
+        self._log_settings.disable()
+        logs._handler_by_name('slow_requests').redirect(settings.SLOW_REQUEST_LOG)
+        self._log_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
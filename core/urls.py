@@ -20,8 +20,10 @@ from django.views.generic import TemplateView
 from django.conf import settings
 from django.conf.urls.static import static
 from django.http import JsonResponse
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from core import metrics
 
 def health_check(request):
     return JsonResponse({"status": "healthy", "message": "API is working!"})
@@ -43,10 +45,18 @@ def test_auth(request):
             "user": request.user.username
         })
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@renderer_classes([metrics.PrometheusRenderer])
+def metrics_view(request):
+    """Request and cache metrics for all workers, in Prometheus text format"""
+    return Response(metrics.render(metrics.merged()))
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/health/', health_check, name='health-check'),
     path('api/test-auth/', test_auth, name='test-auth'),
+    path('api/metrics', metrics_view, name='metrics'),
     path('api/accounts/', include('accounts.urls')),
     path('api/', include('students.urls')),
 ]
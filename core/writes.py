@@ -0,0 +1,89 @@
+"""
+Serialized database writes.
+
+SQLite lets one connection write at a time. Request threads that race for
+the lock either fail at once with "database is locked" (a transaction that
+read first and then tries to write) or poll in SQLite's busy handler, which
+sleeps in steps of up to 100ms. ``run_write`` instead lines the writers of
+a process up on one lock, so each transaction starts as soon as the
+previous one commits. A transaction that still finds the database locked,
+by another worker process, is retried up to DB_WRITE_RETRIES times after a
+short, growing delay.
+
+Only an outermost write is queued and retried. Inside an enclosing
+``atomic()`` block the error belongs to whoever opened that block.
+"""
+import functools
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+
+logger = logging.getLogger(__name__)
+
+_queue = threading.RLock()
+_stats_lock = threading.Lock()
+stats = {'writes': 0, 'retries': 0, 'failures': 0}
+
+
+def _count(name):
+    with _stats_lock:
+        stats[name] += 1
+
+
+def is_locked(error):
+    return isinstance(error, OperationalError) and 'locked' in str(error)
+
+
+def run_write(func, *args, using=None, **kwargs):
+    """Call ``func`` in its own transaction (or savepoint), queued behind this process's other writes."""
+    if transaction.get_connection(using).in_atomic_block:
+        # A savepoint; the enclosing transaction already holds or awaits the lock
+        with transaction.atomic(using=using):
+            return func(*args, **kwargs)
+
+    if not _queue.acquire(timeout=settings.DB_WRITE_QUEUE_TIMEOUT):
+        raise OperationalError('database is locked (timed out waiting for the write queue)')
+    try:
+        for attempt in range(settings.DB_WRITE_RETRIES + 1):
+            try:
+                with transaction.atomic(using=using):
+                    result = func(*args, **kwargs)
+            except OperationalError as error:
+                if not is_locked(error) or attempt == settings.DB_WRITE_RETRIES:
+                    if is_locked(error):
+                        _count('failures')
+                    raise
+                _count('retries')
+                delay = settings.DB_WRITE_RETRY_DELAY * 2 ** attempt * random.uniform(0.5, 1.5)
+                logger.warning('Database locked, retrying %s in %.0fms', func.__qualname__, delay * 1000)
+                time.sleep(delay)
+            else:
+                _count('writes')
+                return result
+    finally:
+        _queue.release()
+
+
+def serialized_write(func):
+    """Decorator form of ``run_write``."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return run_write(func, *args, **kwargs)
+    return wrapper
+
+
+class SerializedWriteMixin:
+    """Runs a ModelViewSet's creates, updates and deletes through ``run_write``."""
+
+    def perform_create(self, serializer):
+        run_write(super().perform_create, serializer)
+
+    def perform_update(self, serializer):
+        run_write(super().perform_update, serializer)
+
+    def perform_destroy(self, instance):
+        run_write(super().perform_destroy, instance)
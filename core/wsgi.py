@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+# Periodic jobs (overdue checks) run in a background thread of each server process
+from students.jobs import start_scheduler  # noqa: E402
+
+start_scheduler()
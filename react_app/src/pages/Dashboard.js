@@ -10,6 +10,8 @@ export default function Dashboard() {
     totalStudents: 0,
     totalPayments: 0,
     totalRevenue: 0,
+    outstandingBalance: 0,
+    overdueStudents: 0,
     recentPayments: []
   });
   const [loading, setLoading] = useState(true);
@@ -19,24 +21,16 @@ export default function Dashboard() {
     const fetchDashboardData = async () => {
       setLoading(true);
       try {
-        const [students, payments] = await Promise.all([
-          api.getStudents(token),
-          api.getPayments(token)
-        ]);
-
-        // Calculate total revenue
-        const totalRevenue = payments.reduce((sum, payment) => sum + parseFloat(payment.amount_paid), 0);
-
-        // Get recent payments (last 5)
-        const recentPayments = payments
-          .sort((a, b) => new Date(b.transaction_date) - new Date(a.transaction_date))
-          .slice(0, 5);
+        // Figures are aggregated server-side in one request
+        const dashboard = await api.getDashboard(token);
 
         setStats({
-          totalStudents: students.length,
-          totalPayments: payments.length,
-          totalRevenue: totalRevenue,
-          recentPayments: recentPayments
+          totalStudents: dashboard.students.total,
+          totalPayments: dashboard.collections.total_payments,
+          totalRevenue: parseFloat(dashboard.collections.total_amount),
+          outstandingBalance: parseFloat(dashboard.outstanding.outstanding_balance),
+          overdueStudents: dashboard.overdue.students,
+          recentPayments: dashboard.recent_payments
         });
       } catch (err) {
         setError("Failed to fetch dashboard data. Please try again.");
@@ -94,6 +88,22 @@ export default function Dashboard() {
               <p>Avg. Revenue per Student</p>
             </div>
           </div>
+
+          <div className="stat-card">
+            <div className="stat-icon">🧾</div>
+            <div className="stat-content">
+              <h3>₹{stats.outstandingBalance.toLocaleString()}</h3>
+              <p>Outstanding Balance</p>
+            </div>
+          </div>
+
+          <div className="stat-card">
+            <div className="stat-icon">⏰</div>
+            <div className="stat-content">
+              <h3>{stats.overdueStudents}</h3>
+              <p>Students Overdue</p>
+            </div>
+          </div>
         </div>
 
         <div className="quick-actions">
@@ -136,7 +146,7 @@ export default function Dashboard() {
                   <div className="activity-icon">💳</div>
                   <div className="activity-content">
                     <h4>₹{payment.amount_paid} - {payment.payment_mode}</h4>
-                    <p>Student ID: {payment.student}</p>
+                    <p>{payment.student_name}</p>
                     <span className="activity-date">
                       {new Date(payment.transaction_date).toLocaleDateString()}
                     </span>
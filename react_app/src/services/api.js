@@ -47,7 +47,8 @@ const apiService = {
   },
 
   login: async (credentials) => {
-    const response = await api.post('/api/accounts/login/', credentials);
+    // Requests carry the token header, so no session is needed
+    const response = await api.post('/api/accounts/login/', { ...credentials, session: false });
     return response.data;
   },
 
@@ -66,6 +67,12 @@ const apiService = {
     return response.data;
   },
 
+  // Dashboard API
+  getDashboard: async (token) => {
+    const response = await api.get('/api/dashboard/');
+    return response.data;
+  },
+
   // Students API
   getStudents: async (token) => {
     const response = await api.get('/api/students/');
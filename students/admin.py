@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Student, FeeStructure, Payment
+from .models import Student, FeeStructure, Payment, PaymentArchive, ArchivedYear
 
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
@@ -10,13 +10,30 @@ class StudentAdmin(admin.ModelAdmin):
 
 @admin.register(FeeStructure)
 class FeeStructureAdmin(admin.ModelAdmin):
-    list_display = ['grade', 'board', 'fee_amount']
-    list_filter = ['grade', 'board']
+    list_display = ['academic_year', 'grade', 'board', 'fee_amount']
+    list_filter = ['academic_year', 'grade', 'board']
     search_fields = ['grade', 'board']
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
     list_display = ['student', 'payment_mode', 'amount_paid', 'transaction_date']
-    list_filter = ['payment_mode', 'transaction_date']
+    list_filter = ['academic_year', 'payment_mode', 'transaction_date']
     search_fields = ['student__first_name', 'student__last_name', 'transaction_id']
     ordering = ['-transaction_date']
+
+@admin.register(PaymentArchive)
+class PaymentArchiveAdmin(admin.ModelAdmin):
+    list_display = ['student', 'payment_mode', 'amount_paid', 'transaction_date', 'academic_year']
+    list_filter = ['academic_year', 'payment_mode']
+    search_fields = ['student__first_name', 'student__last_name', 'transaction_id']
+    ordering = ['-transaction_date']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(ArchivedYear)
+class ArchivedYearAdmin(admin.ModelAdmin):
+    list_display = ['academic_year', 'payments', 'archived_at']
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class StudentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'students'
+
+    def ready(self):
+        import students.signals
+        from core.metrics import registry
+        from students import dashboard
+        from students.fees import fee_schedule
+
+        registry.register_cache('fee_schedule', lambda: (fee_schedule.hits, fee_schedule.misses))
+        registry.register_cache('dashboard', lambda: (dashboard.stats['hits'], dashboard.stats['misses']))
@@ -0,0 +1,119 @@
+"""
+Archival of closed academic years.
+
+``archive_year`` moves a finished year's payments from Payment to
+PaymentArchive in chunks, one transaction each (queued with the process's
+other writes, see core.writes). The live table then only holds open years,
+and the current year's queries stay on its ``academic_year`` index.
+
+Reads of the year see every payment throughout. The year is recorded in
+ArchivedYear first, which stops its payments from changing
+(``ArchivedYear.check_open``); they are then copied, reads switch to the
+archive once the copy is ``complete``, and only then are the live rows
+deleted. A run that dies partway leaves the year readable from one table
+or the other, and running the command again finishes the job.
+
+``payments_for`` picks the table for a request's ``?year=``: the live
+table for the current year (the default, no lookup needed) and for years
+not archived yet, the archive otherwise.
+"""
+from django.db import connections, router
+from django.utils import timezone
+
+from core.writes import serialized_write
+
+from .conditional import PAYMENT_VERSION
+from .models import ArchivedYear, Payment, PaymentArchive, TableVersion
+from .years import current_academic_year, requested_year
+
+DEFAULT_CHUNK_SIZE = 1000
+FIELDS = [field.attname for field in PaymentArchive._meta.concrete_fields]
+
+
+def is_archived(year):
+    if year == current_academic_year():
+        return False
+    return ArchivedYear.objects.filter(academic_year=year, complete=True).exists()
+
+
+def payments_for(params=None):
+    """
+    Payments of the ``?year=`` in ``params`` (default: the current year),
+    from whichever table holds them. Raises ValueError for a malformed year.
+    """
+    year = requested_year(params)
+    model = PaymentArchive if is_archived(year) else Payment
+    return model.objects.filter(academic_year=year)
+
+
+@serialized_write
+def _start(year):
+    ArchivedYear.objects.get_or_create(academic_year=year)
+
+
+@serialized_write
+def _copy(ids):
+    rows = Payment.objects.filter(id__in=ids).values(*FIELDS)
+    # Rows copied by an earlier, interrupted run are already there
+    PaymentArchive.objects.bulk_create([PaymentArchive(**row) for row in rows], ignore_conflicts=True)
+
+
+@serialized_write
+def _complete(year):
+    payments = PaymentArchive.objects.filter(academic_year=year).count()
+    ArchivedYear.objects.filter(academic_year=year).update(
+        complete=True, payments=payments, archived_at=timezone.now(),
+    )
+    # Reads of the year switch to the archive
+    TableVersion.bump(PAYMENT_VERSION)
+
+
+@serialized_write
+def _move(ids):
+    # Anything saved after its chunk was copied (by a write already under way) is copied now
+    missing = set(ids) - set(PaymentArchive.objects.filter(id__in=ids).values_list('id', flat=True))
+    if missing:
+        _copy(missing)
+    # Closed years are not in the ledgers, so skip the per-row delete signals
+    # with a plain DELETE; nothing references payments
+    with connections[router.db_for_write(Payment)].cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {Payment._meta.db_table} WHERE id IN ({", ".join(["%s"] * len(ids))})', list(ids),
+        )
+
+
+def _chunks(queryset, chunk_size):
+    """The ids of ``queryset`` in chunks, in id order, whether or not earlier chunks are deleted."""
+    last = 0
+    while True:
+        ids = list(queryset.filter(id__gt=last).order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
+
+
+def archive_year(year, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    """
+    Move ``year``'s payments to the archive. Returns the number moved (or,
+    with ``dry_run``, that would be). Raises ValueError for a year that has
+    not ended.
+    """
+    if year >= current_academic_year():
+        raise ValueError(f'Academic year {year} has not ended yet')
+    live = Payment.objects.filter(academic_year=year)
+    if dry_run:
+        return live.count()
+
+    # From here on the year's payments cannot change, so the copy stays exact
+    _start(year)
+    moved = 0
+    for ids in _chunks(live, chunk_size):
+        _copy(ids)
+        moved += len(ids)
+    _complete(year)
+    for ids in _chunks(live, chunk_size):
+        _move(ids)
+    # The final count, and the live table's change
+    _complete(year)
+    return moved
@@ -0,0 +1,144 @@
+"""
+Async versions of the hot read endpoints, for ASGI deployments.
+
+Each handler loads everything its serializer reads up front with the async
+ORM (ledger and student joins, the cached fee schedule), so serialization
+itself never touches the database. Responses match the sync viewset
+actions; ``build_urlpatterns`` routes them ahead of the router when
+``settings.ASYNC_READ_VIEWS`` is on.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Sum
+from django.http import Http404
+from django.urls import re_path
+
+from core.async_api import async_read_view, json_response
+
+from . import archive, ledger, reports, search
+from .conditional import PAYMENT_TABLES, STUDENT_TABLES, request_variant, table_validators
+from .fees import fee_schedule
+from .models import Payment, Student, StudentLedger
+from .serializers import PaymentSerializer, StudentSerializer
+from .years import current_academic_year
+
+load_fee_map = sync_to_async(fee_schedule.as_map)
+# May look up ArchivedYear
+payments_for = sync_to_async(archive.payments_for)
+
+
+async def student_context(request):
+    return {'request': request, 'fee_map': await load_fee_map()}
+
+
+async def fill_missing_ledgers(students):
+    """
+    Students without a ledger row (bulk inserts not yet reconciled) get an
+    unsaved one carrying their paid total, which is all the serializer reads.
+    """
+    for student in students:
+        try:
+            student.ledger
+        except StudentLedger.DoesNotExist:
+            paid = await Payment.objects.filter(
+                student=student, academic_year=current_academic_year(),
+            ).aaggregate(total=Sum('amount_paid'))
+            student.ledger = StudentLedger(total_paid=paid['total'] or 0)
+    return students
+
+
+async def get_student(pk):
+    try:
+        return await Student.objects.select_related('ledger').aget(pk=pk)
+    except (Student.DoesNotExist, ValueError, TypeError, ValidationError):
+        raise Http404
+
+
+async def student_list(request, user):
+    students = [student async for student in Student.objects.select_related('ledger')]
+    await fill_missing_ledgers(students)
+    serializer = StudentSerializer(students, many=True, context=await student_context(request))
+    return json_response(serializer.data)
+
+
+async def student_search(request, user):
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return json_response([])
+    students = await search.asearch_students(Student.objects.select_related('ledger'), query)
+    await fill_missing_ledgers(students)
+    serializer = StudentSerializer(students, many=True, context=await student_context(request))
+    return json_response(serializer.data)
+
+
+async def student_detail(request, user, pk):
+    student = await get_student(pk)
+    await fill_missing_ledgers([student])
+    serializer = StudentSerializer(student, context=await student_context(request))
+    return json_response(serializer.data)
+
+
+async def student_payment_summary(request, user, pk):
+    student = await get_student(pk)
+    student_ledger = await sync_to_async(ledger.get_ledger)(student)
+    serializer = StudentSerializer(student, context=await student_context(request))
+    return json_response({
+        'student': serializer.data,
+        'total_fee': student_ledger.total_fee,
+        'total_paid': student_ledger.total_paid,
+        'balance': student_ledger.balance,
+    })
+
+
+async def payment_list(request, user):
+    try:
+        queryset = await payments_for(request.GET)
+    except ValueError as e:
+        return json_response({'detail': str(e)}, status=400)
+    payments = [payment async for payment in queryset.select_related('student')]
+    serializer = PaymentSerializer(payments, many=True, context={'request': request})
+    return json_response(serializer.data)
+
+
+async def payment_summary(request, user):
+    try:
+        queryset = reports.filter_payments(await payments_for(request.GET), request.GET)
+    except ValueError as e:
+        return json_response({'error': str(e)}, status=400)
+    return json_response(reports.summary_payload(await reports.apayment_rollup(queryset)))
+
+
+def versioned(tables):
+    load = sync_to_async(table_validators)
+
+    async def validators(request):
+        # Same validators as the sync views give a JSON response
+        return await load(tables, request_variant(request.GET, 'json'))
+    return validators
+
+
+def paginated_lists_only(request):
+    return not settings.ALLOW_UNPAGINATED_LISTS
+
+
+def build_urlpatterns(router):
+    """
+    Async routes for ``router``'s student and payment endpoints, with the
+    router's own views handling writes and unsupported requests.
+    """
+    sync_views = {pattern.name: pattern.callback for pattern in router.urls if pattern.name}
+
+    def route(regex, name, handler, use_sync=None):
+        tables = STUDENT_TABLES if name.startswith('student') else PAYMENT_TABLES
+        view = async_read_view(handler, sync_views[name], use_sync, validators=versioned(tables))
+        return re_path(regex, view, name=name)
+
+    return [
+        route(r'^students/$', 'student-list', student_list, paginated_lists_only),
+        route(r'^students/search/$', 'student-search', student_search, paginated_lists_only),
+        route(r'^students/(?P<pk>[^/.]+)/$', 'student-detail', student_detail),
+        route(r'^students/(?P<pk>[^/.]+)/payment_summary/$', 'student-payment-summary', student_payment_summary),
+        route(r'^payments/$', 'payment-list', payment_list, paginated_lists_only),
+        route(r'^payments/summary/$', 'payment-summary', payment_summary),
+    ]
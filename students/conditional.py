@@ -0,0 +1,73 @@
+"""
+ETag / Last-Modified validators from TableVersion counters.
+
+Every write to students, payments and fee structures bumps the table's
+TableVersion row (see ``students.signals``; bulk paths bump it themselves).
+A response's validators are derived from the versions of every table its
+body depends on, read with one small query, so a 304 costs no more than
+that. Student and payment bodies include ledger totals and fees, so they
+depend on all three tables; fee structure bodies only on their own.
+
+Lists and reports default to the current academic year, so the year a
+request resolves to is part of the variant too: the same URL changes
+content on April 1 without any write, and must change its ETag with it.
+"""
+import hashlib
+
+from django.conf import settings
+
+from core.conditional import ConditionalGetMixin, Validators
+
+from .fees import FEE_STRUCTURE_VERSION
+from .models import TableVersion
+from .years import requested_year
+
+STUDENT_VERSION = 'student'
+PAYMENT_VERSION = 'payment'
+
+STUDENT_TABLES = (STUDENT_VERSION, PAYMENT_VERSION, FEE_STRUCTURE_VERSION)
+PAYMENT_TABLES = STUDENT_TABLES
+FEE_STRUCTURE_TABLES = (FEE_STRUCTURE_VERSION,)
+
+
+def table_validators(tables, variant=''):
+    """
+    Validators for a response built from ``tables``. ``variant`` separates
+    representations of the same URL (e.g. the renderer format).
+    """
+    versions = {
+        name: (version, updated_at)
+        for name, version, updated_at in TableVersion.objects.filter(name__in=tables)
+        .values_list('name', 'version', 'updated_at')
+    }
+    parts = [variant]
+    last_modified = None
+    for name in tables:
+        version, updated_at = versions.get(name, (0, None))
+        parts.append(f'{name}:{version}:{updated_at.timestamp() if updated_at else ""}')
+        if updated_at and (last_modified is None or updated_at > last_modified):
+            last_modified = updated_at
+    etag = hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest()
+    return Validators(etag, last_modified)
+
+
+def request_variant(params, format):
+    """The variant for a request in renderer ``format``: the format and the academic year it reads."""
+    try:
+        year = requested_year(params)
+    except ValueError:
+        # The view answers 400; keep the raw value apart from valid years
+        year = params.get('year')
+    return f'{format}:{year}'
+
+
+class VersionedConditionalMixin(ConditionalGetMixin):
+    version_tables = ()
+
+    def get_validators(self, request):
+        variant = request_variant(request.query_params, request.accepted_renderer.format)
+        return table_validators(self.version_tables, variant)
+
+
+def fee_structure_cache_control():
+    return {'private': True, 'max_age': settings.FEE_STRUCTURE_MAX_AGE}
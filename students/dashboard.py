@@ -0,0 +1,113 @@
+"""
+Headline figures for /api/dashboard/.
+
+``build`` computes everything the dashboard shows, for the current academic
+year, in five grouped queries:
+students per (grade, board), the payment rollup (``reports.payment_rollup``),
+one aggregate over StudentLedger for fees and outstanding balances, one over
+StudentTermLedger for overdue terms, and the latest payments.
+
+``cached`` keeps the result in the default cache for
+``settings.DASHBOARD_CACHE_TTL`` seconds under a key derived from the
+student/payment/fee TableVersion counters and the academic year. Every write
+bumps one of those in the same transaction (see ``students.conditional``),
+so a write changes the key and the next request rebuilds, whichever worker
+served it; so does the start of a new academic year.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import Payment, Student, StudentLedger, StudentTermLedger
+from .reports import payment_rollup
+from .years import current_academic_year
+
+CACHE_PREFIX = 'dashboard'
+RECENT_PAYMENTS = 5
+
+# This process's cache lookups, reported by core.metrics
+stats = {'hits': 0, 'misses': 0}
+
+
+def student_counts():
+    by_grade = {grade: 0 for grade, _ in Student.GRADE_CHOICES}
+    by_board = {board: 0 for board, _ in Student.BOARD_CHOICES}
+    total = 0
+    groups = Student.objects.values('grade', 'board').annotate(count=Count('id')).order_by()
+    for group in groups:
+        total += group['count']
+        by_grade[group['grade']] = by_grade.get(group['grade'], 0) + group['count']
+        by_board[group['board']] = by_board.get(group['board'], 0) + group['count']
+    return {'total': total, 'by_grade': by_grade, 'by_board': by_board}
+
+
+def collections():
+    rollup = payment_rollup(Payment.objects.filter(academic_year=current_academic_year()))
+    return {
+        key: rollup[key]
+        for key in ('total_payments', 'total_amount', 'by_mode', 'by_term', 'by_status', 'by_month')
+    }
+
+
+def outstanding():
+    owing = Q(balance__gt=0)
+    totals = StudentLedger.objects.aggregate(
+        total_fee=Sum('total_fee'),
+        total_paid=Sum('total_paid'),
+        # Named apart from the field: the filters refer to the column
+        outstanding_balance=Sum('balance', filter=owing),
+        students_owing=Count('id', filter=owing),
+    )
+    return {key: value or 0 for key, value in totals.items()}
+
+
+def overdue():
+    totals = StudentTermLedger.objects.filter(overdue=True, balance__gt=0).aggregate(
+        terms=Count('id'),
+        students=Count('student', distinct=True),
+        amount=Sum('balance'),
+    )
+    return {key: value or 0 for key, value in totals.items()}
+
+
+def recent_payments(limit=RECENT_PAYMENTS):
+    return list(
+        Payment.objects.filter(academic_year=current_academic_year())
+        .order_by('-transaction_date', '-id')
+        .values(
+            'id', 'student', 'amount_paid', 'payment_mode', 'payment_term', 'payment_status',
+            'transaction_date', first_name=F('student__first_name'), last_name=F('student__last_name'),
+        )[:limit]
+    )
+
+
+def build():
+    """The /api/dashboard/ body, computed from the database."""
+    recent = recent_payments()
+    for payment in recent:
+        payment['student_name'] = f"{payment.pop('first_name')} {payment.pop('last_name')}"
+    return {
+        'students': student_counts(),
+        'collections': collections(),
+        'outstanding': outstanding(),
+        'overdue': overdue(),
+        'recent_payments': recent,
+        'generated_at': timezone.now(),
+    }
+
+
+def cached(version_key):
+    """
+    ``build()``, reused for up to DASHBOARD_CACHE_TTL seconds while
+    ``version_key`` (the tables' ETag) is unchanged.
+    """
+    key = f'{CACHE_PREFIX}:{version_key}'
+    data = cache.get(key)
+    if data is None:
+        stats['misses'] += 1
+        data = build()
+        cache.set(key, data, settings.DASHBOARD_CACHE_TTL)
+    else:
+        stats['hits'] += 1
+    return data
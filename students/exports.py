@@ -0,0 +1,132 @@
+"""
+Row sources for the student and payment exports.
+
+Each function returns an iterator of rows (header first) built from a single
+``values_list`` query joined to the ledger tables, walked with
+``.iterator(chunk_size=...)``; fee, paid and balance columns come from the
+ledger rather than from per-row aggregates. Students without a ledger row
+yet (bulk inserts not reconciled) are reconciled before the rows start.
+Ledgers hold the current academic year, so a payment export of another
+year leaves those columns blank. Feed the rows to
+``core.exports.iter_csv`` / ``iter_xlsx``.
+"""
+from django.db import transaction
+from django.db.models import Sum
+
+from . import archive, ledger, reports
+from .fees import fee_schedule
+from .ledger import ZERO
+from .models import Payment, Student
+from .years import current_academic_year, requested_year
+
+STUDENT_COLUMNS = (
+    ('id', 'ID'),
+    ('first_name', 'First name'),
+    ('last_name', 'Last name'),
+    ('grade', 'Grade'),
+    ('board', 'Board'),
+    ('parent_name', 'Parent name'),
+    ('parent_contact_primary', 'Primary contact'),
+    ('parent_contact_secondary', 'Secondary contact'),
+    ('admission_date', 'Admission date'),
+    ('ledger__total_fee', 'Annual fee'),
+    ('ledger__total_paid', 'Total paid'),
+    ('ledger__balance', 'Balance'),
+    ('ledger__last_payment_date', 'Last payment'),
+)
+
+PAYMENT_COLUMNS = (
+    ('id', 'ID'),
+    ('transaction_date', 'Date'),
+    ('student_id', 'Student ID'),
+    ('student__first_name', 'First name'),
+    ('student__last_name', 'Last name'),
+    ('student__grade', 'Grade'),
+    ('student__board', 'Board'),
+    ('payment_term', 'Term'),
+    ('payment_mode', 'Mode'),
+    ('amount_paid', 'Amount paid'),
+    ('amount_due', 'Amount due'),
+    ('payment_status', 'Status'),
+    ('due_date', 'Due date'),
+    ('transaction_id', 'Transaction ID'),
+    ('student__ledger__total_fee', 'Annual fee'),
+    ('student__ledger__total_paid', 'Student total paid'),
+    ('student__ledger__balance', 'Student balance'),
+)
+# The trailing PAYMENT_COLUMNS read from the current year's ledger
+PAYMENT_LEDGER_COLUMNS = 3
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def fee_status(total_fee, total_paid):
+    if total_paid and total_paid >= total_fee:
+        return 'Paid'
+    if total_paid:
+        return 'Partial'
+    return 'Unpaid'
+
+
+def filter_students(queryset, params):
+    if params.get('grade'):
+        queryset = queryset.filter(grade=params['grade'])
+    if params.get('board'):
+        queryset = queryset.filter(board=params['board'])
+    return queryset
+
+
+def student_rows(params=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Students with their annual fee, total paid, balance and fee status."""
+    queryset = filter_students(Student.objects.order_by('id'), params or {})
+    missing = list(queryset.filter(ledger__isnull=True).values_list('id', flat=True))
+    for start in range(0, len(missing), ledger.RECONCILE_CHUNK_SIZE):
+        with transaction.atomic():
+            ledger.reconcile(missing[start:start + ledger.RECONCILE_CHUNK_SIZE])
+    fees = fee_schedule.as_map()
+    return _with_fee_status(_iter_rows(queryset, STUDENT_COLUMNS, chunk_size), fees)
+
+
+def _with_fee_status(rows, fees):
+    yield next(rows) + ['Fee status']
+    for row in rows:
+        row = list(row)
+        total_fee, total_paid = row[9], row[10]
+        if total_fee is None:
+            # Inserted since the reconcile above; sum its payments instead
+            fee_structure = fees.get((row[3], row[4]))
+            total_fee = fee_structure.fee_amount if fee_structure else ZERO
+            total_paid = Payment.objects.filter(
+                student_id=row[0], academic_year=current_academic_year(),
+            ).aggregate(total=Sum('amount_paid'))['total'] or ZERO
+            row[9:12] = [total_fee, total_paid, total_fee - total_paid]
+        yield row + [fee_status(total_fee, total_paid)]
+
+
+def payment_rows(params=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Payments, newest first, with the paying student and their ledger totals
+    (blank for years other than the current one). Accepts the same filters
+    as the payment summary, ``year`` included; raises ValueError for a
+    malformed date or year.
+    """
+    queryset = reports.filter_payments(
+        archive.payments_for(params).order_by('-transaction_date', 'id'), params or {}
+    )
+    # Built eagerly so a bad filter fails before any response is started
+    if requested_year(params) == current_academic_year():
+        return _iter_rows(queryset, PAYMENT_COLUMNS, chunk_size)
+    columns = PAYMENT_COLUMNS[:-PAYMENT_LEDGER_COLUMNS]
+    return _without_ledger(_iter_rows(queryset, columns, chunk_size))
+
+
+def _without_ledger(rows):
+    yield next(rows) + [label for _, label in PAYMENT_COLUMNS[-PAYMENT_LEDGER_COLUMNS:]]
+    blank = (None,) * PAYMENT_LEDGER_COLUMNS
+    for row in rows:
+        yield row + blank
+
+
+def _iter_rows(queryset, columns, chunk_size):
+    yield [label for _, label in columns]
+    yield from queryset.values_list(*[field for field, _ in columns]).iterator(chunk_size=chunk_size)
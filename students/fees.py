@@ -0,0 +1,95 @@
+"""
+Process-local cache of the fee schedule.
+
+FeeStructure has at most one row per (grade, board) and academic year — about
+20 rows a year — but it is read on nearly every student and payment request.
+``fee_schedule`` keeps the current year's rows in memory, keyed by (grade,
+board).
+
+Writes bump the ``fee_structure`` TableVersion row in the same transaction
+(see ``students.signals``). Each worker compares that version with the one it
+loaded at most once per request, and reloads the table when they differ, so
+a change saved by one gunicorn worker is picked up by the others on their
+next request. ``QuerySet.update()`` bypasses the signals; call
+``TableVersion.bump(FEE_STRUCTURE_VERSION)`` after using it.
+"""
+import threading
+
+from django.core.signals import request_started
+
+from .models import FeeStructure, TableVersion
+from .years import current_academic_year
+
+FEE_STRUCTURE_VERSION = 'fee_structure'
+
+
+class FeeSchedule:
+    def __init__(self):
+        self._fees = None
+        self._version = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.version_checks = 0
+
+    def new_request(self):
+        """Make the next lookup on this thread re-check the shared version."""
+        self._local.checked = False
+
+    def invalidate(self):
+        with self._lock:
+            self._fees = None
+            self._version = None
+
+    def _load(self):
+        fees = self._fees
+        if fees is not None and getattr(self._local, 'checked', False):
+            self.hits += 1
+            return fees
+        # A new academic year switches schedules even without a write
+        year = current_academic_year()
+        version = (*TableVersion.current(FEE_STRUCTURE_VERSION), year)
+        self.version_checks += 1
+        self._local.checked = True
+        with self._lock:
+            if self._fees is not None and self._version == version:
+                self.hits += 1
+                return self._fees
+            self.misses += 1
+            self._fees = {(fee.grade, fee.board): fee for fee in FeeStructure.objects.filter(academic_year=year)}
+            self._version = version
+            return self._fees
+
+    def as_map(self):
+        """All fee structures keyed by (grade, board). Treat as read-only."""
+        return self._load()
+
+    def get(self, grade, board):
+        """The FeeStructure for this grade and board, or None."""
+        return self._load().get((grade, board))
+
+    def annual_fee(self, grade, board, default=0):
+        fee_structure = self.get(grade, board)
+        return fee_structure.fee_amount if fee_structure else default
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            'version_checks': self.version_checks,
+            'version': self._version[0] if self._version else None,
+            'size': len(self._fees) if self._fees is not None else 0,
+        }
+
+
+fee_schedule = FeeSchedule()
+
+
+def _on_request_started(**kwargs):
+    fee_schedule.new_request()
+
+
+request_started.connect(_on_request_started, dispatch_uid='students.fees.new_request')
@@ -0,0 +1,178 @@
+"""
+Streaming CSV import of payments.
+
+Rows are read one at a time, validated against student and fee maps loaded
+once up front, and written with ``bulk_create`` in chunks, each chunk in its
+own transaction (queued with the process's other writes, see core.writes)
+together with the ledger refresh for the students it touched. Memory use
+depends on the chunk size and the number of students, not on the size of
+the file.
+
+Expected columns (header row required)::
+
+    student, payment_mode, payment_term, amount_paid,
+    amount_due, due_date, transaction_id, notes   (optional)
+
+``student`` is the student id. amount_due and payment_status are derived
+exactly as ``Payment.save`` does when amount_due is blank or zero.
+
+A file that cannot be read as UTF-8 CSV (a cp1252 sheet saved from Excel,
+a malformed row) stops the import: the rows read before the problem are
+imported, the error is reported against the first row not read, with
+``stopped_at`` set to it, and the rest of the file is skipped.
+"""
+import csv
+
+from django.core.exceptions import ValidationError
+
+from core.writes import serialized_write
+
+from . import ledger
+from .conditional import PAYMENT_VERSION
+from .fees import fee_schedule
+from .models import Payment, Student, TableVersion
+
+REQUIRED_COLUMNS = ('student', 'payment_mode', 'payment_term', 'amount_paid')
+OPTIONAL_COLUMNS = ('amount_due', 'due_date', 'transaction_id', 'notes')
+# Keep the error report bounded too; the count is still exact
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.stopped_at = None
+
+    def add_error(self, line, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': line, 'errors': errors})
+
+    def stop(self, line, message):
+        self.stopped_at = line
+        self.failed += 1
+        # Reported even past the cap: it is why the rest of the file is missing
+        self.errors.append({'row': line, 'errors': {'file': [message]}})
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+            'stopped_at': self.stopped_at,
+        }
+
+
+class PaymentImporter:
+    def __init__(self, chunk_size=500, dry_run=False):
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.fields = {
+            name: Payment._meta.get_field(name)
+            for name in ('payment_mode', 'payment_term', 'amount_paid', 'amount_due',
+                         'due_date', 'transaction_id', 'notes')
+        }
+
+    def run(self, stream):
+        """Import from a text stream of CSV data. Returns an ImportReport."""
+        report = ImportReport()
+        self.batch = []
+        try:
+            self.read(stream, report)
+        except UnicodeDecodeError as e:
+            # Streams decode a block at a time, so the byte may be a few rows further on
+            report.stop(self.line(report), (
+                f'The file is not UTF-8 text (byte 0x{e.object[e.start]:02x} at or after this row). '
+                'Save it as "CSV UTF-8" and upload it again.'
+            ))
+        except csv.Error as e:
+            report.stop(self.line(report), f'Malformed CSV: {e}')
+        # Everything read before a stop is imported too, as earlier chunks were
+        report.created += self.flush(self.batch)
+        return report
+
+    def line(self, report):
+        # The header is line 1, then one line per row read
+        return report.rows + 1 + self.header_read
+
+    def read(self, stream, report):
+        self.header_read = False
+        reader = csv.DictReader(stream)
+        fieldnames = reader.fieldnames or []
+        self.header_read = True
+        missing = [column for column in REQUIRED_COLUMNS if column not in fieldnames]
+        if missing:
+            report.add_error(1, {'header': [f"Missing column(s): {', '.join(missing)}"]})
+            return
+
+        self.students = dict(
+            (student_id, (grade, board))
+            for student_id, grade, board in Student.objects.values_list('id', 'grade', 'board').iterator()
+        )
+        self.fees = fee_schedule.as_map()
+
+        # Line 1 is the header
+        for line, row in enumerate(reader, start=2):
+            report.rows += 1
+            payment, errors = self.build(row)
+            if errors:
+                report.add_error(line, errors)
+                continue
+            self.batch.append(payment)
+            if len(self.batch) >= self.chunk_size:
+                report.created += self.flush(self.batch)
+                self.batch = []
+
+    def build(self, row):
+        errors = {}
+        values = {}
+        student_key = self.students_key(row.get('student'))
+        if student_key is None:
+            errors['student'] = [f"Invalid student id \"{row.get('student')}\"."]
+
+        for name, field in self.fields.items():
+            raw = (row.get(name) or '').strip()
+            if name in OPTIONAL_COLUMNS and raw == '':
+                continue
+            try:
+                values[name] = field.clean(raw, None)
+            except ValidationError as e:
+                errors[name] = e.messages
+        if errors:
+            return None, errors
+
+        student_id, (grade, board) = student_key
+        payment = Payment(student_id=student_id, **values)
+        payment.apply_fee_rules(self.fees.get((grade, board)))
+        return payment, None
+
+    def students_key(self, value):
+        try:
+            student_id = int(str(value).strip())
+        except (TypeError, ValueError):
+            return None
+        if student_id not in self.students:
+            return None
+        return student_id, self.students[student_id]
+
+    def flush(self, batch):
+        if not batch or self.dry_run:
+            return len(batch)
+        self.write(batch)
+        return len(batch)
+
+    @serialized_write
+    def write(self, batch):
+        Payment.objects.bulk_create(batch)
+        # bulk_create skips save() and its signals; bring the ledgers in line in one pass
+        ledger.reconcile({payment.student_id for payment in batch})
+        TableVersion.bump(PAYMENT_VERSION)
+
+
+def import_payments(stream, chunk_size=500, dry_run=False):
+    return PaymentImporter(chunk_size=chunk_size, dry_run=dry_run).run(stream)
@@ -0,0 +1,82 @@
+"""
+Periodic background jobs run inside the web process.
+
+``start_scheduler`` (called from core.wsgi / core.asgi) starts one daemon
+thread per process. Every worker ticks, but each run first claims a lease
+row in TableVersion with a conditional UPDATE, so across all workers a job
+runs at most once per interval.
+"""
+import datetime
+import logging
+import random
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from . import overdue
+from .models import TableVersion
+
+logger = logging.getLogger(__name__)
+
+_started = False
+_start_lock = threading.Lock()
+
+
+def claim(name, interval):
+    """
+    True if this process may run job ``name`` now: its last run started at
+    least ``interval`` seconds ago and no other worker claimed it first.
+    """
+    now = timezone.now()
+    cutoff = now - datetime.timedelta(seconds=interval)
+    TableVersion.objects.get_or_create(name=name, defaults={'updated_at': cutoff})
+    return TableVersion.objects.filter(name=name, updated_at__lte=cutoff).update(
+        version=F('version') + 1, updated_at=now,
+    ) == 1
+
+
+class PeriodicJob(threading.Thread):
+    def __init__(self, name, func, interval):
+        super().__init__(name=f'job-{name}', daemon=True)
+        self.job_name = name
+        self.func = func
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        # Spread workers out so they don't all race for the lease at once
+        delay = random.uniform(0, min(self.interval, 60))
+        while not self.stopped.wait(delay):
+            self.tick()
+            delay = self.interval
+
+    def tick(self):
+        try:
+            if claim(f'job:{self.job_name}', self.interval):
+                result = self.func()
+                logger.info('Job %s finished: %s', self.job_name, result)
+        except Exception:
+            logger.exception('Job %s failed', self.job_name)
+        finally:
+            close_old_connections()
+
+    def stop(self):
+        self.stopped.set()
+
+
+def start_scheduler():
+    """Start this process's job thread, once. No-op when jobs are disabled."""
+    global _started
+    interval = settings.OVERDUE_CHECK_INTERVAL
+    if not interval:
+        return None
+    with _start_lock:
+        if _started:
+            return None
+        _started = True
+    job = PeriodicJob('overdue', overdue.run, interval)
+    job.start()
+    return job
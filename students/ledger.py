@@ -0,0 +1,252 @@
+"""
+Incremental maintenance of the StudentLedger / StudentTermLedger tables.
+
+Payment writes apply the change in amount as an ``UPDATE ... SET total_paid =
+total_paid + delta`` on the affected rows, so a balance never has to be
+recomputed from the payments table on a read. Fee structure and student
+edits refresh ``total_fee``/``balance`` for the students they affect. The
+handlers are connected in ``students.signals`` and run inside the same
+transaction as the write that triggered them.
+
+``reconcile`` recomputes ledgers from the payments table for a batch of
+students; it backs the ``reconcile_ledger`` command and repairs rows that
+are missing (e.g. students created before the ledger existed).
+
+Ledgers cover the current academic year: its fee and its payments. Changes
+to other years' payments leave them alone, and ``roll_over`` rebuilds them
+all once a new year has begun.
+"""
+from decimal import Decimal
+
+from django.db.models import F, Max, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from .conditional import STUDENT_VERSION
+from .fees import fee_schedule
+from .models import Payment, Student, StudentLedger, StudentTermLedger, TableVersion
+from .years import current_academic_year
+
+TERMS = [term for term, _ in Payment.PAYMENT_TERMS]
+TERMS_PER_YEAR = 4
+ZERO = Decimal('0.00')
+CENT = Decimal('0.01')
+# TableVersion row whose version is the academic year the ledgers hold
+LEDGER_YEAR = 'ledger_year'
+RECONCILE_CHUNK_SIZE = 1000
+
+
+def annual_fee(grade, board):
+    return fee_schedule.annual_fee(grade, board, default=ZERO)
+
+
+def term_fee(fee):
+    return fee / TERMS_PER_YEAR
+
+
+def _last_payment_date(**filters):
+    return Subquery(
+        Payment.objects.filter(student_id=OuterRef('student_id'), academic_year=current_academic_year(), **filters)
+        .order_by('-transaction_date')
+        .values('transaction_date')[:1]
+    )
+
+
+def apply_payment_delta(student_id, payment_term, delta, create_missing=True):
+    """
+    Add ``delta`` to the student's overall and per-term paid totals. Every
+    student has an overall row and one row per term from creation; rows that
+    are missing anyway are rebuilt from the payments table, which already
+    includes the payment being saved.
+    """
+    updated = StudentLedger.objects.filter(student_id=student_id).update(
+        total_paid=F('total_paid') + delta,
+        balance=F('balance') - delta,
+        last_payment_date=_last_payment_date(),
+    )
+    term_updated = StudentTermLedger.objects.filter(
+        student_id=student_id, payment_term=payment_term
+    ).update(
+        total_paid=F('total_paid') + delta,
+        balance=F('balance') - delta,
+        last_payment_date=_last_payment_date(payment_term=OuterRef('payment_term')),
+    )
+    if create_missing and not (updated and term_updated):
+        reconcile([student_id])
+
+
+def payment_saved(payment):
+    if payment.academic_year != current_academic_year():
+        return
+    previous = getattr(payment, '_ledger_state', None)
+    current = (payment.student_id, payment.payment_term, payment.amount_paid)
+    if previous and previous[:2] == current[:2]:
+        delta = current[2] - previous[2]
+        if delta:
+            apply_payment_delta(payment.student_id, payment.payment_term, delta)
+        return
+    if previous:
+        # Moved to another student or term: take it off the old rows first
+        apply_payment_delta(previous[0], previous[1], -previous[2])
+    apply_payment_delta(payment.student_id, payment.payment_term, payment.amount_paid)
+
+
+def payment_deleted(payment):
+    if payment.academic_year != current_academic_year():
+        return
+    student_id, payment_term, amount = getattr(payment, '_ledger_state', None) or (
+        payment.student_id, payment.payment_term, payment.amount_paid
+    )
+    # Never create rows here: the student itself may be going away in this cascade
+    apply_payment_delta(student_id, payment_term, -amount, create_missing=False)
+
+
+def refresh_fee(grade, board):
+    """Re-price the ledgers of every student on this grade/board schedule."""
+    fee = annual_fee(grade, board)
+    students = Student.objects.filter(grade=grade, board=board).values('id')
+    StudentLedger.objects.filter(student_id__in=students).update(
+        total_fee=fee, balance=fee - F('total_paid'),
+    )
+    StudentTermLedger.objects.filter(student_id__in=students).update(
+        total_fee=term_fee(fee), balance=term_fee(fee) - F('total_paid'),
+    )
+
+
+def fee_structure_changed(fee_structure):
+    year = current_academic_year()
+    previous = getattr(fee_structure, '_ledger_state', None)
+    current = (fee_structure.grade, fee_structure.board, fee_structure.academic_year)
+    if previous and previous != current and previous[2] == year:
+        refresh_fee(*previous[:2])
+    if current[2] == year:
+        refresh_fee(*current[:2])
+
+
+def student_saved(student, created):
+    fee = annual_fee(student.grade, student.board)
+    if created:
+        StudentLedger.objects.create(student=student, total_fee=fee, balance=fee)
+        StudentTermLedger.objects.bulk_create([
+            StudentTermLedger(student=student, payment_term=payment_term,
+                              total_fee=term_fee(fee), balance=term_fee(fee))
+            for payment_term in TERMS
+        ])
+        return
+    updated = StudentLedger.objects.filter(student=student).update(
+        total_fee=fee, balance=fee - F('total_paid'),
+    )
+    if not updated:
+        reconcile([student.pk])
+        return
+    StudentTermLedger.objects.filter(student=student).update(
+        total_fee=term_fee(fee), balance=term_fee(fee) - F('total_paid'),
+    )
+
+
+def get_ledger(student):
+    """The student's ledger row, built on first use if it is missing."""
+    try:
+        return student.ledger
+    except StudentLedger.DoesNotExist:
+        reconcile([student.pk])
+        return StudentLedger.objects.get(student=student)
+
+
+def _quantize(value):
+    return (value or ZERO).quantize(CENT)
+
+
+def _differs(row, expected):
+    for field, value in expected.items():
+        current = getattr(row, field)
+        if field == 'last_payment_date':
+            if current != value:
+                return True
+        elif _quantize(current) != _quantize(value):
+            return True
+    return False
+
+
+def reconcile(student_ids, fix=True):
+    """
+    Recompute ledger rows for ``student_ids`` (overall plus one per term)
+    from the payments table with one grouped query, and (when ``fix``) write
+    back any rows that are missing or wrong. Returns the number of rows that
+    were out of date.
+    """
+    students = {
+        row['id']: row for row in Student.objects.filter(id__in=student_ids).values('id', 'grade', 'board')
+    }
+    fees = {key: fee.fee_amount for key, fee in fee_schedule.as_map().items()}
+    paid = {}
+    for row in (
+        Payment.objects.filter(student_id__in=list(students), academic_year=current_academic_year())
+        .values('student_id', 'payment_term')
+        .annotate(paid=Sum('amount_paid'), last=Max('transaction_date'))
+        .order_by()
+    ):
+        paid[(row['student_id'], row['payment_term'])] = (row['paid'] or ZERO, row['last'])
+
+    expected, expected_terms = {}, {}
+    for student_id, student in students.items():
+        fee = fees.get((student['grade'], student['board']), ZERO)
+        expected[student_id] = {'total_fee': fee, 'total_paid': ZERO, 'balance': fee, 'last_payment_date': None}
+        for payment_term in TERMS:
+            expected_terms[(student_id, payment_term)] = {
+                'total_fee': term_fee(fee), 'total_paid': ZERO, 'balance': term_fee(fee), 'last_payment_date': None,
+            }
+    for (student_id, payment_term), (amount, last) in paid.items():
+        for row in (expected[student_id], expected_terms[(student_id, payment_term)]):
+            row['total_paid'] += amount
+            row['balance'] -= amount
+            if last and (row['last_payment_date'] is None or last > row['last_payment_date']):
+                row['last_payment_date'] = last
+
+    existing = {row.student_id: row for row in StudentLedger.objects.filter(student_id__in=list(students))}
+    existing_terms = {
+        (row.student_id, row.payment_term): row
+        for row in StudentTermLedger.objects.filter(student_id__in=list(students))
+    }
+
+    fields = ['total_fee', 'total_paid', 'balance', 'last_payment_date']
+    stale = 0
+    for model, rows, wanted, build in (
+        (StudentLedger, existing, expected, lambda key: StudentLedger(student_id=key)),
+        (StudentTermLedger, existing_terms, expected_terms,
+         lambda key: StudentTermLedger(student_id=key[0], payment_term=key[1])),
+    ):
+        to_create, to_update = [], []
+        for key, values in wanted.items():
+            row = rows.get(key)
+            if row is None:
+                row = build(key)
+                to_create.append(row)
+            elif _differs(row, values):
+                to_update.append(row)
+            else:
+                continue
+            for field, value in values.items():
+                setattr(row, field, value)
+        stale += len(to_create) + len(to_update)
+        if fix:
+            model.objects.bulk_create(to_create)
+            model.objects.bulk_update(to_update, fields)
+    if fix and stale:
+        # Ledger totals are part of the student resources' ETags
+        TableVersion.bump(STUDENT_VERSION)
+    return stale
+
+
+def roll_over():
+    """
+    Rebuild every ledger from the current year's fee and payments if they
+    still hold an earlier year. Returns the number of students rebuilt.
+    """
+    year = current_academic_year()
+    if TableVersion.current(LEDGER_YEAR)[0] >= year:
+        return 0
+    student_ids = list(Student.objects.values_list('id', flat=True))
+    for start in range(0, len(student_ids), RECONCILE_CHUNK_SIZE):
+        reconcile(student_ids[start:start + RECONCILE_CHUNK_SIZE])
+    TableVersion.objects.update_or_create(name=LEDGER_YEAR, defaults={'version': year, 'updated_at': timezone.now()})
+    return len(student_ids)
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from students import archive
+
+
+class Command(BaseCommand):
+    help = "Move a closed academic year's payments to the payment archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument('year', type=int, help='Calendar year the academic year started in, e.g. 2024.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=archive.DEFAULT_CHUNK_SIZE,
+            help='Payments moved per transaction.',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Count what would be moved without writing anything.',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        try:
+            moved = archive.archive_year(
+                options['year'], chunk_size=options['chunk_size'], dry_run=options['dry_run'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {moved} payments of {options['year']}."))
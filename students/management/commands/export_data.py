@@ -0,0 +1,50 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.exports import WRITERS
+from students import exports
+
+
+class Command(BaseCommand):
+    help = 'Export students or payments (with fee and balance columns) as CSV or XLSX.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=['students', 'payments'])
+        parser.add_argument('--format', dest='file_format', choices=sorted(WRITERS), default='csv')
+        parser.add_argument('--output', default='-', help='File to write, or "-" for stdout (default).')
+        parser.add_argument('--grade')
+        parser.add_argument('--board')
+        parser.add_argument('--date-from', help='Payments only: YYYY-MM-DD.')
+        parser.add_argument('--date-to', help='Payments only: YYYY-MM-DD.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=exports.DEFAULT_CHUNK_SIZE,
+            help=f'Rows fetched per database round trip (default: {exports.DEFAULT_CHUNK_SIZE}).',
+        )
+
+    def handle(self, *args, **options):
+        params = {
+            key: options[key] for key in ('grade', 'board', 'date_from', 'date_to') if options[key]
+        }
+        source = exports.student_rows if options['dataset'] == 'students' else exports.payment_rows
+        try:
+            rows = source(params, chunk_size=options['chunk_size'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        writer, _ = WRITERS[options['file_format']]
+        path = options['output']
+        try:
+            output = sys.stdout.buffer if path == '-' else open(path, 'wb')
+        except OSError as e:
+            raise CommandError(f'Cannot open {path}: {e}')
+        written = 0
+        try:
+            for chunk in writer(rows):
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if path != '-':
+                output.close()
+        if path != '-':
+            self.stdout.write(self.style.SUCCESS(f'Wrote {written} bytes to {path}.'))
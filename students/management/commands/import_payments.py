@@ -0,0 +1,50 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from students.importers import import_payments
+
+
+class Command(BaseCommand):
+    help = 'Import payments from a CSV file, streaming it in chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to import, or "-" for stdin.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Rows written per transaction (default: 500).',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Validate every row without writing anything.',
+        )
+        parser.add_argument(
+            '--report', help='Write the full JSON report (including row errors) to this file.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8-sig')
+        except OSError as e:
+            raise CommandError(f'Cannot open {path}: {e}')
+        with stream:
+            report = import_payments(stream, chunk_size=options['chunk_size'], dry_run=options['dry_run'])
+
+        result = report.as_dict()
+        if options['report']:
+            with open(options['report'], 'w') as f:
+                json.dump(result, f, indent=2, default=str)
+        for error in result['errors'][:20]:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        if result['errors_truncated'] or len(result['errors']) > 20:
+            self.stderr.write('...')
+
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        style = self.style.SUCCESS if not result['failed'] else self.style.WARNING
+        self.stdout.write(style(
+            f"{verb} {result['created']} of {result['rows']} rows; {result['failed']} rejected."
+        ))
+        if result['stopped_at']:
+            raise CommandError(f"Stopped at row {result['stopped_at']}; the rest of the file was not read.")
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from students import overdue
+
+
+class Command(BaseCommand):
+    help = 'Flag overdue term dues and payments in bulk.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Evaluate as of this date (YYYY-MM-DD) instead of today.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Count what would change without writing anything.',
+        )
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            today = parse_date(options['date'])
+            if today is None:
+                raise CommandError('--date must be in YYYY-MM-DD format')
+
+        try:
+            result = overdue.run(today=today, dry_run=options['dry_run'])
+        except ValueError as e:
+            raise CommandError(f'--date: {e}')
+        verb = 'Would flag' if options['dry_run'] else 'Flagged'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result['flagged']} term dues overdue, cleared {result['cleared']}, "
+            f"{result['payments_overdue']} payments overdue; "
+            f"{result['students_added']} students given ledger rows."
+        ))
+        if result.get('ledgers_rolled_over'):
+            self.stdout.write(f"Ledgers rolled over to the new academic year for {result['ledgers_rolled_over']} students.")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from students import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text student search index from the students table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database alias to rebuild (default: "default").',
+        )
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if not search.is_available(using):
+            raise CommandError(
+                'The search index table does not exist on this database '
+                '(FTS5 unavailable or migrations not applied); search uses the ORM fallback.'
+            )
+        with transaction.atomic(using=using):
+            count = search.rebuild_index(using)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} students.'))
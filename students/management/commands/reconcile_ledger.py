@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from students import ledger
+from students.models import Student
+
+
+class Command(BaseCommand):
+    help = 'Check student ledgers against the payments table and repair any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Number of students checked per transaction (default: 500).',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report out-of-date rows without writing anything.',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        fix = not options['dry_run']
+        last_id, checked, stale = 0, 0, 0
+        while True:
+            ids = list(
+                Student.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                stale += ledger.reconcile(ids, fix=fix)
+            checked += len(ids)
+            last_id = ids[-1]
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Checked {checked} students...')
+
+        verb = 'Repaired' if fix else 'Found'
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} students. {verb} {stale} out-of-date ledger rows.'
+        ))
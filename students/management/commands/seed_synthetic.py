@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from students import synthetic
+
+
+class Command(BaseCommand):
+    help = 'Bulk-insert realistic synthetic students, payments and users for development and benchmarks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=20000)
+        parser.add_argument('--payments', type=int, default=300000)
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument(
+            '--years', type=int, default=1,
+            help='Spread payments over this many academic years, the current one included (default: 1).',
+        )
+        parser.add_argument('--seed', type=int, help='Random seed, for reproducible data.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=synthetic.DEFAULT_CHUNK_SIZE,
+            help=f'Rows inserted per transaction (default: {synthetic.DEFAULT_CHUNK_SIZE}).',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Seed even with DEBUG off. The rows are added to the real tables.',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('Refusing to add synthetic data with DEBUG off; pass --force if this is a scratch database.')
+        for name in ('students', 'payments', 'users'):
+            if options[name] < 0:
+                raise CommandError(f'--{name} cannot be negative')
+        if options['years'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('--years and --chunk-size must be at least 1')
+
+        started = time.perf_counter()
+        added = synthetic.seed(
+            students=options['students'], payments=options['payments'], users=options['users'],
+            years=options['years'], seed=options['seed'], chunk_size=options['chunk_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Added {added['students']} students, {added['payments']} payments and {added['users']} users "
+            f"in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.db_router import sync_replica
+
+
+class Command(BaseCommand):
+    help = 'Refresh the read replica (a local SQLite copy of the default database).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            help='Keep running, syncing every this many seconds.',
+        )
+        parser.add_argument(
+            '--pages', type=int, default=-1,
+            help='Pages per backup step (default: all in one step).',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            try:
+                pages = sync_replica(pages=options['pages'])
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(
+                f'Replica synced: {pages} pages in {(time.perf_counter() - started) * 1000:.0f}ms.'
+            ))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,44 @@
+from django.db import OperationalError, migrations
+
+FTS_TABLE = 'students_student_fts'
+COLUMNS = 'first_name, last_name, parent_name, grade, board'
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if not cursor.fetchone()[0]:
+            return
+        try:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                f"USING fts5({COLUMNS}, tokenize='trigram')"
+            )
+        except OperationalError:
+            # The trigram tokenizer needs SQLite 3.34+; search falls back to the ORM
+            return
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, {COLUMNS}) "
+            f"SELECT id, {COLUMNS} FROM students_student"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0004_remove_fine_amount'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
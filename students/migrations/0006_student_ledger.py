@@ -0,0 +1,81 @@
+# Generated by Django 5.1.4 on 2026-10-18 07:11
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Max, Sum
+
+
+def backfill_ledgers(apps, schema_editor):
+    Student = apps.get_model('students', 'Student')
+    FeeStructure = apps.get_model('students', 'FeeStructure')
+    Payment = apps.get_model('students', 'Payment')
+    StudentLedger = apps.get_model('students', 'StudentLedger')
+    StudentTermLedger = apps.get_model('students', 'StudentTermLedger')
+
+    fees = {(fee.grade, fee.board): fee.fee_amount for fee in FeeStructure.objects.all()}
+    ledgers = {
+        student.id: StudentLedger(
+            student_id=student.id,
+            total_fee=fees.get((student.grade, student.board), Decimal('0')),
+        )
+        for student in Student.objects.only('id', 'grade', 'board').iterator()
+    }
+    term_ledgers = []
+    totals = (
+        Payment.objects.values('student_id', 'payment_term')
+        .annotate(paid=Sum('amount_paid'), last=Max('transaction_date'))
+        .order_by()
+    )
+    for row in totals.iterator():
+        ledger = ledgers[row['student_id']]
+        ledger.total_paid += row['paid'] or 0
+        if ledger.last_payment_date is None or row['last'] > ledger.last_payment_date:
+            ledger.last_payment_date = row['last']
+        term_fee = ledger.total_fee / 4
+        term_ledgers.append(StudentTermLedger(
+            student_id=row['student_id'], payment_term=row['payment_term'],
+            total_fee=term_fee, total_paid=row['paid'] or 0,
+            balance=term_fee - (row['paid'] or 0), last_payment_date=row['last'],
+        ))
+    for ledger in ledgers.values():
+        ledger.balance = ledger.total_fee - ledger.total_paid
+    StudentLedger.objects.bulk_create(ledgers.values(), batch_size=1000)
+    StudentTermLedger.objects.bulk_create(term_ledgers, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0005_student_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_fee', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_paid', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('last_payment_date', models.DateField(blank=True, null=True)),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ledger', to='students.student')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StudentTermLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payment_term', models.CharField(choices=[('Term 1', 'Term 1 (Months 1-3)'), ('Term 2', 'Term 2 (Months 4-6)'), ('Term 3', 'Term 3 (Months 7-9)'), ('Term 4', 'Term 4 (Months 10-12)')], max_length=10)),
+                ('total_fee', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_paid', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('last_payment_date', models.DateField(blank=True, null=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='term_ledgers', to='students.student')),
+            ],
+            options={
+                'unique_together': {('student', 'payment_term')},
+            },
+        ),
+        migrations.RunPython(backfill_ledgers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.4 on 2026-10-18 07:35
+
+from django.db import migrations, models
+
+
+def create_table_versions(apps, schema_editor):
+    # Rows exist up front so TableVersion.bump is always a single UPDATE
+    TableVersion = apps.get_model('students', 'TableVersion')
+    for name in ('student', 'payment', 'fee_structure'):
+        TableVersion.objects.using(schema_editor.connection.alias).get_or_create(name=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0007_table_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feestructure',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(create_table_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-18 07:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0009_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studenttermledger',
+            name='due_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='studenttermledger',
+            name='overdue',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='studenttermledger',
+            index=models.Index(condition=models.Q(('overdue', True)), fields=['due_date', 'id'], name='term_ledger_overdue_idx'),
+        ),
+    ]
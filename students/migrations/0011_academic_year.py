@@ -0,0 +1,155 @@
+# Generated by Django 5.1.4 on 2026-10-18 08:22
+
+from decimal import Decimal
+
+import django.db.models.deletion
+import django.utils.timezone
+import students.years
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Max, Sum, When
+from django.db.models.functions import ExtractYear
+
+
+def set_academic_years(apps, schema_editor):
+    """Existing payments belong to the academic year of their transaction date."""
+    Payment = apps.get_model('students', 'Payment')
+    Payment.objects.update(academic_year=Case(
+        When(transaction_date__month__gte=settings.ACADEMIC_YEAR_START_MONTH,
+             then=ExtractYear('transaction_date')),
+        default=ExtractYear('transaction_date') - 1,
+    ))
+    rebuild_ledgers(apps, students.years.current_academic_year())
+
+
+def rebuild_ledgers(apps, year, chunk_size=1000):
+    """
+    Recompute every ledger from ``year``'s payments, as ledger.reconcile
+    does, then record the year in students.ledger.LEDGER_YEAR. The ledgers
+    held every payment ever made until now.
+    """
+    Student = apps.get_model('students', 'Student')
+    Payment = apps.get_model('students', 'Payment')
+    FeeStructure = apps.get_model('students', 'FeeStructure')
+    StudentLedger = apps.get_model('students', 'StudentLedger')
+    StudentTermLedger = apps.get_model('students', 'StudentTermLedger')
+    TableVersion = apps.get_model('students', 'TableVersion')
+
+    terms = [term for term, _ in Payment._meta.get_field('payment_term').choices]
+    fees = {
+        (fee.grade, fee.board): fee.fee_amount
+        for fee in FeeStructure.objects.filter(academic_year=year)
+    }
+    fields = ['total_fee', 'total_paid', 'balance', 'last_payment_date']
+    student_ids = list(Student.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(student_ids), chunk_size):
+        chunk = student_ids[start:start + chunk_size]
+        paid = {
+            (row['student_id'], row['payment_term']): (row['paid'], row['last'])
+            for row in Payment.objects.filter(student_id__in=chunk, academic_year=year)
+            .values('student_id', 'payment_term')
+            .annotate(paid=Sum('amount_paid'), last=Max('transaction_date'))
+            .order_by()
+        }
+        ledgers = {row.student_id: row for row in StudentLedger.objects.filter(student_id__in=chunk)}
+        term_ledgers = {
+            (row.student_id, row.payment_term): row
+            for row in StudentTermLedger.objects.filter(student_id__in=chunk)
+        }
+        stored, stored_terms = list(ledgers.values()), list(term_ledgers.values())
+        new, new_terms = [], []
+        for student in Student.objects.filter(id__in=chunk).only('id', 'grade', 'board'):
+            fee = fees.get((student.grade, student.board), Decimal('0'))
+            ledger = ledgers.get(student.id)
+            if ledger is None:
+                ledger = StudentLedger(student_id=student.id)
+                new.append(ledger)
+            ledger.total_fee, ledger.total_paid, ledger.last_payment_date = fee, Decimal('0'), None
+            for term in terms:
+                amount, last = paid.get((student.id, term), (Decimal('0'), None))
+                row = term_ledgers.get((student.id, term))
+                if row is None:
+                    row = StudentTermLedger(student_id=student.id, payment_term=term)
+                    new_terms.append(row)
+                row.total_fee, row.total_paid, row.last_payment_date = fee / 4, amount, last
+                row.balance = row.total_fee - amount
+                ledger.total_paid += amount
+                if last and (ledger.last_payment_date is None or last > ledger.last_payment_date):
+                    ledger.last_payment_date = last
+            ledger.balance = fee - ledger.total_paid
+        StudentLedger.objects.bulk_create(new)
+        StudentLedger.objects.bulk_update(stored, fields)
+        StudentTermLedger.objects.bulk_create(new_terms)
+        StudentTermLedger.objects.bulk_update(stored_terms, fields)
+    TableVersion.objects.update_or_create(name='ledger_year', defaults={'version': year})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0010_overdue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedYear',
+            fields=[
+                ('academic_year', models.PositiveSmallIntegerField(primary_key=True, serialize=False)),
+                ('payments', models.PositiveIntegerField(default=0)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PaymentArchive',
+            fields=[
+                ('payment_mode', models.CharField(choices=[('Cash', 'Cash'), ('Cheque', 'Cheque'), ('Online', 'Online')], max_length=10)),
+                ('payment_term', models.CharField(choices=[('Term 1', 'Term 1 (Months 1-3)'), ('Term 2', 'Term 2 (Months 4-6)'), ('Term 3', 'Term 3 (Months 7-9)'), ('Term 4', 'Term 4 (Months 10-12)')], max_length=10)),
+                ('payment_status', models.CharField(choices=[('Pending', 'Pending'), ('Paid', 'Paid'), ('Partial', 'Partial'), ('Overdue', 'Overdue')], default='Pending', max_length=10)),
+                ('amount_paid', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('amount_due', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('due_date', models.DateField(blank=True, null=True)),
+                ('transaction_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('academic_year', models.PositiveSmallIntegerField(default=students.years.current_academic_year)),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('transaction_date', models.DateField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='payment',
+            name='payment_date_id_idx',
+        ),
+        migrations.AlterUniqueTogether(
+            name='feestructure',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='feestructure',
+            name='academic_year',
+            field=models.PositiveSmallIntegerField(default=students.years.current_academic_year),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='academic_year',
+            field=models.PositiveSmallIntegerField(default=students.years.current_academic_year),
+        ),
+        migrations.RunPython(set_academic_years, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='feestructure',
+            unique_together={('academic_year', 'grade', 'board')},
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['academic_year', '-transaction_date', 'id'], name='payment_year_date_id_idx'),
+        ),
+        migrations.AddField(
+            model_name='paymentarchive',
+            name='student',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_payments', to='students.student'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentarchive',
+            index=models.Index(fields=['academic_year', '-transaction_date', 'id'], name='archive_year_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+def mark_complete(apps, schema_editor):
+    """Years recorded before this field were only recorded once fully moved."""
+    ArchivedYear = apps.get_model('students', 'ArchivedYear')
+    ArchivedYear.objects.update(complete=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0011_academic_year'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedyear',
+            name='complete',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_complete, migrations.RunPython.noop),
+    ]
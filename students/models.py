@@ -1,6 +1,11 @@
 # students/models.py
 
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .years import current_academic_year
 
 class Student(models.Model):
     GRADE_CHOICES = [(str(i), f"Grade {i}") for i in range(1, 11)]
@@ -16,6 +21,13 @@ class Student(models.Model):
     parent_contact_secondary = models.CharField(max_length=15, blank=True, null=True)
 
     admission_date = models.DateField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Fee re-pricing, exports and report filters select by grade and board
+            models.Index(fields=['grade', 'board'], name='student_grade_board_idx'),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} - Grade {self.grade} ({self.board})"
@@ -24,14 +36,33 @@ class FeeStructure(models.Model):
     grade = models.CharField(choices=Student.GRADE_CHOICES, max_length=2)
     board = models.CharField(choices=Student.BOARD_CHOICES, max_length=5)
     fee_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    # Next year's fees can be entered ahead of time; only the current year's are charged
+    academic_year = models.PositiveSmallIntegerField(default=current_academic_year)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
-        unique_together = ('grade', 'board')
+        unique_together = ('academic_year', 'grade', 'board')
 
     def __str__(self):
         return f"{self.grade} - {self.board} → ₹{self.fee_amount}"
 
-class Payment(models.Model):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored key so a grade/board edit refreshes both schedules
+        instance._ledger_state = (
+            instance.__dict__.get('grade'), instance.__dict__.get('board'), instance.__dict__.get('academic_year'),
+        )
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Ledger balances are refreshed by the post_save signal in the same transaction
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+        self._ledger_state = (self.grade, self.board, self.academic_year)
+
+class PaymentFields(models.Model):
+    """Columns shared by live payments and the archive of closed years."""
     PAYMENT_MODES = [
         ('Cash', 'Cash'),
         ('Cheque', 'Cheque'),
@@ -52,7 +83,8 @@ class Payment(models.Model):
         ('Overdue', 'Overdue'),
     ]
 
-    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    # Indexed through payment_student_date_idx below, which leads with student
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, db_index=False)
     payment_mode = models.CharField(choices=PAYMENT_MODES, max_length=10)
     payment_term = models.CharField(choices=PAYMENT_TERMS, max_length=10)
     payment_status = models.CharField(choices=PAYMENT_STATUS, max_length=10, default='Pending')
@@ -62,22 +94,47 @@ class Payment(models.Model):
     due_date = models.DateField(null=True, blank=True)
     transaction_id = models.CharField(max_length=100, blank=True, null=True)  # Only if online
     notes = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    academic_year = models.PositiveSmallIntegerField(default=current_academic_year)
+
+    class Meta:
+        abstract = True
 
     def __str__(self):
         return f"{self.student.first_name} {self.student.last_name} - {self.payment_term} - ₹{self.amount_paid} ({self.payment_mode})"
+
+class Payment(PaymentFields):
+    class Meta:
+        indexes = [
+            # A student's payments newest first, and the ledger's last-payment lookups
+            models.Index(fields=['student', '-transaction_date'], name='payment_student_date_idx'),
+            # Payment list keyset pages, exports and report filters, all within one year
+            models.Index(fields=['academic_year', '-transaction_date', 'id'], name='payment_year_date_id_idx'),
+            # Report filters by payment mode (and date)
+            models.Index(fields=['payment_mode', 'transaction_date'], name='payment_mode_date_idx'),
+        ]
     
-    def save(self, *args, **kwargs):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What the ledger currently holds for this payment, used to apply deltas on save
+        instance._ledger_state = (
+            instance.__dict__.get('student_id'),
+            instance.__dict__.get('payment_term'),
+            instance.__dict__.get('amount_paid'),
+        )
+        return instance
+    
+    def apply_fee_rules(self, fee_structure):
+        """
+        Fill in amount_due (if not set) and payment_status. ``fee_structure``
+        is the student's FeeStructure or None. Bulk importers call this
+        directly so rows they insert match what save() would have stored.
+        """
         # Auto-calculate amount_due if not set
         if not self.amount_due:
-            try:
-                fee_structure = FeeStructure.objects.get(
-                    grade=self.student.grade,
-                    board=self.student.board
-                )
-                # Each term is 1/4 of the total annual fee
-                self.amount_due = fee_structure.fee_amount / 4
-            except FeeStructure.DoesNotExist:
-                self.amount_due = 0
+            # Each term is 1/4 of the total annual fee
+            self.amount_due = fee_structure.fee_amount / 4 if fee_structure else 0
         
         # Update payment status based on amount paid vs due
         if self.amount_paid >= self.amount_due:
@@ -86,5 +143,135 @@ class Payment(models.Model):
             self.payment_status = 'Partial'
         else:
             self.payment_status = 'Pending'
-            
-        super().save(*args, **kwargs)
+        
+        # Not covered by its due date (students.overdue flags older rows in bulk)
+        due_date = self._meta.get_field('due_date').to_python(self.due_date)
+        if self.payment_status != 'Paid' and due_date and due_date < timezone.localdate():
+            self.payment_status = 'Overdue'
+    
+    def save(self, *args, **kwargs):
+        ArchivedYear.check_open(self.academic_year)
+        fee_structure = None
+        if not self.amount_due:
+            from .fees import fee_schedule
+            fee_structure = fee_schedule.get(self.student.grade, self.student.board)
+        self.apply_fee_rules(fee_structure)
+        
+        # The post_save signal updates the student's ledger in the same transaction
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+        self._ledger_state = (self.student_id, self.payment_term, self.amount_paid)
+
+    def delete(self, *args, **kwargs):
+        ArchivedYear.check_open(self.academic_year)
+        return super().delete(*args, **kwargs)
+
+class PaymentArchive(PaymentFields):
+    """
+    Payments of closed academic years, moved out of Payment by the
+    ``archive_academic_year`` command with their ids. Read-only.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='archived_payments')
+    # Copied as they were, not stamped with the archiving time
+    transaction_date = models.DateField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['academic_year', '-transaction_date', 'id'], name='archive_year_date_id_idx'),
+        ]
+
+class ArchivedYear(models.Model):
+    """
+    An academic year whose payments live in PaymentArchive, or are being
+    copied there (``complete`` False). Either way they can no longer change.
+    """
+    academic_year = models.PositiveSmallIntegerField(primary_key=True)
+    payments = models.PositiveIntegerField(default=0)
+    archived_at = models.DateTimeField(default=timezone.now)
+    # Set once every payment is in the archive; reads switch tables then
+    complete = models.BooleanField(default=False)
+
+    def __str__(self):
+        if not self.complete:
+            return f"{self.academic_year}: archiving"
+        return f"{self.academic_year}: {self.payments} payments archived"
+
+    @classmethod
+    def is_closed(cls, year):
+        """Whether ``year``'s payments are archived or being archived. No query for the current year."""
+        return year != current_academic_year() and cls.objects.filter(academic_year=year).exists()
+
+    @classmethod
+    def check_open(cls, year):
+        if cls.is_closed(year):
+            raise ValidationError(f'Payments of academic year {year} are archived and cannot be changed.')
+
+class TableVersion(models.Model):
+    """
+    Change counter for a table, bumped in the same transaction as writes to
+    it. Process-local caches compare it against the version they loaded to
+    notice changes made by other workers.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+    @classmethod
+    def bump(cls, name):
+        updated = cls.objects.filter(name=name).update(
+            version=F('version') + 1, updated_at=timezone.now()
+        )
+        if not updated:
+            cls.objects.get_or_create(name=name, defaults={'version': 1})
+
+    @classmethod
+    def current(cls, name):
+        """
+        (version, updated_at) for the table. The timestamp tells apart two
+        writers that reached the same number after one of them rolled back.
+        """
+        return cls.objects.filter(name=name).values_list('version', 'updated_at').first() or (0, None)
+
+class StudentLedger(models.Model):
+    """
+    Running fee balance for a student, maintained incrementally by
+    students.ledger whenever payments, fee structures or the student change.
+    """
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, related_name='ledger')
+    total_fee = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    last_payment_date = models.DateField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.student_id}: paid ₹{self.total_paid} of ₹{self.total_fee}"
+
+class StudentTermLedger(models.Model):
+    """Per-term counterpart of StudentLedger; total_fee is a quarter of the annual fee."""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='term_ledgers')
+    payment_term = models.CharField(choices=Payment.PAYMENT_TERMS, max_length=10)
+    total_fee = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    last_payment_date = models.DateField(null=True, blank=True)
+    # Set by students.overdue: this term's due date in the current academic
+    # year, and whether it had passed with a balance outstanding at the last run
+    due_date = models.DateField(null=True, blank=True)
+    overdue = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('student', 'payment_term')
+        indexes = [
+            # Only overdue rows are indexed; /api/payments/overdue/ reads them in due-date order
+            models.Index(
+                fields=['due_date', 'id'], condition=models.Q(overdue=True), name='term_ledger_overdue_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} {self.payment_term}: paid ₹{self.total_paid} of ₹{self.total_fee}"
@@ -0,0 +1,104 @@
+"""
+Set-based overdue detection.
+
+Expected dues per student and term are already kept in StudentTermLedger:
+``total_fee`` is the term's share of the FeeStructure fee and ``balance``
+what is still owed after the payments received. ``run`` compares them with
+the term due dates of the current academic year
+(``settings.PAYMENT_TERM_DUE_DATES``) using a handful of bulk UPDATEs:
+
+* every term row gets its due date,
+* rows past their due date with a balance outstanding are flagged
+  ``overdue``, and rows that were paid off (or are not due yet) are cleared,
+* payments whose own ``due_date`` has passed while still Pending or Partial
+  get status 'Overdue'.
+
+Students without term rows (bulk inserts that were never reconciled) get
+them first, so every student is covered. The first run of a new academic
+year rebuilds all ledgers for it (``ledger.roll_over``), in a transaction of
+its own. The statement count does not depend on the number of students.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import ledger
+from .conditional import PAYMENT_VERSION, STUDENT_VERSION
+from .models import Payment, Student, StudentTermLedger, TableVersion
+from .years import academic_year_start, current_academic_year
+
+RECONCILE_CHUNK_SIZE = 1000
+OPEN_STATUSES = ('Pending', 'Partial')
+
+
+def term_due_dates(day=None):
+    """Due date of each term in the academic year containing ``day`` (default today)."""
+    day = day or timezone.localdate()
+    start = academic_year_start(day)
+    return {
+        term: datetime.date(start if month >= settings.ACADEMIC_YEAR_START_MONTH else start + 1, month, dom)
+        for term, (month, dom) in settings.PAYMENT_TERM_DUE_DATES.items()
+    }
+
+
+def create_missing_term_rows(dry_run=False):
+    missing = list(Student.objects.filter(term_ledgers__isnull=True).values_list('id', flat=True))
+    if not dry_run:
+        for start in range(0, len(missing), RECONCILE_CHUNK_SIZE):
+            ledger.reconcile(missing[start:start + RECONCILE_CHUNK_SIZE])
+    return len(missing)
+
+
+def run(today=None, dry_run=False):
+    """
+    Bring overdue flags up to date as of ``today``, which must fall in the
+    current academic year: ledgers only hold that year's balances. Returns
+    counts of the rows that were (or, with ``dry_run``, would be) changed.
+    """
+    today = today or timezone.localdate()
+    if academic_year_start(today) != current_academic_year():
+        raise ValueError(f'{today} is not in the current academic year ({current_academic_year()})')
+    result = {'students_added': 0, 'flagged': 0, 'cleared': 0, 'payments_overdue': 0}
+
+    if not dry_run:
+        # First run of a new academic year: balances start over. Committed on
+        # its own so the flagging below doesn't hold the lock for a rebuild.
+        with transaction.atomic():
+            result['ledgers_rolled_over'] = ledger.roll_over()
+
+    with transaction.atomic():
+        result['students_added'] = create_missing_term_rows(dry_run)
+
+        def apply(queryset, **values):
+            return queryset.count() if dry_run else queryset.update(**values)
+
+        for term, due_date in term_due_dates(today).items():
+            rows = StudentTermLedger.objects.filter(payment_term=term)
+            if not dry_run:
+                rows.exclude(due_date=due_date).update(due_date=due_date)
+            if due_date < today:
+                result['flagged'] += apply(rows.filter(balance__gt=0, overdue=False), overdue=True)
+                result['cleared'] += apply(rows.filter(balance__lte=0, overdue=True), overdue=False)
+            else:
+                result['cleared'] += apply(rows.filter(overdue=True), overdue=False)
+
+        result['payments_overdue'] = apply(
+            Payment.objects.filter(due_date__lt=today, payment_status__in=OPEN_STATUSES),
+            payment_status='Overdue', updated_at=timezone.now(),
+        )
+
+        if not dry_run and any(result.values()):
+            TableVersion.bump(STUDENT_VERSION)
+            TableVersion.bump(PAYMENT_VERSION)
+    return result
+
+
+def overdue_dues():
+    """Term rows that are overdue and still unpaid, oldest due date first."""
+    return (
+        StudentTermLedger.objects.filter(overdue=True, balance__gt=0)
+        .select_related('student')
+        .order_by('due_date', 'id')
+    )
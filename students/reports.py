@@ -0,0 +1,105 @@
+"""
+Set-based reporting queries over payments.
+
+``payment_rollup`` groups payments by every reporting dimension at once and
+folds the groups into per-dimension totals in Python. SQLite has no
+GROUPING SETS/ROLLUP, and the number of groups is small (modes x terms x
+statuses x grades x boards x months), so one scan plus a Python fold beats
+one aggregate query per breakdown.
+"""
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils.dateparse import parse_date
+
+from .models import Payment, Student
+
+DIMENSIONS = ('mode', 'term', 'status', 'grade', 'board', 'month')
+
+
+def filter_payments(queryset, params):
+    """
+    Apply the optional ``date_from``/``date_to`` (YYYY-MM-DD), ``grade``,
+    ``board`` and ``payment_mode`` report filters. Raises ValueError for
+    malformed dates.
+    """
+    for param, lookup in (('date_from', 'transaction_date__gte'), ('date_to', 'transaction_date__lte')):
+        value = params.get(param)
+        if value:
+            parsed = parse_date(value)
+            if parsed is None:
+                raise ValueError(f'{param} must be a date in YYYY-MM-DD format')
+            queryset = queryset.filter(**{lookup: parsed})
+    if params.get('grade'):
+        queryset = queryset.filter(student__grade=params['grade'])
+    if params.get('board'):
+        queryset = queryset.filter(student__board=params['board'])
+    if params.get('payment_mode'):
+        queryset = queryset.filter(payment_mode=params['payment_mode'])
+    return queryset
+
+
+def payment_rollup(queryset):
+    """Totals overall and per mode/term/status/grade/board/month, from one grouped query."""
+    return fold_rollup(rollup_groups(queryset))
+
+
+async def apayment_rollup(queryset):
+    """``payment_rollup`` for async views."""
+    return fold_rollup([group async for group in rollup_groups(queryset)])
+
+
+def rollup_groups(queryset):
+    return (
+        queryset
+        .values(
+            mode=F('payment_mode'), term=F('payment_term'), status=F('payment_status'),
+            grade=F('student__grade'), board=F('student__board'),
+            month=TruncMonth('transaction_date'),
+        )
+        .annotate(count=Count('id'), amount=Sum('amount_paid'))
+        .order_by()
+    )
+
+
+def fold_rollup(groups):
+    breakdowns = {dimension: {} for dimension in DIMENSIONS}
+    # Every known choice is present even with no payments, as payments_by_mode always was
+    for dimension, choices in (
+        ('mode', Payment.PAYMENT_MODES), ('term', Payment.PAYMENT_TERMS),
+        ('status', Payment.PAYMENT_STATUS), ('grade', Student.GRADE_CHOICES),
+        ('board', Student.BOARD_CHOICES),
+    ):
+        for value, _ in choices:
+            breakdowns[dimension][value] = {'count': 0, 'amount': 0}
+
+    total_count, total_amount = 0, 0
+    for group in groups:
+        amount = group['amount'] or 0
+        total_count += group['count']
+        total_amount += amount
+        for dimension in DIMENSIONS:
+            key = group[dimension]
+            if dimension == 'month':
+                key = key.strftime('%Y-%m') if key else None
+            bucket = breakdowns[dimension].setdefault(key, {'count': 0, 'amount': 0})
+            bucket['count'] += group['count']
+            bucket['amount'] += amount
+
+    breakdowns['month'] = dict(sorted(breakdowns['month'].items(), key=lambda item: item[0] or ''))
+    return {
+        'total_payments': total_count,
+        'total_amount': total_amount,
+        **{f'by_{dimension}': values for dimension, values in breakdowns.items()},
+    }
+
+
+def summary_payload(rollup):
+    """The /api/payments/summary/ response body for a ``payment_rollup`` result."""
+    return {
+        'total_payments': rollup['total_payments'],
+        'total_amount': rollup['total_amount'],
+        'payments_by_mode': {
+            mode: totals['amount'] for mode, totals in rollup['by_mode'].items()
+        },
+        **{key: value for key, value in rollup.items() if key.startswith('by_')},
+    }
@@ -0,0 +1,159 @@
+"""
+Full-text student search backed by an SQLite FTS5 table.
+
+``students_student_fts`` mirrors the searchable Student columns, keyed by the
+student id as rowid. It uses the trigram tokenizer so any substring of three
+or more characters can be matched through the index, which is what the
+StudentPage search box does on every keystroke. The table is created by
+migration, kept in sync by the signals in ``students.signals`` and can be
+rebuilt with ``manage.py rebuild_student_search``.
+
+``search_students`` joins the Student queryset to the FTS table and
+annotates each match with ``search_rank``, so matching and rank ordering
+happen in one SQL query and the view can page the results by
+(search_rank, id) like any other list. On databases without FTS5 (or before
+the table exists) it falls back to the equivalent ``icontains`` ORM filter,
+ranked by id.
+"""
+from asgiref.sync import sync_to_async
+
+from django.db import DatabaseError, connections
+from django.db.models import F, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'students_student_fts'
+SEARCH_FIELDS = ('first_name', 'last_name', 'parent_name', 'grade', 'board')
+
+# Trigram matching needs at least three characters; shorter tokens (a grade
+# like "7") are matched with LIKE against the FTS table instead.
+MIN_MATCH_LENGTH = 3
+
+_available = set()
+
+
+def is_available(using='default'):
+    """Whether the FTS table exists and can be read on this database. Positive results are cached."""
+    if using in _available:
+        return True
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE]
+        )
+        found = cursor.fetchone() is not None
+        if found:
+            try:
+                cursor.execute(f'SELECT rowid FROM {FTS_TABLE} LIMIT 0')
+            except DatabaseError:
+                # e.g. SQLite built without FTS5 reading a copied database
+                found = False
+    if found:
+        _available.add(using)
+    return found
+
+
+def index_student(student, using='default'):
+    if not is_available(using):
+        return
+    columns = ', '.join(SEARCH_FIELDS)
+    placeholders = ', '.join(['%s'] * (len(SEARCH_FIELDS) + 1))
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [student.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, {columns}) VALUES ({placeholders})',
+            [student.pk] + [getattr(student, field) for field in SEARCH_FIELDS],
+        )
+
+
+def remove_student(student_id, using='default'):
+    if not is_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [student_id])
+
+
+def rebuild_index(using='default'):
+    """Repopulate the FTS table from the students table in one statement. Returns the row count."""
+    if not is_available(using):
+        return None
+    columns = ', '.join(SEARCH_FIELDS)
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, {columns}) '
+            f'SELECT id, {columns} FROM students_student'
+        )
+        return cursor.rowcount
+
+
+def tokenize(query):
+    return [token for token in query.split() if token]
+
+
+def _quote(token):
+    return '"' + token.replace('"', '""') + '"'
+
+
+def _escape_like(token):
+    return token.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def match_clause(query):
+    """
+    WHERE conditions (and their params) on the FTS table for ``query``, and
+    the FTS column to order by. Each token may match any searchable column.
+    """
+    tokens = tokenize(query)
+    long_tokens = [t for t in tokens if len(t) >= MIN_MATCH_LENGTH]
+    short_tokens = [t for t in tokens if len(t) < MIN_MATCH_LENGTH]
+
+    where, params = [], []
+    if long_tokens:
+        where.append(f'{FTS_TABLE} MATCH %s')
+        params.append(' '.join(_quote(t) for t in long_tokens))
+    for token in short_tokens:
+        where.append('(' + ' OR '.join(f"{FTS_TABLE}.{field} LIKE %s ESCAPE '\\'" for field in SEARCH_FIELDS) + ')')
+        params.extend([f'%{_escape_like(token)}%'] * len(SEARCH_FIELDS))
+    order_by = 'rank' if long_tokens else 'rowid'
+    return where, params, order_by
+
+
+def fts_filter(queryset, query):
+    """``queryset`` joined to its FTS matches and annotated with ``search_rank``."""
+    where, params, order_by = match_clause(query)
+    table = queryset.model._meta.db_table
+    return queryset.extra(
+        tables=[FTS_TABLE], where=[f'{FTS_TABLE}.rowid = {table}.id', *where], params=params,
+    ).annotate(search_rank=RawSQL(f'{FTS_TABLE}.{order_by}', [], output_field=FloatField()))
+
+
+def orm_filter(queryset, query):
+    """The pre-FTS behaviour: every token must appear in one of the fields."""
+    for token in tokenize(query):
+        condition = Q()
+        for field in SEARCH_FIELDS:
+            condition |= Q(**{f'{field}__icontains': token})
+        queryset = queryset.filter(condition)
+    return queryset
+
+
+def search_students(queryset, query):
+    """
+    The students of ``queryset`` matching ``query``, annotated with
+    ``search_rank`` and ordered by it (then id), best match first.
+    """
+    if not tokenize(query):
+        return queryset.none()
+    if is_available(queryset.db):
+        queryset = fts_filter(queryset, query)
+    else:
+        queryset = orm_filter(queryset, query).annotate(search_rank=F('pk'))
+    return queryset.order_by('search_rank', 'pk')
+
+
+async def asearch_students(queryset, query):
+    """``search_students`` for async views, as a list."""
+    queryset = await sync_to_async(search_students)(queryset, query)
+    return [student async for student in queryset]
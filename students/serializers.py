@@ -1,8 +1,13 @@
 from rest_framework import serializers
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db.models import Sum
-from .models import Student, FeeStructure, Payment
+from django.utils import timezone
+from core.sparse import ChoiceDisplayField, SparseFieldsMixin
+from .fees import fee_schedule
+from .models import ArchivedYear, Student, FeeStructure, Payment, StudentLedger, StudentTermLedger
+from .years import current_academic_year
 
-class StudentSerializer(serializers.ModelSerializer):
+class StudentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     full_name = serializers.SerializerMethodField()
     total_paid = serializers.SerializerMethodField()
     fee_structure = serializers.SerializerMethodField()
@@ -14,40 +19,53 @@ class StudentSerializer(serializers.ModelSerializer):
             'parent_name', 'parent_contact_primary', 'parent_contact_secondary',
             'admission_date', 'total_paid', 'fee_structure'
         ]
+        # Columns read by the computed fields, for ?fields= querysets
+        field_sources = {
+            'full_name': ['first_name', 'last_name'],
+            'total_paid': ['ledger__total_paid'],
+            'fee_structure': ['grade', 'board'],
+        }
     
     def get_full_name(self, obj):
         return f"{obj.first_name} {obj.last_name}"
     
     def get_total_paid(self, obj):
-        total = Payment.objects.filter(student=obj).aggregate(
+        # List/retrieve/search querysets select the ledger row in the same query
+        try:
+            return obj.ledger.total_paid or 0
+        except StudentLedger.DoesNotExist:
+            pass
+        total = Payment.objects.filter(student=obj, academic_year=current_academic_year()).aggregate(
             total=Sum('amount_paid')
         )['total']
         return total or 0
     
     def get_fee_structure(self, obj):
-        try:
-            fee_structure = FeeStructure.objects.get(grade=obj.grade, board=obj.board)
-            return {
-                'id': fee_structure.id,
-                'fee_amount': fee_structure.fee_amount
-            }
-        except FeeStructure.DoesNotExist:
+        fee_map = self.context.get('fee_map')
+        if fee_map is None:
+            fee_map = fee_schedule.as_map()
+        fee_structure = fee_map.get((obj.grade, obj.board))
+        if fee_structure is None:
             return None
+        return {
+            'id': fee_structure.id,
+            'fee_amount': fee_structure.fee_amount
+        }
 
-class FeeStructureSerializer(serializers.ModelSerializer):
-    grade_display = serializers.CharField(source='get_grade_display', read_only=True)
-    board_display = serializers.CharField(source='get_board_display', read_only=True)
+class FeeStructureSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    grade_display = ChoiceDisplayField('grade')
+    board_display = ChoiceDisplayField('board')
     
     class Meta:
         model = FeeStructure
-        fields = ['id', 'grade', 'grade_display', 'board', 'board_display', 'fee_amount']
+        fields = ['id', 'academic_year', 'grade', 'grade_display', 'board', 'board_display', 'fee_amount']
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     student_name = serializers.SerializerMethodField()
     student_grade = serializers.CharField(source='student.grade', read_only=True)
-    payment_mode_display = serializers.CharField(source='get_payment_mode_display', read_only=True)
-    payment_term_display = serializers.CharField(source='get_payment_term_display', read_only=True)
-    payment_status_display = serializers.CharField(source='get_payment_status_display', read_only=True)
+    payment_mode_display = ChoiceDisplayField('payment_mode')
+    payment_term_display = ChoiceDisplayField('payment_term')
+    payment_status_display = ChoiceDisplayField('payment_status')
     
     class Meta:
         model = Payment
@@ -55,8 +73,45 @@ class PaymentSerializer(serializers.ModelSerializer):
             'id', 'student', 'student_name', 'student_grade', 'payment_mode', 
             'payment_mode_display', 'payment_term', 'payment_term_display', 
             'payment_status', 'payment_status_display', 'amount_paid', 'amount_due',
-            'transaction_date', 'due_date', 'transaction_id', 'notes'
+            'transaction_date', 'due_date', 'transaction_id', 'notes', 'academic_year'
         ]
+        # Stamped at creation, like transaction_date
+        read_only_fields = ['academic_year']
+        field_sources = {'student_name': ['student__first_name', 'student__last_name']}
     
     def get_student_name(self, obj):
         return f"{obj.student.first_name} {obj.student.last_name}"
+
+    def validate(self, attrs):
+        if self.instance is not None:
+            check_year_open(self.instance)
+        return attrs
+
+
+def check_year_open(payment):
+    """A 400 for changes to a payment of an archived year (Payment.save would refuse them too)."""
+    try:
+        ArchivedYear.check_open(payment.academic_year)
+    except DjangoValidationError as e:
+        raise serializers.ValidationError(e.messages)
+
+class OverdueDueSerializer(serializers.ModelSerializer):
+    student_name = serializers.SerializerMethodField()
+    grade = serializers.CharField(source='student.grade', read_only=True)
+    board = serializers.CharField(source='student.board', read_only=True)
+    parent_contact_primary = serializers.CharField(source='student.parent_contact_primary', read_only=True)
+    days_overdue = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = StudentTermLedger
+        fields = [
+            'id', 'student', 'student_name', 'grade', 'board', 'parent_contact_primary',
+            'payment_term', 'due_date', 'days_overdue', 'total_fee', 'total_paid', 'balance',
+            'last_payment_date'
+        ]
+    
+    def get_student_name(self, obj):
+        return f"{obj.student.first_name} {obj.student.last_name}"
+    
+    def get_days_overdue(self, obj):
+        return (timezone.localdate() - obj.due_date).days if obj.due_date else None
@@ -0,0 +1,58 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Student, FeeStructure, Payment, TableVersion
+from . import ledger, search
+from .conditional import PAYMENT_VERSION, STUDENT_VERSION
+from .fees import FEE_STRUCTURE_VERSION, fee_schedule
+
+
+@receiver(post_save, sender=Student)
+def index_student(sender, instance, using, **kwargs):
+    """Keep the full-text search table in step with student edits."""
+    search.index_student(instance, using=using)
+
+
+@receiver(post_delete, sender=Student)
+def unindex_student(sender, instance, using, **kwargs):
+    search.remove_student(instance.pk, using=using)
+
+
+@receiver(post_save, sender=Student)
+def update_student_ledger(sender, instance, created, **kwargs):
+    ledger.student_saved(instance, created)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def bump_student_version(sender, instance, **kwargs):
+    TableVersion.bump(STUDENT_VERSION)
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def bump_payment_version(sender, instance, **kwargs):
+    TableVersion.bump(PAYMENT_VERSION)
+
+
+@receiver(post_save, sender=Payment)
+def record_payment(sender, instance, **kwargs):
+    ledger.payment_saved(instance)
+
+
+@receiver(post_delete, sender=Payment)
+def reverse_payment(sender, instance, **kwargs):
+    ledger.payment_deleted(instance)
+
+
+@receiver(post_save, sender=FeeStructure)
+@receiver(post_delete, sender=FeeStructure)
+def invalidate_fee_schedule(sender, instance, **kwargs):
+    # Connected before reprice_ledgers so the ledger sees the new fee
+    TableVersion.bump(FEE_STRUCTURE_VERSION)
+    fee_schedule.invalidate()
+
+
+@receiver(post_save, sender=FeeStructure)
+@receiver(post_delete, sender=FeeStructure)
+def reprice_ledgers(sender, instance, **kwargs):
+    ledger.fee_structure_changed(instance)
@@ -0,0 +1,192 @@
+"""
+Synthetic data for development and benchmarks.
+
+``seed`` bulk-inserts students, payments and users that look like the real
+thing: Indian names and phone numbers, every grade and board, payments in
+every mode spread over the days of each academic year so far, partial and
+overdue payments among them, and users in every approval state. It adds to
+whatever is already in the database.
+
+bulk_create skips save() and the signals, so fees, amounts due and
+statuses are filled in with ``Payment.apply_fee_rules`` as the importer
+does, and the ledgers, search index and table versions are brought up to
+date once at the end. ``transaction_date`` is auto_now_add, so each day's
+payments are back-dated with one UPDATE after their insert.
+"""
+import datetime
+import random
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from . import ledger, search
+from .conditional import PAYMENT_VERSION, STUDENT_VERSION
+from .fees import fee_schedule
+from .models import FeeStructure, Payment, Student, TableVersion
+from .overdue import term_due_dates
+from .years import current_academic_year
+
+DEFAULT_CHUNK_SIZE = 5000
+# Every synthetic user can log in with this (approval permitting)
+PASSWORD = 'synthetic-pass-123'
+USERNAME_PREFIX = 'synthetic'
+
+FIRST_NAMES = [
+    'Aarav', 'Aditi', 'Aditya', 'Ananya', 'Arjun', 'Diya', 'Ishaan', 'Kavya', 'Krishna', 'Meera',
+    'Neha', 'Nikhil', 'Pooja', 'Pranav', 'Priya', 'Rahul', 'Riya', 'Rohan', 'Saanvi', 'Sai',
+    'Shreya', 'Siddharth', 'Sneha', 'Tanvi', 'Varun', 'Vihaan', 'Yash', 'Zara', 'Omkar', 'Gauri',
+]
+LAST_NAMES = [
+    'Bhosale', 'Chavan', 'Deshmukh', 'Desai', 'Gaikwad', 'Iyer', 'Jadhav', 'Joshi', 'Kamble', 'Kulkarni',
+    'Mehta', 'More', 'Nair', 'Patil', 'Pawar', 'Rao', 'Sharma', 'Shinde', 'Singh', 'Verma',
+]
+PARENT_NAMES = ['Anil', 'Sunil', 'Ramesh', 'Suresh', 'Vijay', 'Sanjay', 'Sunita', 'Anita', 'Kavita', 'Rekha']
+# Weights roughly as collected at the counter
+PAYMENT_MODE_WEIGHTS = {'Cash': 5, 'Online': 4, 'Cheque': 1}
+# Fractions of the term fee paid in one go
+INSTALMENTS = [1, 1, 1, Decimal('0.5'), Decimal('0.25')]
+APPROVAL_WEIGHTS = {'approved': 7, 'pending': 2, 'rejected': 1}
+
+
+def annual_fee(grade, year):
+    # A little dearer every year
+    return Decimal(20000 + int(grade) * 2000) * (100 + 5 * (year - current_academic_year())) / 100
+
+
+def phone(rng):
+    return f"{rng.choice('789')}{rng.randrange(10 ** 9):09d}"
+
+
+def year_days(year, today):
+    """The days of academic ``year`` up to ``today``."""
+    start = datetime.date(year, settings.ACADEMIC_YEAR_START_MONTH, 1)
+    end = min(today, datetime.date(year + 1, settings.ACADEMIC_YEAR_START_MONTH, 1) - datetime.timedelta(days=1))
+    return [start + datetime.timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def seed_fee_structures(years):
+    for year in years:
+        for grade, _ in Student.GRADE_CHOICES:
+            for board, _ in Student.BOARD_CHOICES:
+                FeeStructure.objects.get_or_create(
+                    academic_year=year, grade=grade, board=board,
+                    defaults={'fee_amount': annual_fee(grade, year)},
+                )
+
+
+def seed_students(count, rng, chunk_size):
+    grades = [grade for grade, _ in Student.GRADE_CHOICES]
+    boards = [board for board, _ in Student.BOARD_CHOICES]
+    for start in range(0, count, chunk_size):
+        with transaction.atomic():
+            Student.objects.bulk_create([
+                Student(
+                    first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                    grade=rng.choice(grades), board=rng.choice(boards),
+                    parent_name=f'{rng.choice(PARENT_NAMES)} {rng.choice(LAST_NAMES)}',
+                    parent_contact_primary=phone(rng),
+                    parent_contact_secondary=phone(rng) if rng.random() < 0.3 else None,
+                )
+                for _ in range(min(chunk_size, count - start))
+            ])
+
+
+def _day_payments(size, day, year, students, fees, rng):
+    dues = term_due_dates(day)
+    # Paying for the term in progress, or the last one once all have fallen due
+    term = next((term for term, due in dues.items() if due >= day), 'Term 4')
+    modes = rng.choices(list(PAYMENT_MODE_WEIGHTS), weights=list(PAYMENT_MODE_WEIGHTS.values()), k=size)
+    payments = []
+    for mode in modes:
+        grade, board, student_id = rng.choice(students)
+        fee = fees.get((year, grade, board))
+        term_fee = fee.fee_amount / 4 if fee else Decimal('5000')
+        payment = Payment(
+            student_id=student_id, payment_mode=mode, payment_term=term, academic_year=year,
+            amount_paid=(term_fee * rng.choice(INSTALMENTS)).quantize(Decimal('0.01')), due_date=dues[term],
+            transaction_id=f'TXN{rng.randrange(10 ** 10):010d}' if mode == 'Online' else None,
+        )
+        payment.apply_fee_rules(fee)
+        payments.append(payment)
+    return payments
+
+
+def seed_payments(count, years, rng, chunk_size):
+    students = list(Student.objects.values_list('grade', 'board', 'id'))
+    if not students or not count:
+        return
+    today = timezone.localdate()
+    fees = {(fee.academic_year, fee.grade, fee.board): fee for fee in FeeStructure.objects.all()}
+    days = [(day, year) for year in years for day in year_days(year, today)]
+    per_day, extra = divmod(count, len(days))
+
+    pending = []
+
+    def flush():
+        with transaction.atomic():
+            for day, rows in pending:
+                created = Payment.objects.bulk_create(rows)
+                Payment.objects.filter(id__range=(created[0].pk, created[-1].pk)).update(transaction_date=day)
+        pending.clear()
+
+    queued = 0
+    for index, (day, year) in enumerate(days):
+        size = per_day + (index < extra)
+        if not size:
+            continue
+        pending.append((day, _day_payments(size, day, year, students, fees, rng)))
+        queued += size
+        if queued >= chunk_size:
+            flush()
+            queued = 0
+    if pending:
+        flush()
+
+
+def seed_users(count, rng, chunk_size):
+    User = get_user_model()
+    # Hashing is the slow part of creating a user; every one shares the hash
+    password = make_password(PASSWORD)
+    offset = User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+    statuses = list(APPROVAL_WEIGHTS)
+    for start in range(0, count, chunk_size):
+        rows = []
+        for n in range(offset + start, offset + min(start + chunk_size, count)):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            rows.append(User(
+                username=f'{USERNAME_PREFIX}{n}', email=f'{USERNAME_PREFIX}{n}@example.com', password=password,
+                first_name=first, last_name=last, phone_number=phone(rng),
+                is_approved=rng.choices(statuses, weights=list(APPROVAL_WEIGHTS.values()))[0],
+            ))
+        User.objects.bulk_create(rows)
+
+
+def seed(students=0, payments=0, users=0, years=1, seed=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Add ``students``, ``payments`` (spread over the last ``years`` academic
+    years, this one included) and ``users``. ``seed`` makes the data
+    reproducible. Returns the counts added.
+    """
+    rng = random.Random(seed)
+    current = current_academic_year()
+    academic_years = list(range(current - years + 1, current + 1))
+
+    seed_fee_structures(academic_years)
+    fee_schedule.invalidate()
+    seed_students(students, rng, chunk_size)
+    seed_payments(payments, academic_years, rng, chunk_size)
+    seed_users(users, rng, chunk_size)
+
+    # What the signals would have done row by row
+    student_ids = list(Student.objects.values_list('id', flat=True))
+    for start in range(0, len(student_ids), ledger.RECONCILE_CHUNK_SIZE):
+        with transaction.atomic():
+            ledger.reconcile(student_ids[start:start + ledger.RECONCILE_CHUNK_SIZE])
+    search.rebuild_index()
+    TableVersion.bump(STUDENT_VERSION)
+    TableVersion.bump(PAYMENT_VERSION)
+    return {'students': students, 'payments': payments, 'users': users}
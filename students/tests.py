@@ -1,3 +1,1832 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import importlib
+import io
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zipfile
+from collections import defaultdict
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import Q, Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, resolve
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from benchmarks import endpoints
+from benchmarks.common import bench_client
+from core import db_router, logs, metrics, writes
+from core.db_router import ReadReplicaRouter
+from core.query_plans import explain, plan_problems
+from . import archive, dashboard, exports, importers, jobs, ledger, overdue, reports, search, synthetic
+from .async_views import build_urlpatterns
+from .urls import router as students_router
+from .fees import FEE_STRUCTURE_VERSION, fee_schedule
+from .models import (
+    ArchivedYear, FeeStructure, Payment, PaymentArchive, Student, StudentLedger, StudentTermLedger, TableVersion,
+)
+from .serializers import StudentSerializer
+from .years import academic_year_start, current_academic_year
+
+User = get_user_model()
+
+
+def make_student(**kwargs):
+    data = {
+        'first_name': 'Priya',
+        'last_name': 'Sharma',
+        'grade': '7',
+        'board': 'CBSE',
+        'parent_name': 'Anil Sharma',
+        'parent_contact_primary': '9800000000',
+    }
+    data.update(kwargs)
+    return Student.objects.create(**data)
+
+
+class APITestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='staff', email='staff@example.com', password='pass12345',
+            is_approved='approved',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class StudentListQueryCountTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        FeeStructure.objects.create(grade='7', board='CBSE', fee_amount=Decimal('40000'))
+        FeeStructure.objects.create(grade='8', board='SSC', fee_amount=Decimal('30000'))
+
+    def add_students(self, count):
+        for i in range(count):
+            student = make_student(
+                first_name=f'Student{i}',
+                grade='7' if i % 2 else '8',
+                board='CBSE' if i % 2 else 'SSC',
+            )
+            Payment.objects.create(
+                student=student, payment_mode='Cash', payment_term='Term 1',
+                amount_paid=Decimal('1000'),
+            )
+
+    def test_list_query_count_is_constant(self):
+        self.add_students(3)
+        with self.assertNumQueries(3):
+            small = self.client.get('/api/students/')
+        self.add_students(20)
+        with self.assertNumQueries(3):
+            large = self.client.get('/api/students/')
+        self.assertEqual(len(small.data), 3)
+        self.assertEqual(len(large.data), 23)
+
+    def test_search_and_retrieve_query_count(self):
+        self.add_students(10)
+        # validators, students joined to their FTS matches, fee map
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/students/search/', {'q': 'Student'})
+        self.assertEqual(len(response.data), 10)
+        student = Student.objects.first()
+        with self.assertNumQueries(3):
+            self.client.get(f'/api/students/{student.id}/')
+
+    def test_output_matches_per_row_serializer(self):
+        self.add_students(4)
+        make_student(first_name='Unpaid', grade='3', board='SSC')
+        response = self.client.get('/api/students/')
+        expected = StudentSerializer(Student.objects.all(), many=True).data
+        self.assertEqual(
+            [(row['id'], row['total_paid'], row['fee_structure']) for row in response.data],
+            [(row['id'], row['total_paid'], row['fee_structure']) for row in expected],
+        )
+
+
+class KeysetPaginationTests(APITestCase):
+    def walk(self, url, params):
+        rows, pages = [], 0
+        response = self.client.get(url, params)
+        while True:
+            pages += 1
+            rows.extend(response.data['results'])
+            if not response.data['next']:
+                return rows, pages, response
+            response = self.client.get(response.data['next'])
+
+    def test_unpaginated_by_default(self):
+        make_student()
+        response = self.client.get('/api/students/')
+        self.assertIsInstance(response.data, list)
+
+    def test_students_pages_forward_and_back(self):
+        students = [make_student(first_name=f'S{i}') for i in range(7)]
+        rows, pages, last = self.walk('/api/students/', {'limit': 3})
+        self.assertEqual([row['id'] for row in rows], [s.id for s in students])
+        self.assertEqual(pages, 3)
+
+        previous = self.client.get(last.data['previous'])
+        self.assertEqual([row['id'] for row in previous.data['results']], [s.id for s in students[3:6]])
+        first = self.client.get(previous.data['previous'])
+        self.assertEqual([row['id'] for row in first.data['results']], [s.id for s in students[:3]])
+        self.assertIsNone(first.data['previous'])
+
+    def test_payments_keyset_on_date_then_id(self):
+        student = make_student()
+        payments = [
+            Payment.objects.create(
+                student=student, payment_mode='Cash', payment_term='Term 1', amount_paid=Decimal('10'),
+            )
+            for _ in range(5)
+        ]
+        Payment.objects.filter(id__in=[payments[1].id, payments[3].id]).update(transaction_date='2030-01-01')
+        rows, _, _ = self.walk('/api/payments/', {'limit': 2})
+        expected = [payments[1].id, payments[3].id, payments[0].id, payments[2].id, payments[4].id]
+        self.assertEqual([row['id'] for row in rows], expected)
+
+    def test_page_does_not_count_or_offset(self):
+        for i in range(5):
+            make_student(first_name=f'S{i}')
+        with self.assertNumQueries(3) as ctx:
+            self.client.get('/api/students/', {'limit': 2})
+        sql = ' '.join(query['sql'] for query in ctx.captured_queries)
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/payments/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class StudentSearchTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.priya = make_student(first_name='Priya', last_name='Sharma', grade='7', board='CBSE')
+        self.priyanka = make_student(first_name='Priyanka', last_name='Rao', grade='7', board='SSC',
+                                     parent_name='Sunil Rao')
+        self.rahul = make_student(first_name='Rahul', last_name='Verma', grade='9', board='CBSE',
+                                  parent_name='Priya Verma')
+
+    def search(self, query):
+        response = self.client.get('/api/students/search/', {'q': query})
+        return [row['id'] for row in response.data]
+
+    def test_index_is_used(self):
+        self.assertTrue(search.is_available())
+
+    def test_multi_token_query(self):
+        self.assertEqual(self.search('priya 7 cbse'), [self.priya.id])
+        self.assertEqual(sorted(self.search('priya cbse')), sorted([self.priya.id, self.rahul.id]))
+
+    def test_substring_match(self):
+        self.assertEqual(sorted(self.search('riy')), sorted([self.priya.id, self.priyanka.id, self.rahul.id]))
+        self.assertEqual(self.search('erm'), [self.rahul.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.priya.first_name = 'Meera'
+        self.priya.save()
+        self.assertEqual(self.search('meera'), [self.priya.id])
+        self.assertNotIn(self.priya.id, self.search('priya'))
+        self.rahul.delete()
+        self.assertEqual(self.search('verma'), [])
+
+    def test_orm_fallback_matches_index(self):
+        for query in ['priya 7 cbse', 'riy', 'sunil', '9', 'nobody']:
+            indexed = sorted(self.search(query))
+            with mock.patch.object(search, 'is_available', return_value=False):
+                fallback = sorted(self.search(query))
+            self.assertEqual(indexed, fallback, query)
+
+    def test_broad_query_pages_through_every_match(self):
+        Student.objects.bulk_create([
+            Student(first_name=f'Student{n}', last_name='Cbse', grade='5', board='CBSE', parent_name='Parent',
+                    parent_contact_primary='9876543210')
+            for n in range(60)
+        ])
+        search.rebuild_index()
+        with CaptureQueriesContext(connection) as queries:
+            everything = self.search('cbse')
+        self.assertEqual(len(everything), 62)
+        matched = [q['sql'] for q in queries if search.FTS_TABLE in q['sql']]
+        self.assertEqual(len(matched), 1)
+        self.assertNotIn(' IN (', matched[0])
+        # Ranked in SQL: students matching in name and board beat board-only matches
+        self.assertEqual(set(everything[-2:]), {self.priya.id, self.rahul.id})
+
+        page = self.client.get('/api/students/search/', {'q': 'cbse', 'limit': 50}).data
+        self.assertEqual(len(page['results']), 50)
+        rest = self.client.get(page['next']).data
+        self.assertIsNone(rest['next'])
+        self.assertEqual([row['id'] for row in page['results'] + rest['results']], everything)
+
+        with mock.patch.object(search, 'is_available', return_value=False):
+            page = self.client.get('/api/students/search/', {'q': 'cbse', 'limit': 50}).data
+            rest = self.client.get(page['next']).data
+        self.assertEqual(len(page['results']) + len(rest['results']), 62)
+
+    def test_sparse_fields_with_pagination(self):
+        ranked = self.search('riy')
+        page = self.client.get('/api/students/search/', {'q': 'riy', 'limit': 2, 'fields': 'id'}).data
+        rest = self.client.get(page['next']).data['results']
+        self.assertEqual(page['results'] + rest, [{'id': student_id} for student_id in ranked])
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.FTS_TABLE}')
+        self.assertEqual(self.search('priya'), [])
+        out = StringIO()
+        call_command('rebuild_student_search', stdout=out)
+        self.assertIn('Indexed 3 students', out.getvalue())
+        self.assertEqual(len(self.search('priya')), 3)
+
+
+class StudentLedgerTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.fee = FeeStructure.objects.create(grade='7', board='CBSE', fee_amount=Decimal('40000'))
+        self.student = make_student()
+
+    def pay(self, amount, term='Term 1', student=None):
+        return Payment.objects.create(
+            student=student or self.student, payment_mode='Cash', payment_term=term,
+            amount_paid=Decimal(amount),
+        )
+
+    def assertLedger(self, total_paid, balance, student=None):
+        row = StudentLedger.objects.get(student=student or self.student)
+        self.assertEqual(row.total_paid, Decimal(total_paid))
+        self.assertEqual(row.balance, Decimal(balance))
+        self.assertEqual(ledger.reconcile([row.student_id], fix=False), 0)
+
+    def test_new_student_gets_ledger(self):
+        self.assertLedger('0', '40000')
+
+    def test_payment_create_update_delete(self):
+        payment = self.pay('10000')
+        self.pay('2500', term='Term 2')
+        self.assertLedger('12500', '27500')
+        term = StudentTermLedger.objects.get(student=self.student, payment_term='Term 1')
+        self.assertEqual((term.total_fee, term.balance), (Decimal('10000'), Decimal('0')))
+
+        payment = Payment.objects.get(pk=payment.pk)
+        payment.amount_paid = Decimal('4000')
+        payment.save()
+        self.assertLedger('6500', '33500')
+
+        payment.delete()
+        self.assertLedger('2500', '37500')
+        Payment.objects.all().delete()
+        self.assertLedger('0', '40000')
+        self.assertIsNone(StudentLedger.objects.get(student=self.student).last_payment_date)
+
+    def test_payment_moved_to_other_student(self):
+        other = make_student(first_name='Other')
+        payment = self.pay('5000')
+        payment = Payment.objects.get(pk=payment.pk)
+        payment.student = other
+        payment.save()
+        self.assertLedger('0', '40000')
+        self.assertLedger('5000', '35000', student=other)
+
+    def test_fee_and_grade_changes_reprice(self):
+        self.pay('10000')
+        self.fee.fee_amount = Decimal('48000')
+        self.fee.save()
+        self.assertLedger('10000', '38000')
+        term = StudentTermLedger.objects.get(student=self.student, payment_term='Term 1')
+        self.assertEqual(term.total_fee, Decimal('12000'))
+
+        self.student.grade = '8'
+        self.student.save()
+        self.assertLedger('10000', '-10000')
+        FeeStructure.objects.create(grade='8', board='CBSE', fee_amount=Decimal('50000'))
+        self.assertLedger('10000', '40000')
+
+    def test_reconcile_command_repairs_drift(self):
+        self.pay('10000')
+        StudentLedger.objects.update(total_paid=Decimal('1'))
+        StudentTermLedger.objects.all().delete()
+        out = StringIO()
+        call_command('reconcile_ledger', '--dry-run', stdout=out)
+        self.assertIn('Found 5 out-of-date', out.getvalue())
+        call_command('reconcile_ledger', '--chunk-size', '1', stdout=out)
+        self.assertLedger('10000', '30000')
+
+    def test_summary_endpoints_read_ledger(self):
+        payment = self.pay('10000')
+        with self.assertNumQueries(3):
+            # validators, student + ledger join, fee map
+            response = self.client.get(f'/api/students/{self.student.id}/payment_summary/')
+        self.assertEqual(response.data['balance'], Decimal('30000'))
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/payments/{payment.id}/student_summary/')
+        self.assertEqual(response.data['balance_due'], Decimal('30000'))
+
+        response = self.client.post('/api/payments/', {
+            'student': self.student.id, 'payment_mode': 'Online',
+            'payment_term': 'Term 2', 'amount_paid': '5000',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['payment_summary']['total_paid'], Decimal('15000'))
+        self.assertEqual(response.data['payment_summary']['balance_due'], Decimal('25000'))
+
+
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        FeeStructure.objects.create(grade='7', board='CBSE', fee_amount=Decimal('40000'))
+        for i in range(30):
+            student = make_student(first_name=f'Student{i}')
+            Payment.objects.create(
+                student=student, payment_mode='Online', payment_term='Term 1', amount_paid=Decimal('1000'),
+            )
+
+    def get(self, path, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, params)
+            if response.streaming:
+                response.data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(response.status_code, 200, response.data)
+        return response, [query['sql'] for query in queries]
+
+    def test_student_fields_skip_ledger_and_fees(self):
+        full, full_queries = self.get('/api/students/', {})
+        response, queries = self.get('/api/students/', {'fields': 'id,first_name,grade,board'})
+        # Validators and the bare student columns; no ledger join, no fee schedule
+        self.assertEqual((len(full_queries), len(queries)), (3, 2))
+        self.assertEqual(set(response.data[0]), {'id', 'first_name', 'grade', 'board'})
+        self.assertNotIn('JOIN', queries[1])
+        self.assertNotIn('parent_name', queries[1])
+        self.assertEqual(
+            [row['first_name'] for row in response.data], [row['first_name'] for row in full.data],
+        )
+
+        response, queries = self.get('/api/students/', {'omit': 'fee_structure', 'limit': 10})
+        self.assertEqual(len(queries), 2)
+        self.assertIn('"students_studentledger"."total_paid"', queries[1])
+        self.assertEqual(response.data['results'][0]['total_paid'], Decimal('1000'))
+        self.assertNotIn('fee_structure', response.data['results'][0])
+        # The next page is built from the trimmed rows without extra queries
+        self.assertIn('omit=fee_structure', response.data['next'])
+
+        response, queries = self.get('/api/students/search/', {'q': 'Student1', 'fields': 'id,full_name'})
+        self.assertEqual(response.data[0], {'id': Student.objects.get(first_name='Student1').id,
+                                            'full_name': 'Student1 Sharma'})
+
+    def test_payment_fields_skip_student_join(self):
+        response, queries = self.get('/api/payments/', {'fields': 'id,amount_paid,payment_mode_display'})
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('JOIN', queries[1])
+        self.assertEqual(response.data[0]['payment_mode_display'], 'Online')
+        self.assertEqual(set(response.data[0]), {'id', 'amount_paid', 'payment_mode_display'})
+
+        response, queries = self.get('/api/payments/', {'fields': 'id,student_name', 'stream': '1'})
+        self.assertEqual(len(queries), 2)
+        self.assertIn('JOIN "students_student"', queries[1])
+        self.assertEqual(response.data[0]['student_name'], 'Student0 Sharma')
+
+    def test_display_fields_match_model(self):
+        payment = Payment.objects.select_related('student').first()
+        data = self.client.get(f'/api/payments/{payment.id}/', {'fields': 'payment_term_display,payment_status_display'}).data
+        self.assertEqual(data, {
+            'payment_term_display': payment.get_payment_term_display(),
+            'payment_status_display': payment.get_payment_status_display(),
+        })
+        data = self.client.get('/api/fee-structures/', {'omit': 'id,fee_amount,academic_year'}).data
+        self.assertEqual(data, [{'grade': '7', 'grade_display': 'Grade 7', 'board': 'CBSE', 'board_display': 'CBSE'}])
+
+    def test_unknown_fields_rejected(self):
+        with self.assertLogs('django.request', 'WARNING'):
+            response = self.client.get('/api/payments/', {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.data['detail'])
+        # Writes ignore the parameters
+        response = self.client.post('/api/payments/?fields=id', {
+            'student': Student.objects.first().id, 'payment_mode': 'Cash',
+            'payment_term': 'Term 2', 'amount_paid': '10',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('payment_summary', response.data)
+
+    def test_sparse_serialization_is_cheaper(self):
+        for student in Student.objects.all():
+            Payment.objects.bulk_create([
+                Payment(student=student, payment_mode='Cash', payment_term='Term 2', amount_paid=Decimal('10'))
+                for _ in range(9)
+            ])
+
+        def timed(params):
+            started = time.perf_counter()
+            self.client.get('/api/payments/', params)
+            return time.perf_counter() - started
+
+        # Alternate the two so background load in the test run hits both alike
+        runs = [(timed({}), timed({'fields': 'id,amount_paid'})) for _ in range(5)]
+        full = min(run[0] for run in runs)
+        sparse = min(run[1] for run in runs)
+        # 300 rows; the full set serializes 17 fields per row and joins the student
+        self.assertLess(sparse, full / 2)
+
+
+class FeeScheduleCacheTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.fee = FeeStructure.objects.create(grade='7', board='CBSE', fee_amount=Decimal('40000'))
+
+    def test_lookups_served_from_memory_within_a_request(self):
+        fee_schedule.new_request()
+        fee_schedule.as_map()
+        hits = fee_schedule.hits
+        with self.assertNumQueries(0):
+            self.assertEqual(fee_schedule.annual_fee('7', 'CBSE'), Decimal('40000'))
+            self.assertIsNone(fee_schedule.get('1', 'SSC'))
+        self.assertEqual(fee_schedule.hits, hits + 2)
+
+    def test_local_writes_invalidate(self):
+        self.fee.fee_amount = Decimal('44000')
+        self.fee.save()
+        self.assertEqual(fee_schedule.annual_fee('7', 'CBSE'), Decimal('44000'))
+        self.fee.delete()
+        self.assertIsNone(fee_schedule.get('7', 'CBSE'))
+
+    def test_other_worker_change_seen_on_next_request(self):
+        fee_schedule.new_request()
+        fee_schedule.as_map()
+        # Another process: writes the row and bumps the version, no local invalidation
+        FeeStructure.objects.filter(pk=self.fee.pk).update(fee_amount=Decimal('50000'))
+        TableVersion.bump(FEE_STRUCTURE_VERSION)
+        self.assertEqual(fee_schedule.annual_fee('7', 'CBSE'), Decimal('40000'))
+        misses = fee_schedule.misses
+        fee_schedule.new_request()
+        with self.assertNumQueries(2):
+            self.assertEqual(fee_schedule.annual_fee('7', 'CBSE'), Decimal('50000'))
+        self.assertEqual(fee_schedule.misses, misses + 1)
+
+    def test_payment_save_uses_cache(self):
+        student = make_student()
+        fee_schedule.new_request()
+        fee_schedule.as_map()
+        payment = Payment(student=student, payment_mode='Cash', payment_term='Term 1', amount_paid=Decimal('100'))
+        with self.assertNumQueries(6):
+            # savepoint, insert, two ledger updates, version bump, release
+            payment.save()
+        self.assertEqual(payment.amount_due, Decimal('10000'))
+
+    def test_stats_endpoint_is_admin_only(self):
+        response = self.client.get('/api/fee-structures/cache_stats/')
+        self.assertEqual(response.status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get('/api/fee-structures/cache_stats/')
+        self.assertEqual(set(response.data), {'hits', 'misses', 'hit_ratio', 'version_checks', 'version', 'size'})
+
+
+class PaymentSummaryTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        FeeStructure.objects.create(grade='7', board='CBSE', fee_amount=Decimal('40000'))
+        seven = make_student()
+        nine = make_student(first_name='Rahul', grade='9', board='SSC')
+        for student, mode, term, amount, day in [
+            (seven, 'Cash', 'Term 1', '10000', '2025-06-10'),
+            (seven, 'Online', 'Term 2', '4000', '2025-09-02'),
+            (nine, 'Cash', 'Term 1', '3000', '2025-06-20'),
+            (nine, 'Cheque', 'Term 1', '500', '2025-07-01'),
+        ]:
+            payment = Payment.objects.create(
+                student=student, payment_mode=mode, payment_term=term, amount_paid=Decimal(amount),
+            )
+            Payment.objects.filter(pk=payment.pk).update(transaction_date=day)
+
+    def test_single_grouped_query(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/payments/summary/')
+        data = response.data
+        self.assertEqual(data['total_payments'], 4)
+        self.assertEqual(data['total_amount'], Decimal('17500'))
+        self.assertEqual(data['payments_by_mode'], {
+            'Cash': Decimal('13000'), 'Cheque': Decimal('500'), 'Online': Decimal('4000'),
+        })
+        self.assertEqual(data['by_term']['Term 1'], {'count': 3, 'amount': Decimal('13500')})
+        self.assertEqual(data['by_term']['Term 4'], {'count': 0, 'amount': 0})
+        self.assertEqual(data['by_grade']['9']['count'], 2)
+        self.assertEqual(data['by_board']['CBSE']['amount'], Decimal('14000'))
+        self.assertEqual(data['by_status']['Partial']['count'], 1)
+        self.assertEqual(list(data['by_month']), ['2025-06', '2025-07', '2025-09'])
+
+    def test_filters(self):
+        response = self.client.get('/api/payments/summary/', {
+            'date_from': '2025-06-15', 'date_to': '2025-08-31', 'board': 'SSC',
+        })
+        self.assertEqual(response.data['total_payments'], 2)
+        self.assertEqual(response.data['payments_by_mode']['Cash'], Decimal('3000'))
+        response = self.client.get('/api/payments/summary/', {'grade': '7'})
+        self.assertEqual(response.data['total_amount'], Decimal('14000'))
+
+    def test_bad_date(self):
+        response = self.client.get('/api/payments/summary/', {'date_from': 'June'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PaymentImportTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        FeeStructure.objects.create(grade='7', board='CBSE', fee_amount=Decimal('40000'))
+        self.student = make_student()
+        self.other = make_student(first_name='Rahul', grade='9', board='SSC')
+
+    def csv(self, rows):
+        lines = ['student,payment_mode,payment_term,amount_paid,amount_due,due_date,transaction_id,notes']
+        lines.extend(rows)
+        return '\n'.join(lines) + '\n'
+
+    def test_rows_match_payment_save(self):
+        data = self.csv([
+            f'{self.student.id},Cash,Term 1,10000,,,,',
+            f'{self.student.id},Online,Term 2,2500,,2099-09-30,TXN-1,first half',
+            f'{self.student.id},Cheque,Term 3,0,,,,',
+            f'{self.other.id},Cash,Term 1,100,,,,',
+        ])
+        report = importers.import_payments(StringIO(data), chunk_size=3)
+        self.assertEqual(report.as_dict()['created'], 4)
+        imported = list(Payment.objects.order_by('id').values_list('amount_due', 'payment_status'))
+        self.assertEqual(imported, [
+            (Decimal('10000'), 'Paid'), (Decimal('10000'), 'Partial'),
+            (Decimal('10000'), 'Pending'), (Decimal('0'), 'Paid'),
+        ])
+        ledger_row = StudentLedger.objects.get(student=self.student)
+        self.assertEqual(ledger_row.total_paid, Decimal('12500'))
+        self.assertEqual(ledger.reconcile([self.student.id, self.other.id], fix=False), 0)
+
+    def test_row_errors_are_reported(self):
+        data = self.csv([
+            f'{self.student.id},Cash,Term 1,100,,,,',
+            '999,Cash,Term 1,100,,,,',
+            f'{self.student.id},Barter,Term 9,abc,,,,',
+            f'{self.student.id},Cash,Term 1,100,,31-12-2025,,',
+        ])
+        report = importers.import_payments(StringIO(data)).as_dict()
+        self.assertEqual((report['rows'], report['created'], report['failed']), (4, 1, 3))
+        self.assertEqual([error['row'] for error in report['errors']], [3, 4, 5])
+        self.assertEqual(set(report['errors'][1]['errors']), {'payment_mode', 'payment_term', 'amount_paid'})
+        self.assertIn('due_date', report['errors'][2]['errors'])
+
+    def test_missing_columns(self):
+        report = importers.import_payments(StringIO('student,amount_paid\n1,100\n')).as_dict()
+        self.assertEqual(report['created'], 0)
+        self.assertIn('header', report['errors'][0]['errors'])
+
+    def test_unreadable_file_stops_cleanly(self):
+        rows = [f'{self.student.id},Cash,Term 1,10,,,,'] * 400
+        # A cp1252 sheet from Excel, past the first block the upload is decoded in
+        data = self.csv(rows).encode() + f'{self.student.id},Cash,Term 1,10,,,,Ren\xe9e\n'.encode('cp1252')
+        upload = SimpleUploadedFile('payments.csv', data, content_type='text/csv')
+        with self.assertLogs('django.request', 'WARNING'):
+            response = self.client.post('/api/payments/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        report = response.data
+        self.assertGreater(report['stopped_at'], 2)
+        self.assertEqual(report['created'], report['stopped_at'] - 2)
+        self.assertIn('not UTF-8', report['errors'][-1]['errors']['file'][0])
+        self.assertEqual(Payment.objects.count(), report['created'])
+        self.assertEqual(ledger.reconcile([self.student.id], fix=False), 0)
+
+        upload = SimpleUploadedFile('payments.csv', '\ufeffstudent,amount\xe9\n'.encode('cp1252', 'ignore'))
+        with self.assertLogs('django.request', 'WARNING'):
+            response = self.client.post('/api/payments/import/', {'file': upload}, format='multipart')
+        self.assertEqual((response.status_code, response.data['stopped_at']), (400, 1))
+
+        # An unclosed quote runs the rest of the file into one oversized field
+        unclosed = f'{self.student.id},Cash,Term 1,10,,,,"' + 'x' * csv.field_size_limit()
+        data = self.csv([f'{self.student.id},Cash,Term 1,10,,,,', unclosed])
+        report = importers.import_payments(StringIO(data)).as_dict()
+        self.assertEqual((report['created'], report['stopped_at']), (1, 3))
+        self.assertIn('Malformed CSV', report['errors'][0]['errors']['file'][0])
+
+    def test_queries_scale_with_chunks_not_rows(self):
+        rows = [f'{self.student.id},Cash,Term 1,10,,,,'] * 40
+        # Student map once, then a fixed set per chunk: insert + ledger refresh + version bumps
+        with self.assertNumQueries(1 + 2 * 11) as ctx:
+            importers.import_payments(StringIO(self.csv(rows)), chunk_size=20)
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "students_payment"')]
+        self.assertEqual(len(inserts), 2)
+
+    def test_upload_endpoint_and_command(self):
+        data = self.csv([f'{self.student.id},Cash,Term 1,500,,,,', 'x,Cash,Term 1,1,,,,'])
+        upload = SimpleUploadedFile('payments.csv', data.encode('utf-8'), content_type='text/csv')
+        with self.settings(FILE_UPLOAD_MAX_MEMORY_SIZE=10):
+            response = self.client.post('/api/payments/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['failed']), (1, 1))
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write(data)
+        out, err = StringIO(), StringIO()
+        call_command('import_payments', f.name, '--dry-run', stdout=out, stderr=err)
+        os.unlink(f.name)
+        self.assertIn('Validated 1 of 2 rows; 1 rejected', out.getvalue())
+        self.assertEqual(Payment.objects.count(), 1)
+
+
+class StreamingListTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        FeeStructure.objects.create(grade='7', board='CBSE', fee_amount=Decimal('40000'))
+        for i in range(7):
+            student = make_student(first_name=f'S{i}')
+            Payment.objects.create(
+                student=student, payment_mode='Cash', payment_term='Term 1', amount_paid=Decimal('100'),
+            )
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_json_array_matches_list(self):
+        expected = self.client.get('/api/students/').json()
+        with mock.patch('students.views.StudentViewSet.stream_chunk_size', 3):
+            response = self.client.get('/api/students/', {'stream': '1'})
+            body = self.read(response)
+        self.assertEqual(response['Content-Type'], 'application/json; charset=utf-8')
+        self.assertEqual(json.loads(body), expected)
+
+    def test_ndjson(self):
+        expected = self.client.get('/api/payments/').json()
+        response = self.client.get('/api/payments/', {'format': 'ndjson'})
+        lines = self.read(response).splitlines()
+        self.assertEqual([json.loads(line) for line in lines], expected)
+
+    def test_empty_stream(self):
+        Student.objects.all().delete()
+        self.assertEqual(self.read(self.client.get('/api/students/', {'stream': '1'})), '[]')
+
+    def test_batches_keep_list_joins(self):
+        with mock.patch('students.views.PaymentViewSet.stream_chunk_size', 2):
+            response = self.client.get('/api/payments/', {'stream': '1'})
+            with self.assertNumQueries(1):
+                # one SELECT ... JOIN student streamed through iterator()
+                rows = json.loads(self.read(response))
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[0]['student_name'], 'S0 Sharma')
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        FeeStructure.objects.create(grade='7', board='CBSE', fee_amount=Decimal('40000'))
+        self.students = [make_student(first_name=f'S{i}') for i in range(3)]
+        make_student(first_name='Other', grade='8')
+        Payment.objects.create(
+            student=self.students[0], payment_mode='Cash', payment_term='Term 1', amount_paid=Decimal('40000'),
+        )
+        Payment.objects.create(
+            student=self.students[1], payment_mode='UPI', payment_term='Term 2', amount_paid=Decimal('2500'),
+        )
+
+    def read_csv(self, response):
+        self.assertTrue(response.streaming)
+        body = b''.join(response.streaming_content).decode('utf-8-sig')
+        return list(csv.reader(StringIO(body)))
+
+    def test_student_csv(self):
+        response = self.client.get('/api/students/export/', {'grade': '7'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="students-', response['Content-Disposition'])
+        with self.assertNumQueries(1):
+            # one SELECT ... LEFT JOIN ledger; the fee schedule is already cached
+            rows = self.read_csv(response)
+        self.assertEqual(len(rows), 4)
+        header = rows[0]
+        by_name = {row[1]: dict(zip(header, row)) for row in rows[1:]}
+        self.assertEqual(by_name['S0']['Fee status'], 'Paid')
+        self.assertEqual(by_name['S0']['Balance'], '0.00')
+        self.assertEqual(by_name['S1']['Fee status'], 'Partial')
+        self.assertEqual(by_name['S1']['Balance'], '37500.00')
+        self.assertEqual(by_name['S2']['Total paid'], '0.00')
+        self.assertEqual(by_name['S2']['Annual fee'], '40000.00')
+
+    def test_payment_csv_and_bad_filter(self):
+        rows = self.read_csv(self.client.get('/api/payments/export/', {'board': 'CBSE'}))
+        header = rows[0]
+        self.assertEqual(len(rows), 3)
+        upi = next(dict(zip(header, row)) for row in rows[1:] if row[header.index('Mode')] == 'UPI')
+        self.assertEqual(upi['First name'], 'S1')
+        self.assertEqual(upi['Student balance'], '37500.00')
+
+        response = self.client.get('/api/payments/export/', {'date_from': 'soon'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_student_without_ledger_row(self):
+        # Payments imported for a bulk-inserted student before any reconcile
+        StudentLedger.objects.filter(student=self.students[1]).delete()
+        rows = self.read_csv(self.client.get('/api/students/export/', {'grade': '7'}))
+        row = dict(zip(rows[0], next(row for row in rows[1:] if row[1] == 'S1')))
+        self.assertEqual((row['Total paid'], row['Balance'], row['Fee status']), ('2500.00', '37500.00', 'Partial'))
+        self.assertEqual(StudentLedger.objects.get(student=self.students[1]).total_paid, Decimal('2500'))
+
+    def test_other_years_leave_ledger_columns_blank(self):
+        Payment.objects.create(
+            student=self.students[0], payment_mode='Cash', payment_term='Term 4', amount_paid=Decimal('100'),
+            academic_year=current_academic_year() - 1,
+        )
+        rows = self.read_csv(self.client.get('/api/payments/export/', {'year': current_academic_year() - 1}))
+        self.assertEqual(len(rows), 2)
+        row = dict(zip(rows[0], rows[1]))
+        self.assertEqual(row['Amount paid'], '100.00')
+        self.assertEqual((row['Annual fee'], row['Student total paid'], row['Student balance']), ('', '', ''))
+
+    def test_csv_text_is_not_run_as_formulas(self):
+        hostile = make_student(first_name='=HYPERLINK("http://x","y")', parent_name='@SUM(A1)')
+        Payment.objects.create(
+            student=hostile, payment_mode='Online', payment_term='Term 1', amount_paid=Decimal('-1'),
+            transaction_id='+91-cmd|calc',
+        )
+        rows = self.read_csv(self.client.get('/api/students/export/'))
+        header = rows[0]
+        row = dict(zip(header, next(row for row in rows[1:] if 'HYPERLINK' in row[1])))
+        self.assertEqual(row['First name'], '\'=HYPERLINK("http://x","y")')
+        self.assertEqual(row['Parent name'], "'@SUM(A1)")
+
+        rows = self.read_csv(self.client.get('/api/payments/export/'))
+        header = rows[0]
+        row = dict(zip(header, next(row for row in rows[1:] if row[header.index('Mode')] == 'Online')))
+        self.assertEqual(row['Transaction ID'], "'+91-cmd|calc")
+        # Numbers keep their sign
+        self.assertEqual(row['Amount paid'], '-1.00')
+
+    def test_xlsx(self):
+        response = self.client.get('/api/students/export/', {'format': 'xlsx'})
+        self.assertEqual(
+            response['Content-Type'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertEqual(sheet.count('<row '), 5)
+        self.assertIn('<t xml:space="preserve">Fee status</t>', sheet)
+        self.assertIn('<v>40000.00</v>', sheet)
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'payments.xlsx')
+            out = StringIO()
+            call_command('export_data', 'payments', '--format', 'xlsx', '--output', path, stdout=out)
+            self.assertIn('Wrote', out.getvalue())
+            with zipfile.ZipFile(path) as archive:
+                self.assertEqual(archive.read('xl/worksheets/sheet1.xml').decode().count('<row '), 3)
+
+
+class AsyncURLConf:
+    """The API as core.asgi serves it, with the async read views routed."""
+    urlpatterns = [path('api/', include(build_urlpatterns(students_router) + [path('', include(students_router.urls))]))]
+
+
+class AsyncReadViewTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        FeeStructure.objects.create(grade='7', board='CBSE', fee_amount=Decimal('40000'))
+        self.students = [make_student(first_name=name) for name in ('Priya', 'Rahul', 'Meera')]
+        Payment.objects.create(
+            student=self.students[0], payment_mode='Cash', payment_term='Term 1', amount_paid=Decimal('2500'),
+        )
+        Payment.objects.create(
+            student=self.students[1], payment_mode='UPI', payment_term='Term 2', amount_paid=Decimal('1000'),
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.headers = {'Authorization': f'Token {self.token.key}'}
+
+    def urls(self, student):
+        return [
+            '/api/students/', '/api/students/search/?q=priya', f'/api/students/{student.pk}/',
+            f'/api/students/{student.pk}/payment_summary/', '/api/payments/',
+            '/api/payments/summary/?board=CBSE',
+        ]
+
+    def test_async_views_match_sync_views(self):
+        expected = {url: self.client.get(url).content for url in self.urls(self.students[0])}
+        with override_settings(ROOT_URLCONF=AsyncURLConf):
+            for url in self.urls(self.students[0]):
+                with self.subTest(url=url):
+                    response = self.client.get(url, headers=self.headers)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertTrue(asyncio.iscoroutinefunction(response.resolver_match.func))
+                    self.assertEqual(response.content, expected[url])
+
+    @override_settings(ROOT_URLCONF=AsyncURLConf)
+    async def test_native_async_client(self):
+        response = await self.async_client.get('/api/students/', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['first_name'] for row in response.json()], ['Priya', 'Rahul', 'Meera'])
+        self.assertEqual(response.json()[0]['total_paid'], 2500.0)
+
+        response = await self.async_client.get('/api/students/999/', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get('/api/payments/summary/', {'date_from': 'bad'}, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(ROOT_URLCONF=AsyncURLConf)
+    def test_authentication(self):
+        client = APIClient()
+        response = client.get('/api/students/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+        self.assertEqual(client.get('/api/students/', HTTP_AUTHORIZATION='Token nope').status_code, 401)
+        self.user.is_active = False
+        self.user.save()
+        response = client.get('/api/students/', headers=self.headers)
+        self.assertEqual(response.json(), {'detail': 'User inactive or deleted.'})
+
+    @override_settings(ROOT_URLCONF=AsyncURLConf)
+    def test_writes_and_pages_fall_back_to_sync_views(self):
+        response = self.client.post('/api/students/', {
+            'first_name': 'Asha', 'last_name': 'Rao', 'grade': '7', 'board': 'CBSE',
+            'parent_name': 'Ravi Rao', 'parent_contact_primary': '9811111111',
+        }, format='json', headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        response = self.client.get('/api/students/', {'limit': 2}, headers=self.headers)
+        self.assertEqual(len(response.json()['results']), 2)
+
+    @override_settings(ROOT_URLCONF=AsyncURLConf)
+    def test_query_count(self):
+        with self.assertNumQueries(4):
+            # token + validators + fee schedule version + one SELECT ... LEFT JOIN ledger
+            self.client.get('/api/students/', headers=self.headers)
+        StudentLedger.objects.filter(student=self.students[0]).delete()
+        response = self.client.get(f'/api/students/{self.students[0].pk}/', headers=self.headers)
+        self.assertEqual(response.json()['total_paid'], 2500.0)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.fee = FeeStructure.objects.create(grade='7', board='CBSE', fee_amount=Decimal('40000'))
+        self.student = make_student()
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_304_without_serializing(self):
+        response = self.client.get('/api/students/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+        with self.assertNumQueries(1):
+            # the TableVersion read only
+            cached = self.revalidate('/api/students/', response)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b'')
+        self.assertEqual(cached['ETag'], response['ETag'])
+
+        modified_since = self.client.get('/api/students/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(modified_since.status_code, 304)
+
+    def test_writes_change_the_etag(self):
+        url = f'/api/students/{self.student.id}/'
+        response = self.client.get(url)
+        Payment.objects.create(student=self.student, payment_mode='Cash', payment_term='Term 1',
+                               amount_paid=Decimal('500'))
+        response = self.revalidate(url, response)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_paid'], Decimal('500'))
+
+        self.fee.fee_amount = Decimal('45000')
+        self.fee.save()
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+        importers.import_payments(StringIO(
+            'student,payment_mode,payment_term,amount_paid\n'
+            f'{self.student.id},Cash,Term 2,100\n'
+        ))
+        response = self.revalidate('/api/payments/', self.client.get('/api/payments/'))
+        self.assertEqual(response.status_code, 304)
+        importers.import_payments(StringIO(
+            'student,payment_mode,payment_term,amount_paid\n'
+            f'{self.student.id},Cash,Term 3,100\n'
+        ))
+        self.assertEqual(self.revalidate('/api/payments/', response).status_code, 200)
+
+    def test_fee_structures_are_cacheable(self):
+        response = self.client.get('/api/fee-structures/')
+        self.assertEqual(response['Cache-Control'], 'private, max-age=86400')
+        payment_etag = self.client.get('/api/payments/')['ETag']
+        make_student(first_name='Asha')
+        # Student changes don't invalidate fee responses
+        self.assertEqual(self.revalidate('/api/fee-structures/', response).status_code, 304)
+        self.assertNotEqual(self.client.get('/api/payments/')['ETag'], payment_etag)
+
+    def test_formats_have_distinct_etags(self):
+        json_etag = self.client.get('/api/students/')['ETag']
+        self.assertNotEqual(self.client.get('/api/students/', {'format': 'ndjson'})['ETag'], json_etag)
+
+    def test_new_academic_year_changes_the_etag(self):
+        year = current_academic_year()
+        FeeStructure.objects.create(grade='7', board='CBSE', fee_amount=Decimal('44000'), academic_year=year + 1)
+        token = Token.objects.create(user=self.user)
+        new_year = datetime.date(year + 1, settings.ACADEMIC_YEAR_START_MONTH, 1)
+        with mock.patch('django.utils.timezone.localdate', return_value=new_year - datetime.timedelta(days=1)):
+            fees = self.client.get('/api/fee-structures/')
+            payments = self.client.get('/api/payments/')
+            dashboard = self.client.get('/api/dashboard/')
+        self.assertEqual([row['fee_amount'] for row in fees.data], ['40000.00'])
+
+        with mock.patch('django.utils.timezone.localdate', return_value=new_year):
+            response = self.revalidate('/api/fee-structures/', fees)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([row['fee_amount'] for row in response.data], ['44000.00'])
+            self.assertEqual(self.revalidate('/api/payments/', payments).status_code, 200)
+            self.assertEqual(self.revalidate('/api/dashboard/', dashboard).status_code, 200)
+            with override_settings(ROOT_URLCONF=AsyncURLConf):
+                response = self.client.get(
+                    '/api/payments/', HTTP_IF_NONE_MATCH=payments['ETag'], HTTP_AUTHORIZATION=f'Token {token.key}',
+                )
+                self.assertTrue(asyncio.iscoroutinefunction(response.resolver_match.func))
+            self.assertEqual(response.status_code, 200)
+        # An explicit ?year= keeps its ETag across the change
+        with mock.patch('django.utils.timezone.localdate', return_value=new_year - datetime.timedelta(days=1)):
+            explicit = self.client.get('/api/fee-structures/', {'year': year})
+        with mock.patch('django.utils.timezone.localdate', return_value=new_year):
+            response = self.client.get('/api/fee-structures/', {'year': year}, HTTP_IF_NONE_MATCH=explicit['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_async_views_share_validators(self):
+        token = Token.objects.create(user=self.user)
+        response = self.client.get('/api/students/')
+        with override_settings(ROOT_URLCONF=AsyncURLConf):
+            cached = self.client.get(
+                '/api/students/', HTTP_IF_NONE_MATCH=response['ETag'],
+                HTTP_AUTHORIZATION=f'Token {token.key}',
+            )
+            # resolver_match is resolved lazily, against the current URLconf
+            self.assertTrue(asyncio.iscoroutinefunction(cached.resolver_match.func))
+        self.assertEqual(cached.status_code, 304)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite-specific')
+class QueryPlanTests(TestCase):
+    """Every hot query must use an index: no full table scans, no ORDER BY sorts."""
+
+    def hot_queries(self):
+        day = datetime.date(2026, 1, 1)
+        year = Payment.objects.filter(academic_year=2025)
+        return {
+            'student payments': year.filter(student_id=1).order_by('-transaction_date'),
+            'last payment date': year.filter(student_id=1, payment_term='Term 1')
+                .order_by('-transaction_date').values('transaction_date')[:1],
+            'payment first page': year.order_by('-transaction_date', 'id')[:51],
+            'payment next page': year.filter(
+                Q(transaction_date__lt=day) | Q(transaction_date=day, id__gt=5)
+            ).order_by('-transaction_date', 'id')[:51],
+            'archived payment page': PaymentArchive.objects.filter(academic_year=2024)
+                .order_by('-transaction_date', 'id')[:51],
+            'student next page': Student.objects.filter(id__gt=10).order_by('id')[:51],
+            'summary by date': reports.rollup_groups(
+                reports.filter_payments(year, {'date_from': '2026-01-01'})),
+            'summary by mode': reports.rollup_groups(
+                reports.filter_payments(year, {'payment_mode': 'Cash'})),
+            'summary by grade and board': reports.rollup_groups(
+                reports.filter_payments(year, {'grade': '7', 'board': 'CBSE'})),
+            'students by grade and board': Student.objects.filter(grade='7', board='CBSE').values('id'),
+            'fee by grade and board': FeeStructure.objects.filter(academic_year=2025, grade='7', board='CBSE'),
+            'fee schedule': FeeStructure.objects.filter(academic_year=2025),
+            'term ledger row': StudentTermLedger.objects.filter(student_id=1, payment_term='Term 1'),
+            'ledger row': StudentLedger.objects.filter(student_id=1),
+            'reconcile totals': year.filter(student_id__in=[1, 2, 3])
+                .values('student_id', 'payment_term').annotate(paid=Sum('amount_paid')).order_by(),
+            'table versions': TableVersion.objects.filter(name__in=['student', 'payment']),
+            'overdue dues': overdue.overdue_dues()[:51],
+        }
+
+    def test_hot_queries_use_indexes(self):
+        for name, queryset in self.hot_queries().items():
+            with self.subTest(name):
+                plan = explain(queryset)
+                self.assertEqual(plan_problems(plan), [], plan)
+
+    def test_detects_full_scans(self):
+        plan = explain(Payment.objects.filter(notes='x').order_by('amount_paid'))
+        self.assertEqual(len(plan_problems(plan)), 2, plan)
+
+
+class OverdueTests(APITestCase):
+    today = datetime.date(2026, 7, 1)  # Term 1 (due 30 June) has passed, Term 2 hasn't
+
+    def setUp(self):
+        super().setUp()
+        FeeStructure.objects.create(grade='7', board='CBSE', fee_amount=Decimal('40000'))
+        self.paid, self.partial, self.unpaid = (make_student(first_name=name) for name in ('Paid', 'Part', 'None'))
+        self.pay(self.paid, '10000')
+        self.pay(self.partial, '2500')
+
+    def pay(self, student, amount, **kwargs):
+        return Payment.objects.create(
+            student=student, payment_mode='Cash', payment_term='Term 1', amount_paid=Decimal(amount), **kwargs,
+        )
+
+    def test_term_due_dates(self):
+        self.assertEqual(overdue.term_due_dates(self.today)['Term 1'], datetime.date(2026, 6, 30))
+        dues = overdue.term_due_dates(datetime.date(2027, 2, 1))
+        self.assertEqual(dues['Term 3'], datetime.date(2026, 12, 31))
+        self.assertEqual(dues['Term 4'], datetime.date(2027, 3, 31))
+
+    def test_flags_and_clears_in_bulk(self):
+        result = overdue.run(today=self.today)
+        self.assertEqual((result['flagged'], result['cleared']), (2, 0))
+        flagged = set(StudentTermLedger.objects.filter(overdue=True).values_list('student_id', 'payment_term'))
+        self.assertEqual(flagged, {(self.partial.id, 'Term 1'), (self.unpaid.id, 'Term 1')})
+        self.assertEqual(
+            StudentTermLedger.objects.filter(payment_term='Term 2').values_list('due_date', flat=True).distinct().get(),
+            datetime.date(2026, 9, 30),
+        )
+
+        self.pay(self.partial, '7500')
+        result = overdue.run(today=self.today)
+        self.assertEqual((result['flagged'], result['cleared']), (0, 1))
+        self.assertEqual(overdue.run(today=self.today)['cleared'], 0)
+
+    def test_statement_count_does_not_grow_with_students(self):
+        def queries():
+            StudentTermLedger.objects.update(overdue=False, due_date=None)
+            with CaptureQueriesContext(connection) as ctx:
+                overdue.run(today=self.today)
+            return len(ctx.captured_queries)
+
+        few = queries()
+        for i in range(20):
+            make_student(first_name=f'Extra{i}')
+        self.assertEqual(queries(), few)
+
+    def test_payments_and_dry_run(self):
+        late = self.pay(self.unpaid, '100', due_date=datetime.date(2026, 6, 1))
+        self.assertEqual(late.payment_status, 'Overdue')
+        Payment.objects.filter(pk=late.pk).update(payment_status='Partial')
+
+        result = overdue.run(today=self.today, dry_run=True)
+        self.assertEqual((result['flagged'], result['payments_overdue']), (2, 1))
+        self.assertFalse(StudentTermLedger.objects.filter(overdue=True).exists())
+
+        out = StringIO()
+        call_command('mark_overdue', '--date', '2026-07-01', stdout=out)
+        self.assertIn('Flagged 2 term dues overdue', out.getvalue())
+        late.refresh_from_db()
+        self.assertEqual(late.payment_status, 'Overdue')
+
+    def test_students_without_ledger_rows_are_covered(self):
+        student = make_student(first_name='Bulk')
+        StudentLedger.objects.filter(student=student).delete()
+        StudentTermLedger.objects.filter(student=student).delete()
+        result = overdue.run(today=self.today)
+        self.assertEqual(result['students_added'], 1)
+        self.assertTrue(StudentTermLedger.objects.filter(student=student, payment_term='Term 1', overdue=True).exists())
+
+    def test_dates_of_other_years_are_rejected(self):
+        other_year = datetime.date(current_academic_year() - 1, 7, 1)
+        with self.assertRaises(ValueError):
+            overdue.run(today=other_year)
+        with self.assertRaisesMessage(CommandError, 'not in the current academic year'):
+            call_command('mark_overdue', '--date', other_year.isoformat(), stdout=StringIO())
+        self.assertFalse(StudentTermLedger.objects.filter(overdue=True).exists())
+
+    def test_roll_over_is_committed_before_flagging(self):
+        TableVersion.objects.update_or_create(name=ledger.LEDGER_YEAR, defaults={'version': current_academic_year() - 1})
+        with mock.patch.object(overdue, 'create_missing_term_rows', side_effect=OperationalError('database is locked')):
+            with self.assertRaises(OperationalError):
+                overdue.run(today=self.today)
+        self.assertEqual(TableVersion.current(ledger.LEDGER_YEAR)[0], current_academic_year())
+
+    def test_endpoint(self):
+        overdue.run(today=self.today)
+        self.pay(self.partial, '7500')  # paid off since the run: no longer listed
+        with self.assertNumQueries(2):
+            # validators, then one SELECT ... JOIN student on the partial index
+            response = self.client.get('/api/payments/overdue/')
+        self.assertEqual([row['student'] for row in response.data], [self.unpaid.id])
+        row = response.data[0]
+        self.assertEqual((row['payment_term'], row['balance']), ('Term 1', '10000.00'))
+        self.assertEqual(row['due_date'], '2026-06-30')
+
+        response = self.client.get('/api/payments/overdue/', {'limit': 1, 'board': 'SSC'})
+        self.assertEqual(response.data['results'], [])
+
+    def test_job_lease(self):
+        self.assertTrue(jobs.claim('job:test', 3600))
+        self.assertFalse(jobs.claim('job:test', 3600))
+        self.assertTrue(jobs.claim('job:test', 0))
+
+        calls = []
+        job = jobs.PeriodicJob('test-run', lambda: calls.append(1), 3600)
+        with mock.patch('students.jobs.close_old_connections'):
+            job.tick()
+            job.tick()
+        self.assertEqual(calls, [1])
+
+
+class AcademicYearTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.year = current_academic_year()
+        FeeStructure.objects.create(grade='7', board='CBSE', fee_amount=Decimal('40000'))
+        self.student = make_student()
+        self.current = self.pay('10000')
+
+    def pay(self, amount, **kwargs):
+        return Payment.objects.create(
+            student=self.student, payment_mode='Cash', payment_term='Term 1', amount_paid=Decimal(amount), **kwargs,
+        )
+
+    def ids(self, response):
+        return [row['id'] for row in response.data]
+
+    def test_reads_default_to_current_year(self):
+        old = self.pay('3000', academic_year=self.year - 1)
+        # Last year's payments are not in this year's ledger
+        self.assertEqual(StudentLedger.objects.get(student=self.student).total_paid, Decimal('10000'))
+        self.assertEqual(ledger.reconcile([self.student.id], fix=False), 0)
+
+        self.assertEqual(self.ids(self.client.get('/api/payments/')), [self.current.id])
+        self.assertEqual(self.ids(self.client.get('/api/payments/', {'year': self.year - 1})), [old.id])
+        with self.assertLogs('django.request', 'WARNING'):
+            self.assertEqual(self.client.get('/api/payments/', {'year': 'last'}).status_code, 400)
+        summary = self.client.get('/api/payments/summary/', {'year': self.year - 1}).data
+        self.assertEqual(summary['total_amount'], Decimal('3000'))
+        response = self.client.get(f'/api/students/{self.student.id}/payments/', {'year': self.year - 1})
+        self.assertEqual(self.ids(response), [old.id])
+        # Updates and lookups by id reach every live payment
+        self.assertEqual(self.client.get(f'/api/payments/{old.id}/').status_code, 200)
+
+    def test_archive_moves_closed_year_in_chunks(self):
+        old = [self.pay('1000', academic_year=self.year - 1) for _ in range(3)]
+        self.assertEqual(archive.archive_year(self.year - 1, dry_run=True), 3)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(archive.archive_year(self.year - 1, chunk_size=2), 3)
+        self.assertEqual(sum('INTO "students_paymentarchive"' in q['sql'] for q in queries), 2)
+        self.assertFalse(Payment.objects.filter(academic_year=self.year - 1).exists())
+        self.assertEqual(
+            sorted(PaymentArchive.objects.values_list('id', flat=True)), [payment.id for payment in old],
+        )
+        self.assertEqual(ArchivedYear.objects.get(academic_year=self.year - 1).payments, 3)
+        self.assertEqual(StudentLedger.objects.get(student=self.student).total_paid, Decimal('10000'))
+
+        response = self.client.get('/api/payments/', {'year': self.year - 1})
+        self.assertEqual(sorted(self.ids(response)), [payment.id for payment in old])
+        self.assertEqual(response.data[0]['student_name'], 'Priya Sharma')
+        self.assertEqual(self.ids(self.client.get('/api/payments/')), [self.current.id])
+        rows = list(exports.payment_rows({'year': self.year - 1}))
+        self.assertEqual(len(rows), 4)
+
+    def test_interrupted_archive_keeps_the_year_readable(self):
+        old = sorted(self.pay('1000', academic_year=self.year - 1).id for _ in range(3))
+        params = {'year': self.year - 1}
+
+        def listed():
+            return sorted(payment.id for payment in archive.payments_for(params))
+
+        # Dies once every payment is copied, before reads switch tables
+        with mock.patch('students.archive._complete', side_effect=OperationalError('disk I/O error')):
+            with self.assertRaises(OperationalError):
+                archive.archive_year(self.year - 1, chunk_size=2)
+        self.assertFalse(archive.is_archived(self.year - 1))
+        self.assertEqual(PaymentArchive.objects.count(), 3)
+        self.assertEqual(listed(), old)
+        # Meanwhile the year's payments cannot change
+        payment = Payment.objects.get(id=old[0])
+        with self.assertRaises(ValidationError):
+            payment.save()
+        with self.assertLogs('django.request', 'WARNING'):
+            response = self.client.patch(f'/api/payments/{payment.id}/', {'notes': 'late'})
+        self.assertEqual(response.status_code, 400)
+        with self.assertLogs('django.request', 'WARNING'):
+            self.assertEqual(self.client.delete(f'/api/payments/{payment.id}/').status_code, 400)
+        self.current.notes = 'this year is open'
+        self.current.save()
+
+        # Dies after moving the first chunk out of the live table
+        move = archive._move
+
+        def move_once(ids):
+            if Payment.objects.filter(academic_year=self.year - 1).count() < 3:
+                raise OperationalError('disk I/O error')
+            move(ids)
+
+        with mock.patch('students.archive._move', side_effect=move_once):
+            with self.assertRaises(OperationalError):
+                archive.archive_year(self.year - 1, chunk_size=2)
+        self.assertTrue(archive.is_archived(self.year - 1))
+        self.assertEqual(Payment.objects.filter(academic_year=self.year - 1).count(), 1)
+        self.assertEqual(listed(), old)
+
+        self.assertEqual(archive.archive_year(self.year - 1, chunk_size=2), 1)
+        self.assertFalse(Payment.objects.filter(academic_year=self.year - 1).exists())
+        self.assertEqual(listed(), old)
+        self.assertEqual(ArchivedYear.objects.get(academic_year=self.year - 1).payments, 3)
+
+    def test_archive_command_refuses_open_year(self):
+        with self.assertRaises(CommandError):
+            call_command('archive_academic_year', str(self.year), stdout=StringIO())
+        out = StringIO()
+        call_command('archive_academic_year', str(self.year - 2), '--dry-run', stdout=out)
+        self.assertIn('Would archive 0 payments', out.getvalue())
+        self.assertFalse(ArchivedYear.objects.exists())
+
+    def test_roll_over_rebuilds_ledgers_once(self):
+        self.assertEqual(ledger.roll_over(), 0)
+        TableVersion.objects.filter(name=ledger.LEDGER_YEAR).update(version=self.year - 1)
+        StudentLedger.objects.update(total_paid=Decimal('1'))
+        self.assertEqual(ledger.roll_over(), 1)
+        self.assertEqual(StudentLedger.objects.get(student=self.student).total_paid, Decimal('10000'))
+        self.assertEqual(ledger.roll_over(), 0)
+
+    def test_migration_rebuilds_ledgers_for_the_year(self):
+        migration = importlib.import_module('students.migrations.0011_academic_year')
+        self.pay('3000', academic_year=self.year - 1)
+        other = make_student(first_name='Rahul')
+        # As before the upgrade: totals over every payment ever made, some rows missing
+        StudentLedger.objects.filter(student=self.student).update(total_paid=Decimal('13000'))
+        StudentTermLedger.objects.filter(student=self.student, payment_term='Term 2').delete()
+        StudentLedger.objects.filter(student=other).delete()
+        TableVersion.objects.filter(name=ledger.LEDGER_YEAR).delete()
+
+        migration.rebuild_ledgers(django_apps, self.year, chunk_size=1)
+        self.assertEqual(ledger.reconcile([self.student.id, other.id], fix=False), 0)
+        self.assertEqual(StudentLedger.objects.get(student=self.student).total_paid, Decimal('10000'))
+        self.assertEqual(ledger.roll_over(), 0)
+
+    def test_fee_structures_scoped_by_year(self):
+        FeeStructure.objects.create(grade='7', board='CBSE', fee_amount=Decimal('44000'), academic_year=self.year + 1)
+        self.assertEqual(fee_schedule.annual_fee('7', 'CBSE'), Decimal('40000'))
+        self.assertEqual(StudentLedger.objects.get(student=self.student).total_fee, Decimal('40000'))
+
+        response = self.client.get('/api/fee-structures/')
+        self.assertEqual([row['fee_amount'] for row in response.data], ['40000.00'])
+        response = self.client.get('/api/fee-structures/by_grade_board/', {'grade': '7', 'board': 'CBSE', 'year': self.year + 1})
+        self.assertEqual([row['fee_amount'] for row in response.data], ['44000.00'])
+
+
+class DashboardTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        FeeStructure.objects.create(grade='7', board='CBSE', fee_amount=Decimal('40000'))
+        self.student = make_student()
+        make_student(first_name='Rahul', grade='9', board='SSC')
+        for mode, amount in (('Cash', '10000'), ('Online', '2500')):
+            Payment.objects.create(
+                student=self.student, payment_mode=mode, payment_term='Term 1', amount_paid=Decimal(amount),
+            )
+
+    def test_figures(self):
+        response = self.client.get('/api/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+        self.assertEqual(data['students']['total'], 2)
+        self.assertEqual((data['students']['by_grade']['7'], data['students']['by_board']['SSC']), (1, 1))
+        self.assertEqual(data['collections']['total_payments'], 2)
+        self.assertEqual(data['collections']['total_amount'], Decimal('12500'))
+        self.assertEqual(data['collections']['by_mode']['Online'], {'count': 1, 'amount': Decimal('2500')})
+        self.assertEqual(data['outstanding']['outstanding_balance'], Decimal('27500'))
+        self.assertEqual(data['overdue'], {'terms': 0, 'students': 0, 'amount': 0})
+        recent = data['recent_payments']
+        self.assertEqual([row['payment_mode'] for row in recent], ['Online', 'Cash'])
+        self.assertEqual(recent[0]['student_name'], 'Priya Sharma')
+
+    def test_cached_until_a_write(self):
+        with self.assertNumQueries(6):
+            # validators, then five grouped queries
+            self.client.get('/api/dashboard/')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/dashboard/')
+        self.assertEqual(response.data['collections']['total_payments'], 2)
+
+        Payment.objects.create(
+            student=self.student, payment_mode='Cash', payment_term='Term 2', amount_paid=Decimal('500'),
+        )
+        response = self.client.get('/api/dashboard/')
+        self.assertEqual(response.data['collections']['total_payments'], 3)
+
+        make_student(first_name='Meera')
+        self.assertEqual(self.client.get('/api/dashboard/').data['students']['total'], 3)
+
+    @override_settings(DASHBOARD_CACHE_TTL=0)
+    def test_ttl(self):
+        self.client.get('/api/dashboard/')
+        with self.assertNumQueries(6):
+            self.client.get('/api/dashboard/')
+
+    def test_not_modified_and_auth(self):
+        etag = self.client.get('/api/dashboard/')['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/dashboard/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(APIClient().get('/api/dashboard/').status_code, 401)
+
+    def test_overdue(self):
+        overdue.run(today=datetime.date(2026, 7, 1))
+        figures = dashboard.build()['overdue']
+        # Priya owes 10000 - 12500 < 0 for Term 1; Rahul has no fee structure
+        self.assertEqual(figures['terms'], 0)
+        make_student(first_name='Late')
+        overdue.run(today=datetime.date(2026, 7, 1))
+        self.assertEqual(dashboard.build()['overdue'], {'terms': 1, 'students': 1, 'amount': Decimal('10000')})
+
+
+class PerformanceMiddlewareTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        FeeStructure.objects.create(grade='7', board='CBSE', fee_amount=Decimal('40000'))
+        self.student = make_student()
+
+    def timings(self, response):
+        return dict(
+            (metric.split(';')[0], metric) for metric in response['Server-Timing'].split(', ')
+        )
+
+    @override_settings(PERF_SAMPLE_RATE=1, SLOW_REQUEST_MS=60_000)
+    def test_server_timing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/students/')
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {'total', 'db', 'render', 'size'})
+        self.assertIn(f'desc="{len(queries)} queries"', timings['db'])
+        self.assertIn(f'desc="{len(response.content)} bytes"', timings['size'])
+
+    @override_settings(PERF_SAMPLE_RATE=0, SLOW_REQUEST_MS=60_000)
+    def test_unsampled_requests_only_get_wall_time_and_counts(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/students/')
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {'total', 'db', 'size'})
+        self.assertEqual(timings['db'], f'db;desc="{len(queries)} queries"')
+
+    @override_settings(PERF_SAMPLE_RATE=1, SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged_with_sql(self):
+        with self.assertLogs('core.perf.slow', 'WARNING') as logs:
+            self.client.get(f'/api/students/{self.student.pk}/')
+        message = logs.records[0].getMessage()
+        self.assertIn(f'GET /api/students/{self.student.pk}/ 200', message)
+        details = json.loads(message[message.index('{'):])
+        self.assertEqual(details['queries'], len(details['sql']))
+        self.assertTrue(any('"students_student"' in query['sql'] for query in details['sql']))
+
+    @override_settings(PERF_SAMPLE_RATE=0, SLOW_REQUEST_MS=0)
+    def test_slow_unsampled_requests_are_logged_without_sql(self):
+        with self.assertLogs('core.perf.slow', 'WARNING') as logs:
+            self.client.get('/api/students/')
+        self.assertNotIn('"sql"', logs.records[0].getMessage())
+
+    @override_settings(PERF_SAMPLE_RATE=1, SLOW_REQUEST_MS=60_000)
+    def test_async_views_are_counted(self):
+        token = Token.objects.create(user=self.user)
+        with override_settings(ROOT_URLCONF=AsyncURLConf):
+            response = self.client.get(
+                f'/api/students/{self.student.pk}/', headers={'Authorization': f'Token {token.key}'},
+            )
+            self.assertTrue(asyncio.iscoroutinefunction(response.resolver_match.func))
+        self.assertNotIn('desc="0 queries"', self.timings(response)['db'])
+
+
+@override_settings(PERF_SAMPLE_RATE=0, SLOW_REQUEST_MS=60_000, METRICS_FLUSH_INTERVAL=None)
+class MetricsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        store = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False)
+        store.close()
+        self.addCleanup(os.unlink, store.name)
+        self.enterContext(self.settings(METRICS_DB=store.name))
+        metrics.registry.reset()
+        self.student = make_student()
+
+    def test_routes_come_from_the_router(self):
+        self.client.get('/api/students/')
+        self.client.get(f'/api/students/{self.student.pk}/')
+        self.client.get('/api/students/999999/')
+        self.client.get('/api/no-such-endpoint/')
+        routes = metrics.merged()['routes']
+        self.assertEqual(routes['student-list GET']['count'], 1)
+        detail = routes['student-detail GET']
+        self.assertEqual((detail['count'], detail['errors']), (2, {'404': 1}))
+        self.assertEqual(sum(detail['latency']), 2)
+        self.assertGreater(detail['queries_sum'], 0)
+        self.assertEqual(routes[f'{metrics.UNMATCHED_ROUTE} GET']['errors'], {'404': 1})
+
+    def test_endpoint(self):
+        self.client.get('/api/students/')
+        self.assertEqual(self.client.get('/api/metrics').status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get('/api/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('samayee_http_requests_total{route="student-list",method="GET"} 1', body)
+        self.assertIn('samayee_http_errors_total{route="metrics",method="GET",status="403"} 1', body)
+        self.assertIn(
+            'samayee_http_request_duration_seconds_count{route="student-list",method="GET"} 1', body,
+        )
+        self.assertIn('samayee_http_request_queries_bucket{route="student-list",method="GET",le="+Inf"} 1', body)
+        self.assertIn('samayee_cache_hit_ratio{cache="fee_schedule"}', body)
+        self.assertIn('samayee_workers_active 1', body)
+
+    def test_merges_workers_and_keeps_exited_ones(self):
+        self.client.get('/api/students/')
+        other = metrics.Registry()
+        other.observe('student-list', 'GET', 500, 0.2, 3)
+
+        def write(pid):
+            with mock.patch('os.getpid', return_value=pid):
+                metrics.flush(other)
+
+        write(os.getppid())  # a live process
+        exited = 2 ** 22 + 12345  # above any real pid
+        write(exited)
+
+        totals = metrics.merged()
+        route = totals['routes']['student-list GET']
+        self.assertEqual((route['count'], route['errors']), (3, {'500': 2}))
+        self.assertEqual(totals['workers'], 2)
+        # The exited worker was folded into the retired totals, not lost
+        self.assertEqual(metrics.merged()['routes']['student-list GET']['count'], 3)
+        body = metrics.render(totals)
+        self.assertIn('samayee_http_request_duration_seconds_bucket{route="student-list",method="GET",le="0.25"} 3', body)
+
+    def test_reused_pid_keeps_both_workers_counts(self):
+        self.client.get('/api/students/')
+        pid = os.getppid()
+        for status in (500, 502):
+            # A recycled worker and its replacement, given the same pid
+            worker = metrics.Registry()
+            worker.observe('student-list', 'GET', status, 0.2, 3)
+            with mock.patch('os.getpid', return_value=pid), mock.patch('time.time', return_value=status):
+                metrics.flush(worker)
+
+        totals = metrics.merged()
+        route = totals['routes']['student-list GET']
+        self.assertEqual((route['count'], route['errors']), (3, {'500': 1, '502': 1}))
+        # The older row is retired: only one process can hold the pid
+        self.assertEqual(totals['workers'], 2)
+        self.assertEqual(metrics.merged()['routes']['student-list GET']['count'], 3)
+
+
+class LoggingPipelineTests(TestCase):
+    def setUp(self):
+        self.records = []
+        self.sink = logging.Handler()
+        self.sink.emit = self.records.append
+        self.sink.set_name('test-sink')
+        self.sink.setFormatter(logs.JSONFormatter())
+        self.queue = logs.QueueHandler(['test-sink'])
+        self.queue.addFilter(logs.RedactFilter())
+        self.logger = logging.getLogger('students.tests.pipeline')
+        self.logger.addHandler(self.queue)
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.propagate = False
+        self.addCleanup(self.logger.removeHandler, self.queue)
+        self.addCleanup(self.queue.close)
+        self.addCleanup(self.sink.close)
+
+    def test_json_records_with_redaction(self):
+        data = {'email': 'a@example.com', 'password': 'hunter2', 'items': [{'token': 'abc', 'n': 1}]}
+        self.logger.info('Login attempt with data: %s', data, extra={'authorization': 'Token abc', 'user_id': 7})
+        data['email'] = 'changed@example.com'  # queued records keep what was logged
+        self.queue.flush()
+        record = json.loads(self.sink.format(self.records[0]))
+        self.assertEqual((record['level'], record['logger']), ('INFO', 'students.tests.pipeline'))
+        self.assertIn('a@example.com', record['message'])
+        self.assertNotIn('hunter2', record['message'])
+        self.assertNotIn('abc', record['message'])
+        self.assertEqual((record['authorization'], record['user_id']), (logs.REDACTED, 7))
+
+    def test_callers_do_not_wait_for_handlers(self):
+        release = threading.Event()
+        self.sink.emit = lambda record: (release.wait(5), self.records.append(record))
+        started = time.perf_counter()
+        for i in range(3):
+            self.logger.warning('message %d', i)
+        self.assertLess(time.perf_counter() - started, 1)
+        release.set()
+        self.queue.flush()
+        self.assertEqual([record.getMessage() for record in self.records], ['message 0', 'message 1', 'message 2'])
+
+    def test_formatting_is_lazy(self):
+        formatted_in = []
+
+        class Arg:
+            def __str__(self):
+                formatted_in.append(threading.current_thread())
+                return 'arg'
+
+        self.sink.emit = lambda record: self.records.append(self.sink.format(record))
+        self.logger.setLevel(logging.INFO)
+        self.logger.debug('%s', Arg())
+        self.logger.info('%s', Arg())
+        self.queue.flush()
+        self.assertEqual(len(formatted_in), 1)
+        self.assertIsNot(formatted_in[0], threading.current_thread())
+
+    def test_sampling(self):
+        self.logger.addFilter(logs.SamplingFilter(0))
+        self.logger.info('dropped')
+        self.logger.warning('kept')
+        self.queue.flush()
+        self.assertEqual([record.getMessage() for record in self.records], ['kept'])
+
+    def test_log_files_and_directory_are_created_on_first_use(self):
+        self.assertNotEqual(settings.LOG_DIR, settings.BASE_DIR / 'logs')
+        with tempfile.TemporaryDirectory() as root:
+            log_dir = os.path.join(root, 'logs')
+            handler = logs.RotatingFileHandler(os.path.join(log_dir, 'slow.log'), delay=True)
+            self.addCleanup(handler.close)
+            self.assertFalse(os.path.exists(log_dir))
+            handler.emit(logging.makeLogRecord({'msg': 'slow'}))
+            handler.close()
+            with open(os.path.join(log_dir, 'slow.log')) as log:
+                self.assertEqual(log.read(), 'slow\n')
+
+            with self.settings(METRICS_DB=os.path.join(root, 'metrics', 'metrics.sqlite3')):
+                metrics.flush(metrics.Registry())
+            self.assertTrue(os.path.exists(os.path.join(root, 'metrics', 'metrics.sqlite3')))
+
+
+class WriteQueueTests(TransactionTestCase):
+    # Not TestCase: run_write only queues and retries outside a transaction
+
+    def locked(self, fail_times, result='ok'):
+        calls = []
+
+        def write():
+            calls.append(1)
+            if len(calls) <= fail_times:
+                raise OperationalError('database is locked')
+            return result
+        return write, calls
+
+    @override_settings(DB_WRITE_RETRY_DELAY=0)
+    def test_locked_writes_are_retried(self):
+        retries = writes.stats['retries']
+        write, calls = self.locked(2)
+        self.assertEqual(writes.run_write(write), 'ok')
+        self.assertEqual((len(calls), writes.stats['retries'] - retries), (3, 2))
+
+    @override_settings(DB_WRITE_RETRY_DELAY=0, DB_WRITE_RETRIES=2)
+    def test_retries_are_bounded(self):
+        write, calls = self.locked(10)
+        with self.assertRaises(OperationalError):
+            writes.run_write(write)
+        self.assertEqual(len(calls), 3)
+
+    def test_other_errors_are_not_retried(self):
+        def write():
+            calls.append(1)
+            raise OperationalError('no such table: nowhere')
+        calls = []
+        with self.assertRaises(OperationalError):
+            writes.run_write(write)
+        self.assertEqual(len(calls), 1)
+
+    @override_settings(DB_WRITE_RETRY_DELAY=0)
+    def test_failed_attempts_roll_back(self):
+        def write():
+            make_student()
+            if Student.objects.count() == 1 and not calls:
+                calls.append(1)
+                raise OperationalError('database is locked')
+        calls = []
+        writes.run_write(write)
+        self.assertEqual(Student.objects.count(), 1)
+
+    def test_no_retry_inside_a_transaction(self):
+        write, calls = self.locked(1)
+        with self.assertRaises(OperationalError), transaction.atomic():
+            writes.run_write(write)
+        self.assertEqual(len(calls), 1)
+
+    def test_writes_are_serialized(self):
+        active = []
+        overlaps = []
+
+        def write():
+            active.append(1)
+            overlaps.append(len(active))
+            time.sleep(0.02)
+            active.pop()
+
+        def worker():
+            try:
+                for _ in range(3):
+                    writes.run_write(write)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(overlaps, [1] * 12)
+
+    def test_api_writes_go_through_the_queue(self):
+        user = User.objects.create_user(
+            username='staff', email='staff@example.com', password='pass12345', is_approved='approved',
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        count = writes.stats['writes']
+        response = client.post('/api/students/', {
+            'first_name': 'Asha', 'last_name': 'Patil', 'grade': '5', 'board': 'SSC',
+            'parent_name': 'Ravi Patil', 'parent_contact_primary': '9800000001',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        response = client.patch(f'/api/students/{response.data["id"]}/', {'grade': '6'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(writes.stats['writes'] - count, 2)
+
+
+class SQLiteProductionProfileTests(TestCase):
+    def test_pragmas_applied_on_connect(self):
+        from django.db.backends.sqlite3.base import DatabaseWrapper
+
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = DatabaseWrapper({
+                **connection.settings_dict,
+                'NAME': os.path.join(directory, 'profile.sqlite3'),
+                'OPTIONS': settings.SQLITE_PRODUCTION_OPTIONS,
+            }, alias='profile')
+            try:
+                with wrapper.cursor() as cursor:
+                    values = {}
+                    for pragma in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size'):
+                        cursor.execute(f'PRAGMA {pragma}')
+                        values[pragma] = cursor.fetchone()[0]
+                self.assertEqual(wrapper.transaction_mode, 'IMMEDIATE')
+            finally:
+                wrapper.close()
+        self.assertEqual(values, {
+            'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': settings.DB_BUSY_TIMEOUT * 1000,
+            'mmap_size': settings.SQLITE_PRAGMAS['mmap_size'], 'cache_size': settings.SQLITE_PRAGMAS['cache_size'],
+        })
+
+
+@override_settings(READ_REPLICA=True)
+class ReadReplicaRoutingTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        # The test mirror is a second connection to the same in-memory
+        # database, which can't read what this test's open transaction wrote
+        replica = connections['replica']
+        connections['replica'] = connections['default']
+        self.addCleanup(connections.__setitem__, 'replica', replica)
+        self.routed = []
+        original = ReadReplicaRouter.db_for_read
+
+        def db_for_read(router, model, **hints):
+            alias = original(router, model, **hints)
+            self.routed.append((model._meta.app_label, alias))
+            return alias
+        patcher = mock.patch.object(ReadReplicaRouter, 'db_for_read', db_for_read)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.student = make_student()
+        self.routed.clear()
+
+    def aliases(self, app_label='students'):
+        return {alias for label, alias in self.routed if label == app_label}
+
+    def test_get_reads_students_from_replica(self):
+        response = self.client.get('/api/students/')
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(self.aliases(), {'replica'})
+
+    def test_users_and_tokens_stay_on_default(self):
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(client.get('/api/dashboard/').status_code, 200)
+        self.assertEqual(self.aliases(), {'replica'})
+        self.assertEqual(self.aliases('authtoken'), {'default'})
+
+    def test_writes_read_from_default(self):
+        response = self.client.post('/api/payments/', {
+            'student': self.student.id, 'payment_mode': 'Cash', 'payment_term': 'Term 1',
+            'amount_paid': '500.00',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(self.aliases(), {'default'})
+
+    def test_sticky_after_a_write(self):
+        token = db_router.activate(read_only=True)
+        try:
+            self.assertEqual(Student.objects.all().db, 'replica')
+            Student.objects.filter(id=self.student.id).update(grade='8')
+            self.assertEqual(Student.objects.all().db, 'default')
+        finally:
+            db_router.deactivate(token)
+
+    def test_off_outside_requests_and_when_disabled(self):
+        self.assertEqual(Student.objects.all().db, 'default')
+        with override_settings(READ_REPLICA=False):
+            self.client.get('/api/students/')
+        self.assertEqual(self.aliases(), {'default'})
+
+
+class ReplicaSyncTests(TestCase):
+    def test_backup_copies_the_database(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'db.sqlite3')
+            target = os.path.join(directory, 'replica.sqlite3')
+            db = sqlite3.connect(source)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('CREATE TABLE t (x INTEGER)')
+            db.executemany('INSERT INTO t VALUES (?)', [(i,) for i in range(100)])
+            db.commit()
+            self.assertGreater(db_router.sync_replica(source, target), 0)
+            db.execute('INSERT INTO t VALUES (100)')
+            db.commit()
+            db.close()
+
+            replica = sqlite3.connect(target)
+            self.assertEqual(replica.execute('SELECT COUNT(*) FROM t').fetchone()[0], 100)
+            # A reader with the replica open sees the next sync
+            db_router.sync_replica(source, target)
+            self.assertEqual(replica.execute('SELECT COUNT(*) FROM t').fetchone()[0], 101)
+            replica.close()
+
+    def test_refuses_to_overwrite_the_source(self):
+        with self.assertRaises(ValueError):
+            db_router.sync_replica('same.sqlite3', 'same.sqlite3')
+
+
+class SyntheticDataTests(TestCase):
+    def test_seed_command(self):
+        out = StringIO()
+        call_command(
+            'seed_synthetic', '--students', '40', '--payments', '500', '--users', '30', '--years', '2',
+            '--seed', '1', '--chunk-size', '100', '--force', stdout=out,
+        )
+        self.assertIn('Added 40 students, 500 payments and 30 users', out.getvalue())
+        self.assertEqual(Student.objects.count(), 40)
+        self.assertEqual(User.objects.filter(username__startswith=synthetic.USERNAME_PREFIX).count(), 30)
+        year = current_academic_year()
+        self.assertEqual(
+            set(Payment.objects.values_list('academic_year', flat=True).distinct()), {year - 1, year},
+        )
+        # Back-dated into their own academic year, and counted in this year's ledgers
+        for payment in Payment.objects.all():
+            self.assertEqual(academic_year_start(payment.transaction_date), payment.academic_year)
+        self.assertEqual(ledger.reconcile(list(Student.objects.values_list('id', flat=True)), fix=False), 0)
+        self.assertTrue(User.objects.filter(is_approved='approved').first().check_password(synthetic.PASSWORD))
+
+    def test_refuses_without_debug(self):
+        with self.assertRaises(CommandError):
+            call_command('seed_synthetic', '--students', '1', '--payments', '0', '--users', '0')
+
+
+class EndpointBudgetTests(TestCase):
+    """The endpoint benchmark's query budgets, checked on a small data set (benchmarks/endpoints.py)."""
+
+    def test_every_route_is_covered(self):
+        from accounts.urls import urlpatterns as account_patterns
+
+        def route(name):
+            # /api/fees/ is an alias of /api/fee-structures/
+            return name.replace('fees-', 'feestructure-')
+
+        expected = {
+            route(pattern.name) for pattern in students_router.urls + account_patterns
+            if pattern.name and pattern.name != 'api-root'
+        }
+        covered = {
+            route(resolve(endpoint.path.split('?')[0].format_map(defaultdict(lambda: 1))).url_name)
+            for endpoint in endpoints.ENDPOINTS
+        }
+        self.assertEqual(expected - covered, set())
+
+    def test_endpoints_within_query_budgets(self):
+        synthetic.seed(students=30, payments=300, users=20, seed=1)
+        client = bench_client()
+        setup = endpoints.fixtures()
+        # Registration, login and approvals log at INFO
+        with self.assertLogs('accounts.views', 'INFO'):
+            for endpoint in endpoints.ENDPOINTS:
+                with self.subTest(endpoint.name):
+                    status, queries, problem = endpoints.check(endpoint, client, setup)
+                    self.assertIsNone(problem)
@@ -1,9 +1,10 @@
 """
 URL configuration for students app.
 """
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import StudentViewSet, FeeStructureViewSet, PaymentViewSet
+from .views import StudentViewSet, FeeStructureViewSet, PaymentViewSet, DashboardViewSet
 
 router = DefaultRouter()
 router.register(r'students', StudentViewSet)
@@ -12,7 +13,13 @@ router.register(r'payments', PaymentViewSet)
 
 # Add alias for fees
 router.register(r'fees', FeeStructureViewSet, basename='fees')
+router.register(r'dashboard', DashboardViewSet, basename='dashboard')
 
 urlpatterns = [
     path('', include(router.urls)),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    # Native async GETs for the hot read paths; listed first so they win
+    from .async_views import build_urlpatterns
+    urlpatterns = build_urlpatterns(router) + urlpatterns
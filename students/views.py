@@ -1,27 +1,80 @@
+import io
+import logging
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
 from rest_framework.response import Response
-from django.db.models import Sum, Q
+from core.exports import CSVRenderer, XLSXRenderer, export_response
+from core.pagination import KeysetPagination
+from core.sparse import SparseFieldsetMixin
+from core.streaming import StreamingListMixin
+from core.writes import SerializedWriteMixin
+from . import archive, dashboard, exports, importers, ledger, overdue, reports, search
+from .conditional import (
+    FEE_STRUCTURE_TABLES, PAYMENT_TABLES, STUDENT_TABLES, VersionedConditionalMixin,
+    fee_structure_cache_control,
+)
+from .fees import fee_schedule
+from .years import requested_year
 from .models import Student, FeeStructure, Payment
-from .serializers import StudentSerializer, FeeStructureSerializer, PaymentSerializer
+from .serializers import (
+    StudentSerializer, FeeStructureSerializer, PaymentSerializer, OverdueDueSerializer, check_year_open,
+)
 
-class StudentViewSet(viewsets.ModelViewSet):
+logger = logging.getLogger(__name__)
+
+class StudentPagination(KeysetPagination):
+    ordering = ('id',)
+
+class PaymentPagination(KeysetPagination):
+    ordering = ('-transaction_date', 'id')
+
+class OverduePagination(KeysetPagination):
+    ordering = ('due_date', 'id')
+
+class SearchPagination(KeysetPagination):
+    # Best match first; search_rank is annotated by students.search
+    ordering = ('search_rank', 'id')
+
+class StudentViewSet(SerializedWriteMixin, SparseFieldsetMixin, VersionedConditionalMixin, StreamingListMixin,
+                     viewsets.ModelViewSet):
     queryset = Student.objects.all()
     serializer_class = StudentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = StudentPagination
+    # GETs answered with 304 while students, payments and fees are unchanged
+    conditional_actions = ('list', 'retrieve', 'search', 'payments', 'payment_summary')
+    version_tables = STUDENT_TABLES
+    
+    # Actions whose serializer output includes total_paid / fee_structure
+    # for every row; these get the ledger join and the fee map.
+    ledger_actions = ('list', 'retrieve', 'search', 'payment_summary')
+    # ?fields= / ?omit= (see core.sparse)
+    sparse_actions = ('list', 'retrieve', 'search')
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in self.ledger_actions:
+            queryset = queryset.select_related('ledger')
+        return self.trim_queryset(queryset)
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in self.ledger_actions and self.wants('fee_structure'):
+            # The cached fee schedule instead of one lookup per student
+            context['fee_map'] = fee_schedule.as_map()
+        return context
     
     def create(self, request, *args, **kwargs):
         """Override create method to add debugging"""
-        print(f"StudentViewSet.create called with data: {request.data}")
-        print(f"User: {request.user}")
-        print(f"Authenticated: {request.user.is_authenticated}")
+        logger.debug('StudentViewSet.create by %s with data: %s', request.user, request.data)
         
         try:
             response = super().create(request, *args, **kwargs)
-            print(f"Student created successfully: {response.data}")
+            logger.debug('Student created successfully: %s', response.data)
             return response
         except Exception as e:
-            print(f"Error creating student: {e}")
+            logger.debug('Error creating student: %s', e)
             return Response(
                 {'error': str(e)}, 
                 status=status.HTTP_400_BAD_REQUEST
@@ -29,22 +82,23 @@ class StudentViewSet(viewsets.ModelViewSet):
     
     def list(self, request, *args, **kwargs):
         """Override list method to add debugging"""
-        print(f"StudentViewSet.list called")
-        print(f"User: {request.user}")
-        print(f"Authenticated: {request.user.is_authenticated}")
+        logger.debug('StudentViewSet.list by %s', request.user)
         
         try:
             response = super().list(request, *args, **kwargs)
-            print(f"Students retrieved successfully: {len(response.data)} students")
+            data = getattr(response, 'data', None)
+            if data is not None and logger.isEnabledFor(logging.DEBUG):
+                count = len(data['results'] if isinstance(data, dict) else data)
+                logger.debug('Students retrieved successfully: %d students', count)
             return response
         except Exception as e:
-            print(f"Error listing students: {e}")
+            logger.debug('Error listing students: %s', e)
             return Response(
                 {'error': str(e)}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
     
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], pagination_class=SearchPagination)
     def search(self, request):
         """Search students by name, grade, or board"""
         query = request.query_params.get('q', '').strip()
@@ -52,23 +106,35 @@ class StudentViewSet(viewsets.ModelViewSet):
         if not query:
             return Response([])
         
-        # Search in first_name, last_name, parent_name, grade, and board
-        queryset = self.queryset.filter(
-            Q(first_name__icontains=query) |
-            Q(last_name__icontains=query) |
-            Q(parent_name__icontains=query) |
-            Q(grade__icontains=query) |
-            Q(board__icontains=query)
-        )
+        # Every token must match one of first_name, last_name, parent_name,
+        # grade or board; uses the FTS5 index when the database has one
+        queryset = search.search_students(self.get_queryset(), query)
         
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'], renderer_classes=[CSVRenderer, XLSXRenderer])
+    def export(self, request):
+        """
+        Download all students with fee, total paid, balance and fee status.
+        ?format=csv (default) or xlsx; optional grade and board filters.
+        """
+        rows = exports.student_rows(request.query_params)
+        return export_response(rows, 'students', request.accepted_renderer.format)
+    
     @action(detail=True, methods=['get'])
     def payments(self, request, pk=None):
         """Get all payments for a specific student"""
         student = self.get_object()
-        payments = Payment.objects.filter(student=student).order_by('-transaction_date')
+        try:
+            payments = archive.payments_for(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        # student_name / student_grade read the student of every row
+        payments = payments.filter(student=student).select_related('student').order_by('-transaction_date')
         serializer = PaymentSerializer(payments, many=True)
         return Response(serializer.data)
     
@@ -76,31 +142,37 @@ class StudentViewSet(viewsets.ModelViewSet):
     def payment_summary(self, request, pk=None):
         """Get payment summary for a specific student"""
         student = self.get_object()
-        total_paid = Payment.objects.filter(student=student).aggregate(
-            total=Sum('amount_paid')
-        )['total'] or 0
-        
-        # Get fee structure for this student
-        try:
-            fee_structure = FeeStructure.objects.get(
-                grade=student.grade, 
-                board=student.board
-            )
-            total_fee = fee_structure.fee_amount
-        except FeeStructure.DoesNotExist:
-            total_fee = 0
+        student_ledger = ledger.get_ledger(student)
         
         return Response({
-            'student': StudentSerializer(student).data,
-            'total_fee': total_fee,
-            'total_paid': total_paid,
-            'balance': total_fee - total_paid
+            'student': self.get_serializer(student).data,
+            'total_fee': student_ledger.total_fee,
+            'total_paid': student_ledger.total_paid,
+            'balance': student_ledger.balance
         })
 
-class FeeStructureViewSet(viewsets.ModelViewSet):
+class FeeStructureViewSet(SparseFieldsetMixin, VersionedConditionalMixin, viewsets.ModelViewSet):
     queryset = FeeStructure.objects.all()
     serializer_class = FeeStructureSerializer
     permission_classes = [permissions.IsAuthenticated]
+    conditional_actions = ('list', 'retrieve', 'by_grade_board')
+    version_tables = FEE_STRUCTURE_TABLES
+    sparse_actions = ('list', 'retrieve', 'by_grade_board')
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'by_grade_board'):
+            # One year's fees; ?year= for another (e.g. next year's, entered early)
+            try:
+                queryset = queryset.filter(academic_year=requested_year(self.request.query_params))
+            except ValueError as e:
+                raise ParseError(str(e))
+        return self.trim_queryset(queryset)
+    
+    @property
+    def cache_control(self):
+        # Fees change a few times a year; let clients reuse them without asking
+        return fee_structure_cache_control()
     
     @action(detail=False, methods=['get'])
     def by_grade_board(self, request):
@@ -108,48 +180,65 @@ class FeeStructureViewSet(viewsets.ModelViewSet):
         grade = request.query_params.get('grade')
         board = request.query_params.get('board')
         
+        queryset = self.get_queryset()
         if grade and board:
-            queryset = self.queryset.filter(grade=grade, board=board)
-        else:
-            queryset = self.queryset
+            queryset = queryset.filter(grade=grade, board=board)
             
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def cache_stats(self, request):
+        """Hit/miss counters for this worker's fee schedule cache"""
+        return Response(fee_schedule.stats())
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(SerializedWriteMixin, SparseFieldsetMixin, VersionedConditionalMixin, StreamingListMixin,
+                     viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = PaymentPagination
+    conditional_actions = ('list', 'retrieve', 'summary', 'student_summary', 'overdue')
+    version_tables = PAYMENT_TABLES
+    
+    def get_queryset(self):
+        # Lists show one academic year, the current one unless ?year= asks
+        # for another; a closed year is read from the archive. Writes and
+        # lookups by id see every live payment.
+        if self.action == 'list' or (self.action == 'retrieve' and 'year' in self.request.query_params):
+            try:
+                queryset = archive.payments_for(self.request.query_params)
+            except ValueError as e:
+                raise ParseError(str(e))
+        else:
+            queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            # student_name / student_grade read the student of every row
+            queryset = queryset.select_related('student')
+        elif self.action == 'student_summary':
+            queryset = queryset.select_related('student__ledger')
+        return self.trim_queryset(queryset)
+
+    def perform_destroy(self, instance):
+        check_year_open(instance)
+        super().perform_destroy(instance)
     
     def create(self, request, *args, **kwargs):
         """Override create to return payment summary after creation"""
         response = super().create(request, *args, **kwargs)
         
-        # Get the created payment
-        payment = Payment.objects.get(id=response.data['id'])
+        # Get the created payment; the ledger already includes it
+        payment = Payment.objects.select_related('student__ledger').get(id=response.data['id'])
         student = payment.student
-        
-        # Calculate payment summary
-        total_paid = Payment.objects.filter(student=student).aggregate(
-            total=Sum('amount_paid')
-        )['total'] or 0
-        
-        # Get fee structure for this student
-        try:
-            fee_structure = FeeStructure.objects.get(
-                grade=student.grade, 
-                board=student.board
-            )
-            total_fee = fee_structure.fee_amount
-        except FeeStructure.DoesNotExist:
-            total_fee = 0
+        student_ledger = ledger.get_ledger(student)
+        total_fee = student_ledger.total_fee
         
         # Add summary to response
         response.data['payment_summary'] = {
             'student_name': f"{student.first_name} {student.last_name}",
             'total_fee': total_fee,
-            'total_paid': total_paid,
-            'balance_due': total_fee - total_paid,
+            'total_paid': student_ledger.total_paid,
+            'balance_due': student_ledger.balance,
             'term_fee': total_fee / 4,
             'current_term': payment.payment_term,
             'amount_just_paid': payment.amount_paid
@@ -159,51 +248,90 @@ class PaymentViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def summary(self, request):
-        """Get payment summary statistics"""
-        total_payments = Payment.objects.count()
-        total_amount = Payment.objects.aggregate(
-            total=Sum('amount_paid')
-        )['total'] or 0
+        """
+        Get payment summary statistics in one grouped query. Optional filters:
+        year (default: the current academic year), date_from, date_to
+        (YYYY-MM-DD), grade, board.
+        """
+        try:
+            queryset = reports.filter_payments(archive.payments_for(request.query_params), request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Payments by mode
-        payments_by_mode = {}
-        for mode, _ in Payment.PAYMENT_MODES:
-            amount = Payment.objects.filter(payment_mode=mode).aggregate(
-                total=Sum('amount_paid')
-            )['total'] or 0
-            payments_by_mode[mode] = amount
+        return Response(reports.summary_payload(reports.payment_rollup(queryset)))
+    
+    @action(detail=False, methods=['get'])
+    def overdue(self, request):
+        """
+        Unpaid term dues past their due date, oldest first, as of the last
+        overdue run. Optional grade, board and payment_term filters;
+        ?limit=/?cursor= pages like the payment list.
+        """
+        queryset = overdue.overdue_dues()
+        for param, lookup in (('grade', 'student__grade'), ('board', 'student__board'),
+                              ('payment_term', 'payment_term')):
+            if request.query_params.get(param):
+                queryset = queryset.filter(**{lookup: request.query_params[param]})
         
-        return Response({
-            'total_payments': total_payments,
-            'total_amount': total_amount,
-            'payments_by_mode': payments_by_mode
-        })
+        paginator = OverduePagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        if page is not None:
+            return paginator.get_paginated_response(OverdueDueSerializer(page, many=True).data)
+        return Response(OverdueDueSerializer(queryset, many=True).data)
+    
+    @action(detail=False, methods=['get'], renderer_classes=[CSVRenderer, XLSXRenderer])
+    def export(self, request):
+        """
+        Download payments with student and ledger columns. ?format=csv
+        (default) or xlsx; same filters as summary.
+        """
+        try:
+            rows = exports.payment_rows(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return export_response(rows, 'payments', request.accepted_renderer.format)
+    
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_csv(self, request):
+        """Bulk import payments from an uploaded CSV file (multipart field "file")"""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'error': 'Upload a CSV file in the "file" field.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        dry_run = request.query_params.get('dry_run') in ('1', 'true')
+        # Read straight from the upload (spooled to disk when large) row by row
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        report = importers.import_payments(stream, dry_run=dry_run)
+        # Rows before an unreadable part of the file are saved; the report says how many
+        code = status.HTTP_400_BAD_REQUEST if report.stopped_at else status.HTTP_200_OK
+        return Response(report.as_dict(), status=code)
     
     @action(detail=True, methods=['get'])
     def student_summary(self, request, pk=None):
         """Get payment summary for the student of this payment"""
         payment = self.get_object()
         student = payment.student
-        
-        total_paid = Payment.objects.filter(student=student).aggregate(
-            total=Sum('amount_paid')
-        )['total'] or 0
-        
-        # Get fee structure for this student
-        try:
-            fee_structure = FeeStructure.objects.get(
-                grade=student.grade, 
-                board=student.board
-            )
-            total_fee = fee_structure.fee_amount
-        except FeeStructure.DoesNotExist:
-            total_fee = 0
+        student_ledger = ledger.get_ledger(student)
+        total_fee = student_ledger.total_fee
         
         return Response({
             'student_name': f"{student.first_name} {student.last_name}",
             'total_fee': total_fee,
-            'total_paid': total_paid,
-            'balance_due': total_fee - total_paid,
+            'total_paid': student_ledger.total_paid,
+            'balance_due': student_ledger.balance,
             'term_fee': total_fee / 4,
             'current_payment': PaymentSerializer(payment).data
         })
+
+class DashboardViewSet(VersionedConditionalMixin, viewsets.ViewSet):
+    """Headline figures for the dashboard, computed server-side."""
+    permission_classes = [permissions.IsAuthenticated]
+    conditional_actions = ('list',)
+    version_tables = STUDENT_TABLES
+
+    def list(self, request):
+        # The validators' ETag changes with every student, payment or fee write, and the academic year
+        return Response(dashboard.cached(self.validators.etag))
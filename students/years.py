@@ -0,0 +1,33 @@
+"""
+Academic years.
+
+A year is identified by the calendar year it starts in (2026 = April 2026
+to March 2027 with ACADEMIC_YEAR_START_MONTH = 4). Payments and fee
+structures carry it as ``academic_year``; list and report endpoints default
+to the current year and take ``?year=`` for another one.
+"""
+from django.conf import settings
+from django.utils import timezone
+
+
+def academic_year_start(day):
+    """The calendar year in which the academic year containing ``day`` began."""
+    return day.year if day.month >= settings.ACADEMIC_YEAR_START_MONTH else day.year - 1
+
+
+def current_academic_year():
+    return academic_year_start(timezone.localdate())
+
+
+def requested_year(params):
+    """``?year=`` as an int, or the current year when absent. Raises ValueError when malformed."""
+    value = (params or {}).get('year')
+    if not value:
+        return current_academic_year()
+    try:
+        year = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('year must be the calendar year the academic year starts in, e.g. 2025')
+    if not 1900 <= year <= 9999:
+        raise ValueError('year must be the calendar year the academic year starts in, e.g. 2025')
+    return year